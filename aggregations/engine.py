@@ -0,0 +1,332 @@
+"""
+Builds every legacy aggregated feed (all, daily and weekly for EA, LW and AF) from a single parse of the BeyondWords
+output feed.
+
+Example:
+    python -m aggregations.engine --local
+"""
+import argparse
+import datetime
+import logging
+import os
+import ssl
+import sys
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import feedparser
+
+from aggregations.history import TitleHistory
+from feed_processing.feed_writer import RssWriter, podcast_nsmap, write_podcast_channel, write_podcast_item
+from feed_processing.storage import LocalStorage, GoogleCloudStorage, StorageInterface
+from feed_processing.utils import get_post_karma
+
+SOURCE_URL = 'https://audio.beyondwords.io/f/8692/7888/read_8617d3aee53f3ab844a309d37895c143'  # TNLL
+GCP_BUCKET_NAME = 'rssfile'
+REMOVED_AUTHORS_FILENAME = 'removed_authors.txt'
+AGGREGATIONS_DIR = os.path.dirname(os.path.abspath(__file__))
+KARMA_WORKERS = 8
+
+html_hyperlink_format_spotify = "<a href=\"{hyperlink}\">{hyperlink_text}</a>"
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class AggregatorVariant:
+    """
+    Declarative description of one aggregated feed.
+
+    `period` is None for the feeds with every post of a forum, or 'daily'/'weekly' for the feeds that add the post
+    with the most karma of the most recent day/week to the posts already in `history_filename`.
+    """
+    name: str
+    title_prefix: str
+    period: Optional[str]
+    feed_title: str
+    guid_suffix: str
+    image_url: str
+    output_file_basename: str
+    # Directory the feed, history and removed authors files are read from and written to when running locally.
+    local_dir: str
+
+    @property
+    def history_filename(self) -> str:
+        return f'histories/history_titles_{self.output_file_basename}.bin'
+
+    @property
+    def history_titles_filename(self) -> str:
+        # Plain list of titles the history used to be kept in, imported when there is no `history_filename` yet.
+        return f'histories/history_titles_{self.output_file_basename}.txt'
+
+
+def forum_variants(forum: str, forum_title: str) -> List[AggregatorVariant]:
+    image_url = 'https://storage.googleapis.com/rssfile/images/Nonlinear%20Logo%203000x3000%20-%20{}.png'
+    local_dir = os.path.join(AGGREGATIONS_DIR, forum.lower())
+    return [
+        AggregatorVariant(
+            name=forum.lower(),
+            title_prefix=f'{forum} - ',
+            period=None,
+            feed_title=f'The Nonlinear Library: {forum_title}',
+            guid_suffix=f'_{forum}',
+            image_url=image_url.format(forum_title.replace(' ', '%20')),
+            output_file_basename=f'nonlinear-library-aggregated-{forum}',
+            local_dir=local_dir,
+        ),
+        AggregatorVariant(
+            name=f'{forum.lower()}_daily',
+            title_prefix=f'{forum} - ',
+            period='daily',
+            feed_title=f'The Nonlinear Library: {forum_title} Daily',
+            guid_suffix=f'_{forum}-day',
+            image_url=image_url.format(f'{forum_title} Daily'.replace(' ', '%20')),
+            output_file_basename=f'nonlinear-library-aggregated-{forum}-daily',
+            local_dir=local_dir,
+        ),
+        AggregatorVariant(
+            name=f'{forum.lower()}_weekly',
+            title_prefix=f'{forum} - ',
+            period='weekly',
+            feed_title=f'The Nonlinear Library: {forum_title} Weekly',
+            guid_suffix=f'_{forum}-week',
+            image_url=image_url.format(f'{forum_title} Weekly'.replace(' ', '%20')),
+            output_file_basename=f'nonlinear-library-aggregated-{forum}-weekly',
+            local_dir=local_dir,
+        ),
+    ]
+
+
+VARIANTS = forum_variants('EA', 'EA Forum') + forum_variants('LW', 'LessWrong') + forum_variants('AF', 'Alignment Forum')
+VARIANTS_BY_NAME = {variant.name: variant for variant in VARIANTS}
+
+
+def format_published_datetime(datetime_str):
+    try:
+        formatted_datetime = datetime.datetime.strptime(datetime_str[:-6], "%a, %m %b %Y %H:%M:%S")
+    except ValueError as e:
+        if 'does not match' in str(e):
+            formatted_datetime = datetime.datetime.strptime(datetime_str[:-6], "%a, %d %b %Y %H:%M:%S")
+        else:
+            formatted_datetime = None
+    return formatted_datetime
+
+
+def get_periods_back(period, published_datetime_object, today=None):
+    """
+    Return how many days ('daily') or ISO weeks ('weekly') before today the post was published.
+    """
+    today = today or datetime.date.today()
+    published_date = published_datetime_object.date()
+    if period == 'daily':
+        return (today - published_date).days
+    start_of_this_week = today - datetime.timedelta(days=today.weekday())
+    start_of_published_week = published_date - datetime.timedelta(days=published_date.weekday())
+    return (start_of_this_week - start_of_published_week).days // 7
+
+
+class AggregatorEngine(object):
+    """
+    Builds the feeds of several AggregatorVariants from one parse of the source feed.
+
+    Removed authors are read once per file and the karma of a post is scraped at most once, however many variants
+    consider it.
+    """
+
+    def __init__(self, variants: List[AggregatorVariant], local=False, source_url=SOURCE_URL,
+                 get_karma: Callable[[str], int] = get_post_karma):
+        # Obtain SSL certificate
+        if hasattr(ssl, '_create_unverified_context'):
+            ssl._create_default_https_context = ssl._create_unverified_context
+        self.variants = variants
+        self.local = local
+        self.source_url = source_url
+        self.get_karma = get_karma
+        self.storage: StorageInterface = LocalStorage(rss_filename=None) if local else \
+            GoogleCloudStorage(gcp_bucket=GCP_BUCKET_NAME, rss_filename=None)
+        self.karmas: Dict[str, int] = {}
+        self._removed_authors = {}
+        self._published_datetimes = {}
+
+    def path(self, variant: AggregatorVariant, filename: str) -> str:
+        if self.local:
+            return os.path.join(variant.local_dir, os.path.basename(filename))
+        return filename
+
+    def read_lines(self, path) -> List[str]:
+        content = self.storage.read_file(path)
+        if content is None:
+            return []
+        return [line.rstrip() for line in content.decode('UTF-8').split('\n')]
+
+    def read_history(self, variant: AggregatorVariant) -> TitleHistory:
+        content = self.storage.read_file(self.path(variant, variant.history_filename))
+        if content is not None:
+            return TitleHistory.from_bytes(content)
+        return TitleHistory(self.read_lines(self.path(variant, variant.history_titles_filename)))
+
+    def removed_authors(self, variant: AggregatorVariant) -> List[str]:
+        path = self.path(variant, REMOVED_AUTHORS_FILENAME)
+        if path not in self._removed_authors:
+            self._removed_authors[path] = self.read_lines(path)
+        return self._removed_authors[path]
+
+    def published_datetime(self, i, item):
+        if i not in self._published_datetimes:
+            self._published_datetimes[i] = format_published_datetime(item['published'])
+        return self._published_datetimes[i]
+
+    def run(self) -> Dict[str, str]:
+        """
+        Build and write the feed of every variant.
+
+        Returns: A dict from variant name to the filename its feed was written to.
+        """
+        log.info(f'Fetching feed from: {self.source_url}')
+        news_feed = feedparser.parse(self.source_url)
+
+        selections = {
+            variant.name: self.select_entries(news_feed, variant)
+            for variant in self.variants
+        }
+        self.fetch_karmas(
+            news_feed.entries[i]['link']
+            for selection in selections.values()
+            for i in selection['candidates']
+        )
+
+        written = {}
+        for variant in self.variants:
+            list_indices = self.pick_entries(news_feed, variant, selections[variant.name])
+            filename = self.path(variant, f'{variant.output_file_basename}.xml')
+            with self.storage.open_writer(filename) as output:
+                self.write_feed(news_feed, variant, list_indices, output)
+            written[variant.name] = filename
+        return written
+
+    def select_entries(self, news_feed, variant: AggregatorVariant):
+        """
+        Find the entries already in the history of the variant, and the candidates for the post with the most karma.
+        """
+        entries = news_feed.entries
+        if variant.period is None:
+            return {
+                'list_indices': [i for i, item in enumerate(entries) if item['title'].startswith(variant.title_prefix)],
+                'candidates': [],
+            }
+
+        removed_authors = self.removed_authors(variant)
+        history = self.read_history(variant)
+        # Bucket the candidate posts by day or week in a single pass over the feed; only the posts in the most recent
+        # bucket that has any are candidates.
+        list_indices = []
+        candidate_indices_per_periods_back = defaultdict(list)
+        for i, item in enumerate(entries):
+            if not item['title'].startswith(variant.title_prefix) or item['author'] in removed_authors:
+                continue
+            if item['title'] in history:
+                list_indices.append(i)
+            published_datetime_object = self.published_datetime(i, item)
+            if published_datetime_object is None:
+                continue
+            periods_back = get_periods_back(variant.period, published_datetime_object)
+            if periods_back >= (1 if variant.period == 'daily' else 0):
+                candidate_indices_per_periods_back[periods_back].append(i)
+
+        candidates = []
+        if candidate_indices_per_periods_back:
+            candidates = candidate_indices_per_periods_back[min(candidate_indices_per_periods_back)]
+        return {'list_indices': list_indices, 'candidates': candidates, 'history': history}
+
+    def fetch_karmas(self, links):
+        links = [link for link in dict.fromkeys(links) if link not in self.karmas]
+        log.info(f'Fetching the karma of {len(links)} posts')
+        with ThreadPoolExecutor(max_workers=KARMA_WORKERS) as executor:
+            for link, karma in zip(links, executor.map(self._fetch_karma, links)):
+                self.karmas[link] = karma
+
+    def _fetch_karma(self, link) -> int:
+        # A post whose karma can't be fetched only loses the comparison, instead of failing every feed of the run.
+        try:
+            return int(self.get_karma(link))
+        except Exception:
+            log.exception(f'Failed to fetch the karma of {link}, using 0 instead')
+            return 0
+
+    def pick_entries(self, news_feed, variant: AggregatorVariant, selection) -> List[int]:
+        """
+        Add the candidate with the most karma to the history of the variant and return the indices of its entries.
+        """
+        list_indices = selection['list_indices']
+        if variant.period is None:
+            return list_indices
+
+        history = selection['history']
+        candidates = selection['candidates']
+        if candidates:
+            max_karma_index = max(candidates, key=lambda i: self.karmas[news_feed.entries[i]['link']])
+            max_karma_title = news_feed.entries[max_karma_index]['title']
+            list_indices = sorted(set(list_indices + [max_karma_index]))
+            history.add(max_karma_title)
+            log.info(f'{variant.name}: max karma post found: {max_karma_title}')
+        else:
+            log.info(f'{variant.name}: no articles found')
+
+        # write updated list of previous article titles to the database
+        self.storage.write_file(self.path(variant, variant.history_filename), history.to_bytes())
+        return list_indices
+
+    def write_feed(self, news_feed, variant: AggregatorVariant, list_indices: List[int], output):
+        removed_authors = self.removed_authors(variant) if variant.period else []
+        with RssWriter(output, podcast_nsmap(news_feed), news_feed['encoding'].upper()) as writer:
+            write_podcast_channel(writer, news_feed, variant.feed_title, variant.image_url)
+            for i in list_indices:
+                item = news_feed.entries[i]
+                if not item['title'].startswith(variant.title_prefix) or item['author'] in removed_authors:
+                    continue
+                enclosure = item['links'][1] if 'enclosure' in item['links'][1].values() else item['links'][0]
+                write_podcast_item(
+                    writer,
+                    # does the guid have to be unique PER SHOW or GLOBALLY? ==>> GLOBALLY :(
+                    guid=item['guid'] + variant.guid_suffix,
+                    guidislink=str(item['guidislink']).lower(),
+                    title=item['title'].replace('&', 'and'),
+                    summary=html_hyperlink_format_spotify.format(
+                        hyperlink=item['link'], hyperlink_text='Link to original article') + '<br/>' + '<br/>' +
+                            item['summary'],
+                    author=item['author'],
+                    link=item['link'],
+                    enclosure_length=enclosure['length'],
+                    enclosure_type=enclosure['type'],
+                    enclosure_url=enclosure['href'],
+                    published=item['published'],
+                    image_href=variant.image_url,
+                    itunes_duration=item['itunes_duration'],
+                    itunes_explicit=item['itunes_explicit'],
+                    itunes_episodetype=item['itunes_episodetype'],
+                    itunes_episode=item['itunes_episode'],
+                )
+
+
+def run(variant_names: List[str], local=False, source_url=SOURCE_URL) -> Dict[str, str]:
+    return AggregatorEngine([VARIANTS_BY_NAME[name] for name in variant_names], local, source_url).run()
+
+
+def run_all(data=None, context=None, local=False):
+    """
+    Cloud Function entry point building all nine aggregated feeds.
+    """
+    return AggregatorEngine(VARIANTS, local).run()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('variants', nargs='*',
+                        help=f'Variants to build, all of them by default: {", ".join(VARIANTS_BY_NAME)}')
+    parser.add_argument('--local', action='store_true', help='Read and write files under aggregations/ instead of GCS')
+    parser.add_argument('--source', default=SOURCE_URL, help='BeyondWords output feed')
+    args = parser.parse_args()
+    logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+    run(args.variants or list(VARIANTS_BY_NAME), args.local, args.source)
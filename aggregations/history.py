@@ -0,0 +1,105 @@
+"""
+Bounded history of the titles the daily and weekly aggregated feeds have picked.
+
+A Bloom filter remembers every title ever added, so exact lookups stay cheap however long the history gets. The most
+recent titles are also kept verbatim in a ring buffer, which the fuzzy comparison runs against. Both are serialized
+in a small binary format whose size doesn't depend on the number of titles added.
+"""
+import hashlib
+import struct
+from collections import deque
+from difflib import SequenceMatcher
+from typing import Iterable, List
+
+HISTORY_SIMILARITY_THRESHOLD = 0.9
+# 16 KiB with 7 hash functions: about 1 false positive per 10^5 lookups after 4000 titles, i.e. 10 years of daily
+# picks.
+BLOOM_FILTER_BITS = 1 << 17
+BLOOM_FILTER_HASHES = 7
+RING_BUFFER_SIZE = 512
+
+MAGIC = b'NLTH'
+VERSION = 1
+# Magic, version, bits and hashes of the Bloom filter, ring buffer capacity and number of titles in it.
+HEADER = struct.Struct('>4sBIBHH')
+TITLE_LENGTH = struct.Struct('>H')
+
+
+def is_similar(a, b):
+    matcher = SequenceMatcher(None, a, b)
+    # The quick ratios are upper bounds of ratio(), so most titles are rejected without computing it.
+    return matcher.real_quick_ratio() > HISTORY_SIMILARITY_THRESHOLD \
+        and matcher.quick_ratio() > HISTORY_SIMILARITY_THRESHOLD \
+        and matcher.ratio() > HISTORY_SIMILARITY_THRESHOLD
+
+
+class BloomFilter:
+    def __init__(self, bits: int = BLOOM_FILTER_BITS, hashes: int = BLOOM_FILTER_HASHES, data: bytes = None):
+        self.bits = bits
+        self.hashes = hashes
+        self.data = bytearray(data) if data is not None else bytearray(bits // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.sha256(key.encode('utf-8')).digest()
+        h1, h2 = struct.unpack_from('>QQ', digest)
+        # Double hashing: the k positions are h1 + i * h2.
+        return ((h1 + i * h2) % self.bits for i in range(self.hashes))
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self.data[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.data[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class TitleHistory:
+    """
+    Titles already picked by a daily or weekly aggregated feed.
+
+    A title is in the history if it was added verbatim, according to the Bloom filter, or if it is similar to one of
+    the last `ring_buffer_size` titles added, which covers the posts whose titles were edited after they were picked.
+    """
+
+    def __init__(self, titles: Iterable[str] = (), ring_buffer_size: int = RING_BUFFER_SIZE,
+                 bloom_filter: BloomFilter = None):
+        self.bloom_filter = bloom_filter or BloomFilter()
+        self.recent_titles = deque(maxlen=ring_buffer_size)
+        for title in titles:
+            self.add(title)
+
+    def add(self, title: str):
+        title = title.strip()
+        if title:
+            self.bloom_filter.add(title)
+            if title not in self.recent_titles:
+                self.recent_titles.append(title)
+
+    def __contains__(self, title: str) -> bool:
+        title = title.strip()
+        return title in self.bloom_filter or any(is_similar(title, recent) for recent in self.recent_titles)
+
+    def __iter__(self):
+        return iter(self.recent_titles)
+
+    def to_bytes(self) -> bytes:
+        titles: List[bytes] = [title.encode('utf-8') for title in self.recent_titles]
+        header = HEADER.pack(MAGIC, VERSION, self.bloom_filter.bits, self.bloom_filter.hashes,
+                             self.recent_titles.maxlen, len(titles))
+        return b''.join([header, bytes(self.bloom_filter.data), *(TITLE_LENGTH.pack(len(t)) + t for t in titles)])
+
+    @classmethod
+    def from_bytes(cls, content: bytes) -> 'TitleHistory':
+        magic, version, bits, hashes, ring_buffer_size, count = HEADER.unpack_from(content)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'Not a title history, or an unsupported version: {magic!r} {version}')
+        offset = HEADER.size
+        bloom_filter = BloomFilter(bits, hashes, content[offset:offset + bits // 8])
+        offset += bits // 8
+        history = cls(ring_buffer_size=ring_buffer_size, bloom_filter=bloom_filter)
+        for _ in range(count):
+            length, = TITLE_LENGTH.unpack_from(content, offset)
+            offset += TITLE_LENGTH.size
+            history.recent_titles.append(content[offset:offset + length].decode('utf-8'))
+            offset += length
+        return history
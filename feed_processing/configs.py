@@ -24,6 +24,14 @@ beyondwords_feed_namespaces = {
     'atom': 'http://www.w3.org/2005/Atom',
     'itunes': "http://www.itunes.com/dtds/podcast-1.0.dtd"
 }
+nonlinear_feed_namespaces = {
+    'nonlinear': 'https://www.nonlinear.org/rss'
+}
+
+# Karma of the posts of each forum, recorded by the BeyondWords input feed updaters.
+ea_karma_filename = 'nonlinear-library-EA-karma.jsonl'
+lw_karma_filename = 'nonlinear-library-LW-karma.jsonl'
+af_karma_filename = 'nonlinear-library-AF-karma.jsonl'
 
 
 def af_all_config():
@@ -57,7 +65,9 @@ def af_daily_config():
         search_period=PodcastProviderFeedConfig.SearchPeriod.ONE_DAY,
         gcp_bucket=gcp_bucket_newcode,
         rss_filename='nonlinear-library-aggregated-AF-daily.xml',
-        top_post_only=True
+        top_post_only=True,
+        karma_filename=af_karma_filename,
+        karma_gcp_bucket=os.environ.get("GCP_BUCKET_NAME")
     )
 
 
@@ -74,7 +84,9 @@ def af_weekly_config():
         search_period=PodcastProviderFeedConfig.SearchPeriod.ONE_WEEK,
         gcp_bucket=gcp_bucket_newcode,
         rss_filename='nonlinear-library-aggregated-AF-weekly.xml',
-        top_post_only=True
+        top_post_only=True,
+        karma_filename=af_karma_filename,
+        karma_gcp_bucket=os.environ.get("GCP_BUCKET_NAME")
     )
 
 
@@ -108,7 +120,9 @@ def ea_daily_config():
         title_prefix='EA - ',
         gcp_bucket=gcp_bucket_newcode,
         rss_filename='nonlinear-library-aggregated-EA-daily.xml',
-        top_post_only=True
+        top_post_only=True,
+        karma_filename=ea_karma_filename,
+        karma_gcp_bucket=os.environ.get("GCP_BUCKET_NAME")
     )
 
 
@@ -125,7 +139,9 @@ def ea_weekly_config():
         search_period=PodcastProviderFeedConfig.SearchPeriod.ONE_WEEK,
         gcp_bucket=gcp_bucket_newcode,
         rss_filename='nonlinear-library-aggregated-EA-weekly.xml',
-        top_post_only=True
+        top_post_only=True,
+        karma_filename=ea_karma_filename,
+        karma_gcp_bucket=os.environ.get("GCP_BUCKET_NAME")
     )
 
 
@@ -159,6 +175,8 @@ def lw_daily_config():
         gcp_bucket=os.environ["GCP_BUCKET_NAME"],
         rss_filename='nonlinear-library-aggregated-LW-daily.xml',
         top_post_only=True,
+        karma_filename=lw_karma_filename,
+        karma_gcp_bucket=os.environ.get("GCP_BUCKET_NAME"),
         removed_authors_file="removed_authors.txt"
     )
 
@@ -176,7 +194,9 @@ def lw_weekly_config():
         search_period=PodcastProviderFeedConfig.SearchPeriod.ONE_WEEK,
         gcp_bucket=gcp_bucket_newcode,
         rss_filename='nonlinear-library-aggregated-LW-weekly.xml',
-        top_post_only=True
+        top_post_only=True,
+        karma_filename=lw_karma_filename,
+        karma_gcp_bucket=os.environ.get("GCP_BUCKET_NAME")
     )
 
 
@@ -188,6 +208,7 @@ def beyondwords_ea_config():
         source='https://forum.effectivealtruism.org/feed.xml?view=community-rss&karmaThreshold=25',
         max_entries=30,
         rss_filename='nonlinear-library-EA.xml',
+        karma_filename=ea_karma_filename,
         relevant_feeds=['nonlinear-library-EA.xml',
                         'nonlinear-library-AF.xml',
                         'nonlinear-library-LW.xml'],
@@ -203,6 +224,7 @@ def beyondwords_af_config():
         source='https://www.alignmentforum.org/feed.xml?view=community-rss&karmaThreshold=0',
         max_entries=30,
         rss_filename='nonlinear-library-AF.xml',
+        karma_filename=af_karma_filename,
         relevant_feeds=['nonlinear-library-AF.xml',
                         'nonlinear-library-EA.xml',
                         'nonlinear-library-LW.xml'],
@@ -218,6 +240,7 @@ def beyondwords_lw_config():
         source='https://www.lesswrong.com/feed.xml?view=community-rss&karmaThreshold=30',
         max_entries=30,
         rss_filename='nonlinear-library-LW.xml',
+        karma_filename=lw_karma_filename,
         relevant_feeds=['nonlinear-library-LW.xml',
                         'nonlinear-library-AF.xml',
                         'nonlinear-library-EA.xml'],
@@ -1,11 +1,12 @@
 import logging
 import os
-import re
 import ssl
 
 import feedparser
 from bs4 import BeautifulSoup
 
+from feed_processing.feed_writer import RssWriter, open_local_feed
+
 
 def main_create_beyondwords_nonlinear_library_project_inputs(local: False):
     """Create an RSS file containing input from all three of the forums.
@@ -39,33 +40,6 @@ def main_create_beyondwords_nonlinear_library_project_inputs(local: False):
 
     print('ENTERING THE MAIN FUNCTION')
 
-    feed_initial_str = """<?xml version="1.0" encoding="{_encoding}"?>\
-        <rss xmlns:dc="{_namespaces_dc}" xmlns:content="{_namespaces_content}" \
-        xmlns:atom="{_namespaces_}" version="2.0"><channel><title><![CDATA[{_feed_title}]]></title>\
-        <description><![CDATA[{_feed_subtitle}]]></description><link>{_feed_link}</link>\
-        <image><url>https://res.cloudinary.com/lesswrong-2-0/image/upload/v1497915096/favicon_lncumn.ico</url>\
-        <title>{_feed_title}</title><link>{_feed_link}</link></image><generator>{_feed_generator}</generator>\
-        <lastBuildDate>{_feed_updated}</lastBuildDate><atom:link \
-        href="{_feed_titledetail_base}" \
-        rel="self" type="application/rss+xml"/>"""
-
-    item_str = """
-    <item>
-        <title>
-            <![CDATA[{item_web_short} - {item_title} by {item_author}]]>
-        </title>
-        <description>
-            <![CDATA[{item_summary}]]>
-        </description>
-        <link>{item_link}</link>
-        <guid isPermaLink="{item_guidislink}">{item_id}</guid>
-        <dc:creator><![CDATA[{item_author}]]></dc:creator>
-        <pubDate>{item_published}</pubDate>
-    </item>
-    """
-
-    feed_final_str = '</channel></rss>'
-
     intro_str = """ Welcome to The Nonlinear Library, where we use Text-to-Speech software to convert the best writing from the Rationalist and EA communities into audio. 
     This is: {item_title}, published by {item_author} on {item_date} on {item_web_long}. """
     outro_str = ' <p>Thanks for listening. To help us out with The Nonlinear Library or to learn more, please visit nonlinear.org. </p>'
@@ -135,94 +109,92 @@ def main_create_beyondwords_nonlinear_library_project_inputs(local: False):
         def _modify_feed(self, url, src_idx):
             print('ENTERING THE _modify_feed subFUNCTION')
             news_feed = feedparser.parse(url)
-            reg = "(?<=%s).*?(?=%s)" % ('rss&', 'karma')
-            r = re.compile(reg, re.DOTALL)
-
-            rss_feed = feed_initial_str.format(
-                _encoding=news_feed['encoding'].upper(),
-                _namespaces_dc=news_feed['namespaces']['dc'],
-                _namespaces_content=news_feed['namespaces']['content'],
-                _namespaces_=news_feed['namespaces'][''],
-                _feed_title=news_feed['feed']['title'],
-                _feed_subtitle=news_feed['feed']['subtitle'],
-                _feed_link=news_feed['feed']['link'],
-                _feed_generator=news_feed['feed']['generator'],
-                _feed_updated=news_feed['feed']['updated'],
-                _feed_titledetail_base=r.sub('amp;', news_feed['feed']['title_detail']['base'])
-            )
 
             # get website
             feed_web_short = find_website_short(news_feed['feed']['link'])
             feed_web_long = find_website_long(news_feed['feed']['link'])
 
-            for i in range(self.max_number):
-                # check if there are more entries available
-                if i == (len(news_feed.entries) - 1):
-                    break
-                # get new entry
-                item = news_feed.entries[i]
-                # check for cross-posts
-                if item['title'] in self.list_titles:
-                    continue
-                self.list_titles.append(item['title'])
-
-                # check for removed authors
-                if item['author'] in self.list_removed_authors:
-                    continue
-                # add author to feed title
-                authors_str = ''
-                for j, auth in enumerate(item['authors']):
-                    authors_str += auth['name'].replace('_', ' ')
-                    if j == (len(item['authors']) - 2):
-                        authors_str += ' and '
-                    elif j == (len(item['authors']) - 1):
-                        pass
-                    else:
-                        authors_str += ', '
-
-                item_content = item['summary']
-                item_content_html = BeautifulSoup(item_content, 'html.parser')
-                item_number_of_p_tags = len(item_content_html.find_all('p'))
-
-                if item_number_of_p_tags < 1 or len(item['summary']) <= 250:
-                    print(
-                        f'Skipping {feed_web_short} - {item["title"]}, due to very short content, likely a cross-post.')
-                    continue
-
-                # get date
-                item_date = item['summary'].split('<br /><br />')[0].split(':')[0][13:-2]  # TODO: make more robust
-                item_body_no_outro = '<br /><br />'.join([p for p in item['summary'].split('<br /><br />')[1:]])
-                last_str = '<br /><br /><a href="{}#comments">Discuss</a>'.format(item['link'])
-                item_body_with_outro = item_body_no_outro.split(last_str)[0] + outro_str + last_str
-                rss_feed += item_str.format(
-                    item_web_short=feed_web_short,
-                    item_title=item['title'],
-                    item_author=authors_str,
-                    item_summary=intro_str.format(
-                        item_title=item['title'], item_author=authors_str,
-                        item_date=item_date, item_web_long=feed_web_long) + \
-                                 '<br /><br />' + item_body_with_outro,  # TODO: make more robust
-                    item_link=item['link'],
-                    item_guidislink=str(item['guidislink']).lower(),
-                    item_id=item['id'] + f'_NL_{feed_web_short}',
-                    item_published=item['published']
-                )
-                item['title'] = f'{feed_web_short} - {item["title"]} by {authors_str}'
-
-            print('WRITING THE MODIFIED FEED TO AN XML FILE')
-
             filename = '{}-{}.xml'.format(self.output_file_basename, feed_web_short)
-
+            print('WRITING THE MODIFIED FEED TO AN XML FILE')
             if self.local:
-                with open(filename, 'w') as f:
-                    f.write(rss_feed + feed_final_str)
+                output = open_local_feed(filename)
             else:
                 from google.cloud import storage
                 client = storage.Client()
                 bucket = client.get_bucket(self.gcp_bucket_name)
-                blob = bucket.blob(filename)
                 print(f'Writing {filename} to {self.gcp_bucket_name}')
-                blob.upload_from_string(rss_feed + feed_final_str)
+                # The upload is cancelled if writing the feed fails, so the previous feed stays in place.
+                output = bucket.blob(filename).open('wb', ignore_flush=True)
+
+            nsmap = {
+                'dc': news_feed['namespaces']['dc'],
+                'content': news_feed['namespaces']['content'],
+                'atom': news_feed['namespaces'][''],
+            }
+            with output as f, RssWriter(f, nsmap, news_feed['encoding'].upper()) as writer:
+                writer.element('title', news_feed['feed']['title'], cdata=True)
+                writer.element('description', news_feed['feed']['subtitle'], cdata=True)
+                writer.element('link', news_feed['feed']['link'])
+                with writer.start('image'):
+                    writer.element('url', 'https://res.cloudinary.com/lesswrong-2-0/image/upload/v1497915096/favicon_lncumn.ico')
+                    writer.element('title', news_feed['feed']['title'])
+                    writer.element('link', news_feed['feed']['link'])
+                writer.element('generator', news_feed['feed']['generator'])
+                writer.element('lastBuildDate', news_feed['feed']['updated'])
+                writer.element('atom:link', href=news_feed['feed']['title_detail']['base'], rel='self',
+                               type='application/rss+xml')
+
+                for i in range(self.max_number):
+                    # check if there are more entries available
+                    if i == (len(news_feed.entries) - 1):
+                        break
+                    # get new entry
+                    item = news_feed.entries[i]
+                    # check for cross-posts
+                    if item['title'] in self.list_titles:
+                        continue
+                    self.list_titles.append(item['title'])
+
+                    # check for removed authors
+                    if item['author'] in self.list_removed_authors:
+                        continue
+                    # add author to feed title
+                    authors_str = ''
+                    for j, auth in enumerate(item['authors']):
+                        authors_str += auth['name'].replace('_', ' ')
+                        if j == (len(item['authors']) - 2):
+                            authors_str += ' and '
+                        elif j == (len(item['authors']) - 1):
+                            pass
+                        else:
+                            authors_str += ', '
+
+                    item_content = item['summary']
+                    item_content_html = BeautifulSoup(item_content, 'html.parser')
+                    item_number_of_p_tags = len(item_content_html.find_all('p'))
+
+                    if item_number_of_p_tags < 1 or len(item['summary']) <= 250:
+                        print(
+                            f'Skipping {feed_web_short} - {item["title"]}, due to very short content, likely a cross-post.')
+                        continue
+
+                    # get date
+                    item_date = item['summary'].split('<br /><br />')[0].split(':')[0][13:-2]  # TODO: make more robust
+                    item_body_no_outro = '<br /><br />'.join([p for p in item['summary'].split('<br /><br />')[1:]])
+                    last_str = '<br /><br /><a href="{}#comments">Discuss</a>'.format(item['link'])
+                    item_body_with_outro = item_body_no_outro.split(last_str)[0] + outro_str + last_str
+                    with writer.item():
+                        writer.element('title', f'{feed_web_short} - {item["title"]} by {authors_str}', cdata=True)
+                        writer.element('description', intro_str.format(
+                            item_title=item['title'], item_author=authors_str,
+                            item_date=item_date, item_web_long=feed_web_long) + \
+                                       '<br /><br />' + item_body_with_outro, cdata=True)  # TODO: make more robust
+                        writer.element('link', item['link'])
+                        writer.element('guid', item['id'] + f'_NL_{feed_web_short}',
+                                       isPermaLink=str(item['guidislink']).lower())
+                        writer.element('dc:creator', authors_str, cdata=True)
+                        writer.element('pubDate', item['published'])
+                    item['title'] = f'{feed_web_short} - {item["title"]} by {authors_str}'
 
             return news_feed
 
@@ -0,0 +1,176 @@
+import hashlib
+import json
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Sequence, Set
+
+import requests
+
+# Statuses of a node after a DagRunner run.
+RAN = 'ran'
+UNCHANGED = 'unchanged'
+FAILED = 'failed'
+UPSTREAM_FAILED = 'upstream_failed'
+
+# Seconds to wait for a source when checking its version, so a hung server doesn't hold up the whole cycle.
+URL_VERSION_TIMEOUT = 30
+
+
+@dataclass
+class Node:
+    """
+    Job in a DagRunner.
+
+    A node runs if one of its dependencies ran, if the version of one of its `inputs` changed since its last
+    successful run, or if it failed or couldn't run in the previous run. A node without dependencies and inputs always
+    runs. `run` may be None for a node that only detects changes, e.g. of a feed published by another service.
+    """
+    name: str
+    run: Callable[[], None] | None = None
+    deps: Sequence[str] = ()
+    # Functions returning a version of an input, e.g. `lambda: get_url_version(url)`. None means unknown, in which
+    # case the node runs.
+    inputs: Sequence[Callable[[], str | None]] = ()
+
+
+@dataclass
+class NodeResult:
+    name: str
+    status: str
+    started: float = 0.0
+    finished: float = 0.0
+    error: BaseException | None = None
+
+    @property
+    def duration(self) -> float:
+        return self.finished - self.started
+
+
+@dataclass
+class DagReport:
+    results: Dict[str, NodeResult]
+    critical_path: List[str] = field(default_factory=list)
+
+    def format(self) -> str:
+        lines = [f'{result.name}: {result.status} in {result.duration:.1f}s' for result in self.results.values()]
+        if self.critical_path:
+            finished = self.results[self.critical_path[-1]].finished
+            started = self.results[self.critical_path[0]].started
+            lines.append(f"Critical path ({finished - started:.1f}s): {' -> '.join(self.critical_path)}")
+        return '\n'.join(lines)
+
+
+def get_url_version(url: str) -> str | None:
+    """
+    Return the ETag or Last-Modified header of a URL, or the hash of its content if the server sends neither.
+    """
+    response = requests.head(url, allow_redirects=True, timeout=URL_VERSION_TIMEOUT)
+    version = response.headers.get('ETag') or response.headers.get('Last-Modified')
+    if version:
+        return version
+    response = requests.get(url, timeout=URL_VERSION_TIMEOUT)
+    response.raise_for_status()
+    return hashlib.sha256(response.content).hexdigest()
+
+
+class DagRunner:
+    """
+    Runs the nodes of a DAG on a thread pool, each one as soon as its dependencies have finished, and skips the nodes
+    whose inputs haven't changed.
+
+    The input versions seen by the last successful run of each node, and the nodes that failed or couldn't run
+    because a dependency failed, are kept in `state_filename` in the storage, if one is given, so unchanged inputs are
+    also detected across processes. Failed nodes run again in the next run even if their inputs haven't changed.
+    """
+
+    def __init__(self, nodes: List[Node], max_workers: int = 4, storage=None, state_filename: str = 'dag_state.json'):
+        self.nodes = {node.name: node for node in nodes}
+        for node in nodes:
+            unknown = set(node.deps) - set(self.nodes)
+            if unknown:
+                raise ValueError(f"Node '{node.name}' depends on unknown nodes: {', '.join(sorted(unknown))}")
+        self.max_workers = max_workers
+        self.storage = storage
+        self.state_filename = state_filename
+        self.versions: Dict[str, List[str | None]] = {}
+        self.failed: Set[str] = set()
+        self._load_state()
+        self._logger = logging.getLogger("DagRunner")
+
+    def _load_state(self):
+        content = self.storage.read_file(self.state_filename) if self.storage else None
+        if content:
+            state = json.loads(content)
+            self.versions = state['versions']
+            self.failed = set(state['failed'])
+
+    def _save_state(self):
+        if self.storage:
+            state = {'versions': self.versions, 'failed': sorted(self.failed)}
+            self.storage.write_file(self.state_filename, json.dumps(state, indent=2).encode('utf-8'))
+
+    def run(self) -> DagReport:
+        results: Dict[str, NodeResult] = {}
+        pending = dict(self.nodes)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            running = {}
+            while pending or running:
+                for name, node in list(pending.items()):
+                    if all(dep in results for dep in node.deps):
+                        del pending[name]
+                        running[executor.submit(self._run_node, node, results)] = name
+                if not running:
+                    raise ValueError(f"The nodes have a cycle: {', '.join(sorted(pending))}")
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    results[result.name] = result
+                    del running[future]
+
+        self.failed = {name for name, result in results.items() if result.status in (FAILED, UPSTREAM_FAILED)}
+        self._save_state()
+        report = DagReport({name: results[name] for name in self.nodes}, self.critical_path(results))
+        self._logger.info(report.format())
+        return report
+
+    def _run_node(self, node: Node, results: Dict[str, NodeResult]) -> NodeResult:
+        started = time.perf_counter()
+        dep_statuses = [results[dep].status for dep in node.deps]
+        if any(status in (FAILED, UPSTREAM_FAILED) for status in dep_statuses):
+            return NodeResult(node.name, UPSTREAM_FAILED, started, started)
+
+        try:
+            versions = [get_version() for get_version in node.inputs]
+            inputs_changed = None in versions or versions != self.versions.get(node.name)
+            retry = node.name in self.failed
+            if (node.deps or node.inputs) and RAN not in dep_statuses and not inputs_changed and not retry:
+                self._logger.info(f"Skipping '{node.name}', its inputs haven't changed")
+                return NodeResult(node.name, UNCHANGED, started, time.perf_counter())
+            if node.run is not None:
+                self._logger.info(f"Running '{node.name}'")
+                node.run()
+        except Exception as e:
+            self._logger.exception(f"'{node.name}' failed")
+            return NodeResult(node.name, FAILED, started, time.perf_counter(), e)
+
+        self.versions[node.name] = versions
+        return NodeResult(node.name, RAN, started, time.perf_counter())
+
+    def critical_path(self, results: Dict[str, NodeResult]) -> List[str]:
+        """
+        Return the chain of nodes that determined when the run finished: the node that finished last, the dependency
+        it waited for longest, and so on.
+        """
+        ran = {name: result for name, result in results.items() if result.status != UPSTREAM_FAILED}
+        if not ran:
+            return []
+        name = max(ran, key=lambda n: ran[n].finished)
+        path = [name]
+        while True:
+            deps = [dep for dep in self.nodes[name].deps if dep in ran]
+            if not deps:
+                return list(reversed(path))
+            name = max(deps, key=lambda dep: ran[dep].finished)
+            path.append(name)
@@ -0,0 +1,246 @@
+import copy
+import hashlib
+import logging
+import os
+import sqlite3
+import tempfile
+from typing import Callable, Iterable, List
+
+from lxml import etree
+from lxml.etree import Element
+
+from feed_processing.feed_item import FORUM_PREFIX_PATTERN, get_item_author, get_item_guid, get_item_pub_date, \
+    normalize_title
+from feed_processing.storage import StorageInterface, VersionConflictError
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    guid TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    normalized_title TEXT NOT NULL,
+    forum TEXT,
+    author TEXT,
+    pub_date INTEGER,
+    enclosure TEXT,
+    description_hash TEXT
+);
+CREATE INDEX IF NOT EXISTS items_normalized_title ON items (normalized_title);
+CREATE INDEX IF NOT EXISTS items_forum_pub_date ON items (forum, pub_date);
+
+CREATE TABLE IF NOT EXISTS feeds (
+    name TEXT PRIMARY KEY,
+    channel BLOB NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS feed_items (
+    feed TEXT NOT NULL REFERENCES feeds (name),
+    guid TEXT NOT NULL REFERENCES items (guid),
+    position INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    xml BLOB NOT NULL,
+    PRIMARY KEY (feed, position)
+);
+CREATE INDEX IF NOT EXISTS feed_items_guid ON feed_items (guid);
+CREATE INDEX IF NOT EXISTS feed_items_title ON feed_items (feed, title);
+"""
+
+
+class EpisodeStore:
+    """
+    SQLite database of the episodes and of the feeds they are published in, kept as a single file in a
+    StorageInterface. `items` holds one row per post, `feed_items` holds the item of every feed the post is in, as it
+    is rendered in that feed.
+
+    Feeds are rendered from the store instead of being parsed from their XML files, and duplicates are found with
+    indexed lookups instead of scanning every title of the accumulated feeds. The first time a feed is used, it is
+    imported from its XML file.
+
+    The store only covers deduplication and rendering. The karma of the posts, and so the top post selection, is kept
+    in the PostKarmaStore, and episodes are never unpublished, so `items` has no karma or status column.
+
+    The file is read on `load()` and written back on `save()`. If another run saved the file in the meantime, the save
+    reloads it and applies the changes again through its `reapply` callback, or fails with a VersionConflictError,
+    instead of dropping that run's episodes. The store is a context manager that closes it on exit.
+    """
+
+    def __init__(self, storage: StorageInterface, filename: str = "episodes.sqlite"):
+        self.storage = storage
+        self.filename = filename
+        self._connection = None
+        self._path = None
+        self._version = None
+        self._logger = logging.getLogger("EpisodeStore")
+        self._parser = etree.XMLParser(strip_cdata=False, remove_blank_text=True)
+
+    def load(self):
+        # The version is looked up first, so a change made while the file is read is detected on save.
+        self._version = self.storage.get_version(self.filename)
+        content = self.storage.read_file(self.filename)
+        fd, self._path = tempfile.mkstemp(suffix='.sqlite')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content or b'')
+        self._connection = sqlite3.connect(self._path)
+        self._connection.executescript(SCHEMA)
+        count = self._connection.execute('SELECT COUNT(*) FROM items').fetchone()[0]
+        self._logger.info(f"Loaded {count} episodes from '{self.filename}'")
+        return self
+
+    def save(self, reapply: Callable[[], None] = None, attempts: int = 3):
+        """
+        Write the store back to the storage.
+
+        Args:
+            reapply: Makes this run's changes again. If another run saved the store since it was loaded, the store
+                is loaded again with that run's changes, `reapply` is called and the save is retried. Without it, the
+                VersionConflictError is raised right away.
+            attempts: Number of saves before the VersionConflictError is raised.
+        """
+        for attempt in range(1, attempts + 1):
+            self._connection.commit()
+            try:
+                with open(self._path, 'rb') as f:
+                    self._version = self.storage.write_file_if_unchanged(self.filename, f.read(), self._version)
+            except VersionConflictError:
+                if reapply is None or attempt == attempts:
+                    raise
+                self._logger.warning(f"'{self.filename}' was saved by another run, reloading it to apply the changes "
+                                     f"again")
+                self.close()
+                self.load()
+                reapply()
+            else:
+                self._logger.info(f"Saved the episodes to '{self.filename}'")
+                return
+
+    def close(self):
+        self._connection.close()
+        os.remove(self._path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def has_feed(self, feed_name: str) -> bool:
+        return self._connection.execute('SELECT 1 FROM feeds WHERE name = ?', (feed_name,)).fetchone() is not None
+
+    def count(self, feed_name: str) -> int:
+        return self._connection.execute('SELECT COUNT(*) FROM feed_items WHERE feed = ?', (feed_name,)).fetchone()[0]
+
+    def ensure_feed(self, feed_name: str, read_feed: Callable[[], Element]):
+        """
+        Import the feed returned by `read_feed` if the store doesn't have it yet.
+        """
+        if not self.has_feed(feed_name):
+            feed = read_feed()
+            self.set_channel(feed_name, feed)
+            self.append_items(feed_name, feed.findall('channel/item'))
+            self._logger.info(f"Imported {self.count(feed_name)} episodes of '{feed_name}'")
+
+    def set_channel(self, feed_name: str, feed: Element):
+        """
+        Store the channel of a feed, i.e. everything but its items.
+        """
+        rss = etree.Element(feed.tag, feed.attrib, nsmap=feed.nsmap)
+        channel = etree.SubElement(rss, 'channel')
+        for child in feed.find('channel'):
+            if child.tag != 'item':
+                channel.append(copy.deepcopy(child))
+        self._connection.execute(
+            'INSERT INTO feeds (name, channel) VALUES (?, ?) '
+            'ON CONFLICT (name) DO UPDATE SET channel = excluded.channel',
+            (feed_name, etree.tostring(rss, encoding='utf-8'))
+        )
+
+    def contains_title(self, feed_name: str, title: str) -> bool:
+        return self._connection.execute(
+            'SELECT 1 FROM feed_items WHERE feed = ? AND title = ?', (feed_name, title.strip())
+        ).fetchone() is not None
+
+    def contains_post(self, feed_names: Iterable[str], title: str, author: str = None) -> bool:
+        """
+        Return True if the post is published in any of the feeds, whether or not its title has the forum prefix and
+        the author suffix.
+
+        Titles are compared after `normalize_title`, i.e. ignoring case and runs of whitespace. This is narrower than
+        `item_title_is_duplicate`, which also takes a title as published if it is contained in any published title,
+        so a short title like `AI` no longer matches every post whose title contains it.
+        """
+        feed_names = list(feed_names)
+        if not feed_names:
+            return False
+        placeholders = ', '.join('?' * len(feed_names))
+        return self._connection.execute(
+            f'SELECT 1 FROM items JOIN feed_items USING (guid) '
+            f'WHERE items.normalized_title = ? AND feed_items.feed IN ({placeholders})',
+            (normalize_title(title, author), *feed_names)
+        ).fetchone() is not None
+
+    def append_items(self, feed_name: str, items: Iterable[Element]) -> List[Element]:
+        """
+        Append the items whose titles aren't in the feed yet, and return them.
+        """
+        position = self._connection.execute(
+            'SELECT COALESCE(MAX(position), -1) FROM feed_items WHERE feed = ?', (feed_name,)
+        ).fetchone()[0]
+        appended_items = []
+        for item in items:
+            title = item.findtext('title').strip()
+            if self.contains_title(feed_name, title):
+                continue
+            guid = self._put_item(item)
+            position += 1
+            self._connection.execute(
+                'INSERT INTO feed_items (feed, guid, position, title, xml) VALUES (?, ?, ?, ?, ?)',
+                (feed_name, guid, position, title, etree.tostring(item, encoding='utf-8', with_tail=False))
+            )
+            appended_items.append(item)
+            self._logger.info(f"New item titled '{title}' found.")
+        return appended_items
+
+    def render(self, feed_name: str) -> Element:
+        """
+        Return the feed with its items in the order they were appended.
+        """
+        channel_xml, = self._connection.execute('SELECT channel FROM feeds WHERE name = ?', (feed_name,)).fetchone()
+        rss = etree.fromstring(channel_xml, self._parser)
+        channel = rss.find('channel')
+        rows = self._connection.execute(
+            'SELECT xml FROM feed_items WHERE feed = ? ORDER BY position', (feed_name,)
+        )
+        for item_xml, in rows:
+            channel.append(etree.fromstring(item_xml, self._parser))
+        return rss
+
+    def _put_item(self, item: Element) -> str:
+        guid = get_item_guid(item)
+        title = item.findtext('title').strip()
+        author = get_item_author(item)
+        enclosure = item.find('enclosure')
+        description = item.findtext('description') or ''
+        prefix = FORUM_PREFIX_PATTERN.match(title)
+        self._connection.execute(
+            'INSERT OR IGNORE INTO items (guid, title, normalized_title, forum, author, pub_date, enclosure, '
+            'description_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (
+                guid,
+                title,
+                normalize_title(title, author),
+                prefix.group(1) if prefix else None,
+                author,
+                get_item_pub_date(item),
+                enclosure.get('url') if enclosure is not None else None,
+                hashlib.sha256(description.encode('utf-8')).hexdigest(),
+            )
+        )
+        return guid
+
+
+def open_episode_store(storage: StorageInterface) -> EpisodeStore | None:
+    """
+    Return the loaded EpisodeStore named by the `EPISODE_STORE` environment variable, e.g. `episodes.sqlite`, or None
+    if it isn't set, in which case the feeds are read from and deduplicated against their XML files.
+    """
+    filename = os.environ.get("EPISODE_STORE")
+    return EpisodeStore(storage, filename).load() if filename else None
@@ -28,6 +28,9 @@ class PodcastProviderFeedConfig(BaseFeedConfig):
     title_prefix: str = None
     date_format: str = '%a, %d %b %Y %H:%M:%S %z'
     top_post_only: bool = False
+    # PostKarmaStore written by the BeyondWords input feed updater, used to pick the top post without scraping.
+    karma_filename: str = None
+    karma_gcp_bucket: str = None
 
     def get_search_period_timedelta(self) -> timedelta | None:
         """
@@ -50,3 +53,5 @@ class BeyondWordsInputConfig(BaseFeedConfig):
     max_entries: int
     relevant_feeds: list = None,
     min_chars: int = 250
+    # PostKarmaStore where the karma of the source posts is recorded.
+    karma_filename: str = None
@@ -0,0 +1,155 @@
+import re
+from email.utils import parsedate_to_datetime
+
+from lxml.etree import CDATA, Element, SubElement
+
+from feed_processing.configs import beyondwords_feed_namespaces
+
+# Prefix that `prepend_website_abbreviation_to_feed_item_titles` puts in front of the post titles.
+FORUM_PREFIX_PATTERN = re.compile(r'^(EA|LW|AF|Unknown) - ')
+
+# Value of a lazily parsed FeedItem field that hasn't been looked up yet.
+_UNSET = object()
+
+
+def normalize_title(title: str, author: str = None) -> str:
+    """
+    Return the title of a post without the forum prefix and the `by <author>` suffix the feeds add to it, so the same
+    post has the same normalized title in every feed.
+    """
+    title = FORUM_PREFIX_PATTERN.sub('', ' '.join(title.split()))
+    if author:
+        suffix = f' by {" ".join(author.split())}'
+        if title.endswith(suffix):
+            title = title[:-len(suffix)]
+    return title.casefold()
+
+
+def get_item_author(item: Element) -> str | None:
+    author = item.findtext('author') or item.findtext('dc:creator', namespaces=beyondwords_feed_namespaces)
+    return ' '.join(author.split()) if author else None
+
+
+def get_item_guid(item: Element) -> str:
+    return (item.findtext('guid') or item.findtext('link') or item.findtext('title')).strip()
+
+
+def get_item_pub_date(item: Element) -> int | None:
+    try:
+        return int(parsedate_to_datetime(item.findtext('pubDate')).timestamp())
+    except (TypeError, ValueError):
+        return None
+
+
+def find_website(url, short=True):
+    website = 'Unknown'
+    if 'forum.effectivealtruism.org' in url:
+        website = 'EA' if short else 'The Effective Altruism Forum'
+    elif 'lesswrong.com' in url:
+        website = 'LW' if short else "LessWrong"
+    elif 'alignmentforum.org' in url:
+        website = 'AF' if short else "The AI Alignment Forum"
+
+    return website
+
+
+class FeedItem:
+    """
+    Fields of a feed item, each looked up from its element the first time it is read and then kept, so a loop over
+    the items doesn't search every element again for each field it needs, and doesn't parse the fields it doesn't
+    need, e.g. the pubDate when it only compares titles. The element is kept to write the item back as it is, and
+    the setters change both.
+
+    Attributes:
+        pub_date: Publication time in seconds since the epoch, or None if the item has no valid pubDate.
+        normalized_title: Title as returned by `normalize_title`, to compare titles across feeds.
+        forum: Abbreviation of the forum the post is from, e.g. `EA`, from the title prefix or else from the link.
+    """
+    __slots__ = ('element', '_guid', '_title', '_normalized_title', '_forum', '_author', '_link', '_pub_date',
+                 '_description')
+
+    def __init__(self, element: Element):
+        self.element = element
+        self._guid = self._title = self._normalized_title = self._forum = _UNSET
+        self._author = self._link = self._pub_date = self._description = _UNSET
+
+    @classmethod
+    def from_element(cls, element: Element) -> "FeedItem":
+        return cls(element)
+
+    @property
+    def guid(self) -> str:
+        if self._guid is _UNSET:
+            self._guid = get_item_guid(self.element)
+        return self._guid
+
+    @property
+    def title(self) -> str:
+        if self._title is _UNSET:
+            self._title = (self.element.findtext('title') or '').strip()
+        return self._title
+
+    @property
+    def normalized_title(self) -> str:
+        if self._normalized_title is _UNSET:
+            self._normalized_title = normalize_title(self.title, self.author)
+        return self._normalized_title
+
+    @property
+    def forum(self) -> str | None:
+        if self._forum is _UNSET:
+            match = FORUM_PREFIX_PATTERN.match(self.title)
+            if match:
+                self._forum = match.group(1)
+            else:
+                self._forum = find_website(self.link) if self.link else None
+        return self._forum
+
+    @property
+    def author(self) -> str | None:
+        if self._author is _UNSET:
+            self._author = get_item_author(self.element)
+        return self._author
+
+    @property
+    def link(self) -> str | None:
+        if self._link is _UNSET:
+            link = self.element.findtext('link')
+            self._link = link.strip() if link else None
+        return self._link
+
+    @property
+    def pub_date(self) -> int | None:
+        if self._pub_date is _UNSET:
+            self._pub_date = get_item_pub_date(self.element)
+        return self._pub_date
+
+    @property
+    def description(self) -> str | None:
+        if self._description is _UNSET:
+            self._description = self.element.findtext('description')
+        return self._description
+
+    def set_title(self, title: str, cdata: bool = False):
+        self._title = title
+        # Derived from the title, looked up again when next read.
+        self._normalized_title = self._forum = _UNSET
+        self.element.find('title').text = CDATA(title) if cdata else title
+
+    def set_author(self, author: str):
+        """
+        Set the `author` element of the item, adding it if there is none.
+        """
+        element = self.element.find('author')
+        if element is None:
+            element = SubElement(self.element, 'author')
+        element.text = author
+        self._author = ' '.join(author.split())
+        self._normalized_title = _UNSET
+
+    def set_description(self, description: str):
+        """
+        Set the text of the `description` element of the item as CDATA, so the HTML in it is kept as it is.
+        """
+        self.element.find('description').text = CDATA(description)
+        self._description = description
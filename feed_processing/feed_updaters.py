@@ -1,17 +1,22 @@
 import logging
-from functools import reduce
+from contextlib import ExitStack
+from functools import partial, reduce
 
 from lxml import etree
 
 from feed_processing.configs import beyondwords_feed_namespaces
+from feed_processing.episode_store import open_episode_store
 from feed_processing.feed_config import PodcastProviderFeedConfig, BeyondWordsInputConfig
+from feed_processing.metrics import track_run, count_items
+from feed_processing.post_karma_store import PostKarmaStore, open_post_karma_store
 from feed_processing.storage import create_storage
 from feed_processing.utils import save_feed, get_feed_tree_from_url, filter_entries_by_forum_title_prefix, \
     filter_entries_by_search_period, filter_top_post, add_link_to_original_article_to_feed_items_description, \
     append_new_items_to_feed, update_feed_datum, get_titles_from_feed, remove_items_also_found_in_other_relevant_files, \
     add_author_tag_to_feed_items, remove_posts_without_paragraphs_in_description, \
     remove_posts_with_less_than_the_minimum_characters_in_description, edit_item_description, \
-    prepend_website_abbreviation_to_feed_item_titles, append_author_to_item_titles, remove_items_from_removed_authors
+    prepend_website_abbreviation_to_feed_item_titles, append_author_to_item_titles, remove_items_from_removed_authors, \
+    get_post_karma, get_feed, remove_items_published_in_feeds, add_karma_to_feed_items, get_feed_items
 
 
 def update_podcast_provider_feed(
@@ -31,23 +36,82 @@ def update_podcast_provider_feed(
 
     logger = logging.getLogger(f"function:{update_podcast_provider_feed.__name__}")
 
-    feed = get_feed_tree_from_url(feed_config.source)
+    with track_run(update_podcast_provider_feed.__name__, rss_filename=feed_config.rss_filename) as metrics, \
+            ExitStack() as resources:
+        with metrics.stage("fetch_source") as stage:
+            feed = get_feed_tree_from_url(feed_config.source)
+            # Shared by the stages below, which remove the items they filter out from both the feed and the list.
+            items = get_feed_items(feed)
+            stage.items = len(items)
+
+        # Apply filters and formatting to the feed items.
+        with metrics.stage("filter") as stage:
+            feed = filter_entries_by_forum_title_prefix(feed, feed_config.title_prefix, items=items)
+            if feed_config.search_period:
+                feed = filter_entries_by_search_period(feed, feed_config, items=items)
+            stage.items = len(items)
+        if feed_config.top_post_only:
+            with metrics.stage("top_post") as stage:
+                karma_store = open_post_karma_store(feed_config, running_on_gcp)
+                feed = filter_top_post(feed, get_post_karma, karma_store, items=items)
+                stage.items = len(items)
+        with metrics.stage("remove_authors") as stage:
+            feed = remove_items_from_removed_authors(feed, feed_config, running_on_gcp, items=items)
+            stage.items = len(items)
+        with metrics.stage("rewrite_descriptions") as stage:
+            feed = add_link_to_original_article_to_feed_items_description(feed, items=items)
+            stage.items = len(items)
+
+        # Add new items to the podcast apps feed.
+        with metrics.stage("read_storage") as stage:
+            storage = create_storage(feed_config, running_on_gcp)
+            episode_store = open_episode_store(storage)
+            if episode_store is None:
+                feed_for_podcast_apps = storage.read_podcast_feed()
+                stage.items = count_items(feed_for_podcast_apps)
+            else:
+                # Closed however the run ends, so a failed run doesn't leave its temporary copy behind.
+                resources.enter_context(episode_store)
+                episode_store.ensure_feed(feed_config.rss_filename, storage.read_podcast_feed)
+                stage.items = episode_store.count(feed_config.rss_filename)
+        with metrics.stage("append_items") as stage:
+            items_from_beyondwords_output_feed = [item.element for item in items]
+            if episode_store is None:
+                new_items, feed = append_new_items_to_feed(items_from_beyondwords_output_feed, feed_for_podcast_apps)
+            else:
+                new_items = episode_store.append_items(feed_config.rss_filename, items_from_beyondwords_output_feed)
+                feed = episode_store.render(feed_config.rss_filename)
+            stage.items = len(new_items)
+
+        with metrics.stage("update_metadata"):
+            feed = _update_podcast_provider_feed_metadata(feed, feed_config)
+
+        if not new_items:
+            logger.info("No new items to add to podcast provider feed input feed.")
+        else:
+            logger.info(f"Adding {len(new_items)} items to the podcast provider feed in {feed_config.rss_filename}")
+
+        with metrics.stage("upload") as stage:
+            # The store is saved before the feed is published, so a published episode is always in the store the
+            # next run renders the feed from.
+            if episode_store is not None:
+                def append_to_reloaded_store():
+                    nonlocal feed
+                    episode_store.ensure_feed(feed_config.rss_filename, storage.read_podcast_feed)
+                    episode_store.append_items(feed_config.rss_filename, items_from_beyondwords_output_feed)
+                    feed = _update_podcast_provider_feed_metadata(
+                        episode_store.render(feed_config.rss_filename), feed_config)
+                    episode_store.set_channel(feed_config.rss_filename, feed)
+
+                episode_store.set_channel(feed_config.rss_filename, feed)
+                episode_store.save(reapply=append_to_reloaded_store)
+            save_feed(feed, storage)
+            stage.items = count_items(feed)
 
-    # Apply filters and formatting to the feed items.
-    feed = filter_entries_by_forum_title_prefix(feed, feed_config.title_prefix)
-    if feed_config.search_period:
-        feed = filter_entries_by_search_period(feed, feed_config)
-    if feed_config.top_post_only:
-        feed = filter_top_post(feed)
-    feed = remove_items_from_removed_authors(feed, feed_config, running_on_gcp)
-    feed = add_link_to_original_article_to_feed_items_description(feed)
+    return feed
 
-    # Add new items to the podcast apps feed.
-    storage = create_storage(feed_config, running_on_gcp)
-    feed_for_podcast_apps = storage.read_podcast_feed()
-    items_from_beyondwords_output_feed = feed.findall("channel/item")
-    new_items, feed = append_new_items_to_feed(items_from_beyondwords_output_feed, feed_for_podcast_apps)
 
+def _update_podcast_provider_feed_metadata(feed, feed_config: PodcastProviderFeedConfig):
     # Update feed meta-data
     feed = update_feed_datum(feed, "channel/title", feed_config.title)
     feed = update_feed_datum(feed, "channel/description", feed_config.description)
@@ -84,13 +148,6 @@ def update_podcast_provider_feed(
         else:
             feed_itunes_image.attrib["href"] = feed_config.image_url
 
-    if not new_items:
-        logger.info("No new items to add to podcast provider feed input feed.")
-    else:
-        logger.info(f"Adding {len(new_items)} items to the podcast provider feed in {feed_config.rss_filename}")
-
-    save_feed(feed, storage)
-
     return feed
 
 
@@ -105,51 +162,113 @@ def update_beyondwords_input_feed(config: BeyondWordsInputConfig, running_on_gcp
     """
     logger = logging.getLogger(f"function:{update_beyondwords_input_feed.__name__}")
 
-    feed = get_feed_tree_from_url(config.source)
-
-    # Peek into other relevant feeds and retrieve the titles.
-    def concatenate_item_titles(previous_titles, next_feed_filename):
-        return previous_titles + get_titles_from_feed(next_feed_filename, config, running_on_gcp)
-
-    titles_from_other_feeds = reduce(concatenate_item_titles, config.relevant_feeds, [])
-
-    # Remove duplicates from other relevant feeds.
-    feed = remove_items_also_found_in_other_relevant_files(feed, titles_from_other_feeds)
-
-    # The author tag is used to remove posts from removed authors, append it to each item
-    feed = add_author_tag_to_feed_items(feed)
-
-    # Remove items that are too short.
-    feed = remove_posts_without_paragraphs_in_description(feed)
-    feed = remove_posts_with_less_than_the_minimum_characters_in_description(feed, config.min_chars)
-
-    # Appends intro and outro to description and creates content tag if not present.
-    # Create content tag.
-    feed = edit_item_description(feed)
-
-    feed = remove_items_from_removed_authors(feed, config, running_on_gcp)
-
-    # Modify item titles by prepending the forum abbreviation
-    feed = prepend_website_abbreviation_to_feed_item_titles(feed)
-
-    # Modify item titles by appending 'by <author>'
-    feed = append_author_to_item_titles(feed)
-
-    new_feed_items = feed.findall('channel/item')
-
-    if not new_feed_items:
-        logger.info("No new items to add to BeyondWords input feed.")
-
-    # Append new items to feed
-    storage = create_storage(config, running_on_gcp)
-    beyondwords_input_feed = storage.read_podcast_feed()
-    new_items, feed = append_new_items_to_feed(new_feed_items, beyondwords_input_feed)
-
-    if not new_items:
-        logger.info("No new items to add to BeyondWords input feed.")
-    else:
-        logger.info(f"Adding {len(new_items)} to the BeyondWords input feed in {config.rss_filename}")
-
-    save_feed(beyondwords_input_feed, storage)
+    with track_run(update_beyondwords_input_feed.__name__, rss_filename=config.rss_filename) as metrics, \
+            ExitStack() as resources:
+        with metrics.stage("fetch_source") as stage:
+            feed = get_feed_tree_from_url(config.source)
+            # Shared by the stages below, which remove the items they filter out from both the feed and the list.
+            items = get_feed_items(feed)
+            stage.items = len(items)
+
+        # Peek into other relevant feeds and retrieve the titles.
+        def concatenate_item_titles(previous_titles, next_feed_filename):
+            return previous_titles + get_titles_from_feed(next_feed_filename, config, running_on_gcp)
+
+        with metrics.stage("read_relevant_feeds") as stage:
+            storage = create_storage(config, running_on_gcp)
+            episode_store = open_episode_store(storage)
+            if episode_store is None:
+                titles_from_other_feeds = reduce(concatenate_item_titles, config.relevant_feeds, [])
+                stage.items = len(titles_from_other_feeds)
+            else:
+                resources.enter_context(episode_store)
+                relevant_feeds = [filename for filename in config.relevant_feeds or [] if filename]
+                for filename in relevant_feeds:
+                    episode_store.ensure_feed(filename, partial(get_feed, filename, config, running_on_gcp))
+                stage.items = sum(episode_store.count(filename) for filename in relevant_feeds)
+
+        # Record the karma of the posts now, so the daily and weekly feeds can pick their top post without scraping.
+        karma_store = None
+        if config.karma_filename:
+            with metrics.stage("record_karma") as stage:
+                karma_store = PostKarmaStore(storage, config.karma_filename).load()
+                stage.items = add_karma_to_feed_items(feed, karma_store, items=items)
+
+        with metrics.stage("filter") as stage:
+            # Remove duplicates from other relevant feeds.
+            if episode_store is None:
+                feed = remove_items_also_found_in_other_relevant_files(feed, titles_from_other_feeds, items=items)
+            else:
+                feed = remove_items_published_in_feeds(feed, episode_store, relevant_feeds, items=items)
+
+            # The author tag is used to remove posts from removed authors, append it to each item
+            feed = add_author_tag_to_feed_items(feed, items=items)
+
+            # Remove items that are too short.
+            feed = remove_posts_without_paragraphs_in_description(feed, items=items)
+            feed = remove_posts_with_less_than_the_minimum_characters_in_description(feed, config.min_chars,
+                                                                                     items=items)
+            stage.items = len(items)
+
+        with metrics.stage("rewrite_descriptions") as stage:
+            # Appends intro and outro to description and creates content tag if not present.
+            # Create content tag.
+            feed = edit_item_description(feed, items=items)
+            stage.items = len(items)
+
+        with metrics.stage("remove_authors") as stage:
+            feed = remove_items_from_removed_authors(feed, config, running_on_gcp, items=items)
+            stage.items = len(items)
+
+        with metrics.stage("rewrite_titles") as stage:
+            # Modify item titles by prepending the forum abbreviation
+            feed = prepend_website_abbreviation_to_feed_item_titles(feed, items=items)
+
+            # Modify item titles by appending 'by <author>'
+            feed = append_author_to_item_titles(feed, items=items)
+
+            new_feed_items = [item.element for item in items]
+            stage.items = len(new_feed_items)
+
+        if not new_feed_items:
+            logger.info("No new items to add to BeyondWords input feed.")
+
+        # Append new items to feed
+        with metrics.stage("read_storage") as stage:
+            if episode_store is None:
+                beyondwords_input_feed = storage.read_podcast_feed()
+                stage.items = count_items(beyondwords_input_feed)
+            else:
+                episode_store.ensure_feed(config.rss_filename, storage.read_podcast_feed)
+                stage.items = episode_store.count(config.rss_filename)
+        with metrics.stage("append_items") as stage:
+            if episode_store is None:
+                new_items, feed = append_new_items_to_feed(new_feed_items, beyondwords_input_feed)
+            else:
+                new_items = episode_store.append_items(config.rss_filename, new_feed_items)
+                beyondwords_input_feed = feed = episode_store.render(config.rss_filename)
+            stage.items = len(new_items)
+
+        if not new_items:
+            logger.info("No new items to add to BeyondWords input feed.")
+        else:
+            logger.info(f"Adding {len(new_items)} to the BeyondWords input feed in {config.rss_filename}")
+
+        with metrics.stage("upload") as stage:
+            # The store is saved before the feed is published, so a published episode is always in the store the
+            # next run renders the feed from.
+            if episode_store is not None:
+                def append_to_reloaded_store():
+                    nonlocal beyondwords_input_feed, feed
+                    episode_store.ensure_feed(config.rss_filename, storage.read_podcast_feed)
+                    episode_store.append_items(config.rss_filename, new_feed_items)
+                    beyondwords_input_feed = feed = episode_store.render(config.rss_filename)
+
+                episode_store.save(reapply=append_to_reloaded_store)
+            save_feed(beyondwords_input_feed, storage)
+            if karma_store is not None:
+                karma_store.retain(guid.text for guid in beyondwords_input_feed.findall('channel/item/guid') if guid.text)
+                karma_store.save()
+            stage.items = count_items(beyondwords_input_feed)
 
     return feed
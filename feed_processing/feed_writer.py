@@ -0,0 +1,171 @@
+import os
+import re
+from contextlib import ExitStack, contextmanager
+from typing import BinaryIO, Dict
+
+from lxml import etree
+
+# Characters that are not allowed anywhere in an XML 1.0 document.
+INVALID_XML_CHARS_PATTERN = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+
+def xml_text(value) -> str:
+    return INVALID_XML_CHARS_PATTERN.sub('', str(value))
+
+
+class RssWriter:
+    """
+    Streams an RSS document into a binary file object with `lxml.etree.xmlfile`, so only the element being written is
+    held in memory and every text and attribute is escaped.
+
+    Tags may use the prefixes of `nsmap`, e.g. `itunes:title`. Elements written outside of `item()` are children of
+    the channel.
+
+    Example:
+        with open('feed.xml', 'wb') as f, RssWriter(f, {'itunes': ITUNES_NAMESPACE}) as writer:
+            writer.element('title', 'The Nonlinear Library')
+            with writer.item():
+                writer.element('title', entry.title)
+                writer.element('description', entry.summary, cdata=True)
+    """
+
+    def __init__(self, output: BinaryIO, nsmap: Dict[str, str] = None, encoding: str = 'UTF-8'):
+        self.output = output
+        self.nsmap = nsmap or {}
+        self.encoding = encoding
+        self._xf = None
+        self._exit_stack = None
+
+    def __enter__(self):
+        self._exit_stack = ExitStack()
+        self._xf = self._exit_stack.enter_context(etree.xmlfile(self.output, encoding=self.encoding))
+        self._xf.write_declaration()
+        self._exit_stack.enter_context(self._xf.element('rss', nsmap=self.nsmap, version='2.0'))
+        self._exit_stack.enter_context(self._xf.element('channel'))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self._exit_stack.__exit__(exc_type, exc_value, traceback)
+
+    def qname(self, tag: str) -> str:
+        prefix, _, local_name = tag.rpartition(':')
+        return f'{{{self.nsmap[prefix]}}}{local_name}' if prefix else tag
+
+    @contextmanager
+    def start(self, tag: str, /, **attrib):
+        """
+        Open an element whose children are written inside the `with` block.
+        """
+        with self._xf.element(self.qname(tag), {name: xml_text(value) for name, value in attrib.items()}):
+            yield
+
+    def item(self):
+        return self.start('item')
+
+    def element(self, tag: str, text=None, /, *, cdata: bool = False, **attrib):
+        """
+        Write an element without children. With `cdata`, the text is written as a CDATA section unless it contains
+        the `]]>` terminator, in which case it is escaped instead. Keyword arguments, `text` included, are attributes.
+        """
+        with self.start(tag, **attrib):
+            if text is not None:
+                text = xml_text(text)
+                self._xf.write(etree.CDATA(text) if cdata and ']]>' not in text else text)
+
+    def write(self, element: etree.ElementBase):
+        """
+        Write an already built element, e.g. an item parsed from another feed, as it is.
+        """
+        self._xf.write(element, with_tail=False)
+
+
+@contextmanager
+def open_local_feed(filename: str):
+    """
+    Open a local file for an RssWriter. The file is only replaced once the whole feed has been written, so a failed
+    run leaves the previous feed in place.
+    """
+    tmp_filename = f'{filename}.tmp'
+    try:
+        with open(tmp_filename, 'wb') as f:
+            yield f
+        os.replace(tmp_filename, filename)
+    finally:
+        if os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
+
+
+def podcast_nsmap(news_feed) -> Dict[str, str]:
+    """
+    Return the namespaces of a podcast feed built from the feedparser result of the BeyondWords output feed.
+    """
+    return {
+        'atom': news_feed['namespaces'][''],
+        'itunes': news_feed['namespaces']['itunes'],
+        'content': news_feed['namespaces']['content'],
+    }
+
+
+def write_podcast_channel(writer: RssWriter, news_feed, feed_title: str, feed_image_href: str):
+    """
+    Write the channel elements of a podcast feed, taking everything but the title and image from `news_feed`.
+    """
+    feed = news_feed['feed']
+    writer.element('title', feed_title)
+    writer.element('description', feed['subtitle'])
+    writer.element('author', feed['author'])
+    writer.element('copyright', feed['rights'])
+    writer.element('language', feed['language'])
+    writer.element('link', feed['link'])
+    with writer.start('image'):
+        writer.element('url', feed_image_href)
+    writer.element('itunes:keywords')
+    with writer.start('itunes:owner'):
+        writer.element('itunes:name', feed['publisher_detail']['name'])
+        writer.element('itunes:email', feed['publisher_detail']['email'])
+    with writer.start('itunes:category', text=feed['tags'][0]['term']):
+        writer.element('itunes:category', text=feed['tags'][0]['term'])
+    writer.element('itunes:explicit', 'yes' if feed['itunes_explicit'] else 'no')
+    writer.element('itunes:image', href=feed_image_href)
+    writer.element('itunes:author', feed['publisher_detail']['name'])
+    writer.element('itunes:summary', feed['subtitle'], cdata=True)
+    writer.element('lastBuildDate', feed['updated'])
+
+
+def write_podcast_item(
+        writer: RssWriter,
+        guid: str,
+        guidislink: str,
+        title: str,
+        summary: str,
+        author: str,
+        link: str,
+        enclosure_length: str,
+        enclosure_type: str,
+        enclosure_url: str,
+        published: str,
+        image_href: str,
+        itunes_duration: str,
+        itunes_explicit: str,
+        itunes_episodetype: str,
+        itunes_episode: str,
+):
+    with writer.item():
+        writer.element('guid', guid, isPermaLink=guidislink)
+        writer.element('title', title)
+        writer.element('description', summary, cdata=True)
+        writer.element('author', author)
+        writer.element('link', link)
+        writer.element('content:encoded', summary, cdata=True)
+        writer.element('enclosure', length=enclosure_length, type=enclosure_type, url=enclosure_url)
+        writer.element('pubDate', published)
+        writer.element('itunes:title', title)
+        writer.element('itunes:subtitle', summary, cdata=True)
+        writer.element('itunes:summary', summary, cdata=True)
+        writer.element('itunes:author', author)
+        writer.element('itunes:image', image_href)
+        writer.element('itunes:duration', itunes_duration)
+        writer.element('itunes:keywords')
+        writer.element('itunes:explicit', itunes_explicit)
+        writer.element('itunes:episodeType', itunes_episodetype)
+        writer.element('itunes:episode', itunes_episode)
@@ -0,0 +1,302 @@
+import asyncio
+import logging
+import random
+import time
+from collections import defaultdict
+from email.utils import parsedate_to_datetime
+from typing import Optional
+from urllib.parse import urlparse
+
+import httpx
+
+THROTTLING_STATUS_CODES = (429, 503)
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of sending a request to a host whose circuit breaker is open.
+    """
+
+
+class TokenBucket:
+    """
+    Allows `rate` requests per second on average, with bursts of up to `capacity` requests.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        """
+        Hold back every request for `seconds`, e.g. because the host answered with a `Retry-After` header.
+        """
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AimdLimiter:
+    """
+    Concurrency limit that grows additively while requests succeed and is halved when the host throttles us.
+    """
+
+    def __init__(self, initial: int, minimum: int = 1, maximum: int = 50, decrease_interval: float = 1.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        # Throttled responses to requests that were in flight together count as a single decrease.
+        self.decrease_interval = decrease_interval
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < int(self.limit))
+            self._in_flight += 1
+
+    async def release(self):
+        async with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def increase(self):
+        self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+    def decrease(self):
+        now = time.monotonic()
+        if now - self._last_decrease >= self.decrease_interval:
+            self._last_decrease = now
+            self.limit = max(self.minimum, self.limit / 2)
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures, and lets a single trial request through once
+    `reset_timeout` seconds have passed.
+    """
+
+    def __init__(self, failure_threshold: int = 10, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        if self._opened_at is None:
+            return True
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            # Half open: the next result decides whether the circuit closes again.
+            self._opened_at = time.monotonic()
+            return True
+        return False
+
+    def record_success(self):
+        self._failures = 0
+        self._opened_at = None
+
+    def record_failure(self):
+        self._failures += 1
+        if self._failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+
+
+class _Host:
+    def __init__(self, fetcher: "AsyncFetcher"):
+        self.bucket = TokenBucket(fetcher.rate, fetcher.burst)
+        self.limiter = AimdLimiter(fetcher.initial_concurrency, maximum=fetcher.max_concurrency)
+        self.breaker = CircuitBreaker(fetcher.failure_threshold, fetcher.reset_timeout)
+
+
+def get_retry_after(response: httpx.Response) -> Optional[float]:
+    """
+    Returns: The number of seconds the `Retry-After` header of the response asks to wait, or None.
+    """
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AsyncFetcher:
+    """
+    Shared HTTP client for fetching many pages from a few hosts as fast as the hosts tolerate.
+
+    Every host gets its own token bucket, AIMD concurrency limit and circuit breaker. Throttled (429/503) responses
+    halve the concurrency limit and pause the host for as long as `Retry-After` asks. Every request, retries
+    included, has to finish within `deadline` seconds of being sent for the first time. The time spent queued behind
+    the token bucket and the concurrency limit before that doesn't count, so many requests can be submitted at once.
+
+    Use as `async with AsyncFetcher() as fetcher:` so the underlying client is closed.
+    """
+
+    def __init__(
+            self,
+            rate: float = 10.0,
+            burst: float = 10.0,
+            initial_concurrency: int = 8,
+            max_concurrency: int = 50,
+            deadline: float = 60.0,
+            timeout: float = 20.0,
+            max_retries: int = 5,
+            backoff: float = 0.5,
+            max_backoff: float = 30.0,
+            failure_threshold: int = 10,
+            reset_timeout: float = 30.0,
+            transport: httpx.AsyncBaseTransport = None,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.initial_concurrency = initial_concurrency
+        self.max_concurrency = max_concurrency
+        self.deadline = deadline
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._transport = transport
+        self._client = None
+        self._hosts = defaultdict(lambda: _Host(self))
+        self._logger = logging.getLogger("AsyncFetcher")
+
+    async def __aenter__(self):
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency),
+            timeout=httpx.Timeout(self.timeout),
+            transport=self._transport,
+            follow_redirects=True,
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self._client.aclose()
+        self._client = None
+
+    def host(self, url: str) -> _Host:
+        return self._hosts[urlparse(url).netloc]
+
+    async def get(self, url: str) -> httpx.Response:
+        """
+        Fetch `url`, retrying transport errors and retryable status codes with exponential backoff.
+
+        Returns: The response, which may still have a non-retryable error status.
+        Raises: CircuitOpenError if the host keeps failing, asyncio.TimeoutError if the deadline passes and
+            httpx.HTTPError if every retry failed.
+        """
+        return await self.request('GET', url)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        """
+        Same as `get`, for a POST request, e.g. a GraphQL query with `json={'query': ...}`.
+        """
+        return await self.request('POST', url, **kwargs)
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        host = self.host(url)
+        loop = asyncio.get_running_loop()
+        deadline_at = None
+        for attempt in range(self.max_retries + 1):
+            await host.bucket.acquire()
+            await host.limiter.acquire()
+            if deadline_at is None:
+                deadline_at = loop.time() + self.deadline
+            try:
+                # Checked once the request has a slot, so the requests queued behind a failing one see its result.
+                if not host.breaker.allow():
+                    raise CircuitOpenError(f"Too many failed requests to {urlparse(url).netloc}")
+                remaining = deadline_at - loop.time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                try:
+                    response = await asyncio.wait_for(self._client.request(method, url, **kwargs), remaining)
+                except asyncio.TimeoutError:
+                    # A host that doesn't answer before the deadline counts as failing, so one that hangs opens the
+                    # circuit instead of holding every request until its deadline.
+                    host.breaker.record_failure()
+                    raise
+            except httpx.TransportError as e:
+                host.breaker.record_failure()
+                if attempt == self.max_retries:
+                    raise
+                self._logger.info(f"Retrying {url} after {e!r}")
+                response = None
+            finally:
+                await host.limiter.release()
+
+            if response is None:
+                await self._sleep_before_deadline(self._backoff_delay(attempt), deadline_at)
+                continue
+
+            if response.status_code not in RETRYABLE_STATUS_CODES:
+                host.breaker.record_success()
+                host.limiter.increase()
+                return response
+
+            retry_after = get_retry_after(response)
+            if response.status_code in THROTTLING_STATUS_CODES:
+                host.limiter.decrease()
+                if retry_after is not None:
+                    host.bucket.pause(retry_after)
+            if response.status_code != 429:
+                host.breaker.record_failure()
+            if attempt == self.max_retries:
+                response.raise_for_status()
+            self._logger.info(f"Retrying {url} after status {response.status_code}, "
+                              f"concurrency limit is now {host.limiter.limit:.1f}")
+            await self._sleep_before_deadline(retry_after if retry_after is not None else self._backoff_delay(attempt),
+                                              deadline_at)
+
+    def _backoff_delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    @staticmethod
+    async def _sleep_before_deadline(seconds: float, deadline_at: float):
+        if asyncio.get_running_loop().time() + seconds >= deadline_at:
+            raise asyncio.TimeoutError()
+        await asyncio.sleep(seconds)
+
+
+async def execute_graphql(fetcher: AsyncFetcher, graphql_url: str, query: str) -> dict:
+    """
+    Send a GraphQL query through the fetcher, so it shares the rate limit, circuit breaker and deadline of the host.
+
+    Returns: The `data` of the response.
+    Raises: ValueError if the API answered with errors and no data.
+    """
+    response = await fetcher.post(graphql_url, json={'query': query})
+    response.raise_for_status()
+    result = response.json()
+    if not result.get('data'):
+        raise ValueError(f'GraphQL query to {graphql_url} failed: {result.get("errors")}')
+    return result['data']
@@ -0,0 +1,94 @@
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from typing import List
+
+from lxml.etree import Element
+
+
+@dataclass
+class StageMetrics:
+    """
+    Wall time, CPU time and number of feed items after a single pipeline stage.
+    """
+    name: str
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
+    items: int = None
+
+
+class RunMetrics:
+    """
+    Collects the metrics of every stage in a feed update run and emits them as one structured summary.
+
+    The summary is logged as a single JSON line. If the environment variable `METRICS_FILE` is set, the summary is also
+    appended to that file, so several runs can be compared later on.
+    """
+
+    def __init__(self, run_name: str, **labels):
+        self.run_name = run_name
+        self.labels = labels
+        self.stages: List[StageMetrics] = []
+        self.status = "ok"
+        self._logger = logging.getLogger("RunMetrics")
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Time the code inside the `with` block. Set `items` on the yielded object to record the number of items the
+        stage produced.
+        """
+        stage = StageMetrics(name)
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield stage
+        finally:
+            stage.wall_time = time.perf_counter() - wall_start
+            stage.cpu_time = time.process_time() - cpu_start
+            self.stages.append(stage)
+
+    def summary(self) -> dict:
+        def rounded(stage: StageMetrics):
+            return {**asdict(stage), "wall_time": round(stage.wall_time, 4), "cpu_time": round(stage.cpu_time, 4)}
+
+        return {
+            "run": self.run_name,
+            **self.labels,
+            "status": self.status,
+            "wall_time": round(time.perf_counter() - self._wall_start, 4),
+            "cpu_time": round(time.process_time() - self._cpu_start, 4),
+            "stages": [rounded(stage) for stage in self.stages],
+        }
+
+    def emit(self):
+        summary_line = json.dumps(self.summary())
+        self._logger.info(summary_line)
+        metrics_file = os.environ.get("METRICS_FILE")
+        if metrics_file:
+            with open(metrics_file, "a") as f:
+                f.write(summary_line + "\n")
+
+
+@contextmanager
+def track_run(run_name: str, **labels):
+    """
+    Yield a RunMetrics object for the duration of a run and emit its summary when the run finishes, even if it failed.
+    """
+    metrics = RunMetrics(run_name, **labels)
+    try:
+        yield metrics
+    except Exception:
+        metrics.status = "error"
+        raise
+    finally:
+        metrics.emit()
+
+
+def count_items(feed: Element) -> int:
+    return len(feed.findall("channel/item"))
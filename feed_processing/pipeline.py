@@ -0,0 +1,239 @@
+"""
+Item-level alternative to the whole-tree functions of `feed_processing.utils`.
+
+Sources yield a FeedItem per feed item as it is parsed, stages are generator functions from records to records,
+and sinks consume them, so only the items in flight are held in memory and a stage doesn't walk the whole tree.
+
+Example:
+    source = FeedSource.from_url(config.source)
+    items = pipe(
+        source,
+        filter_by_title_prefix('EA - '),
+        remove_authors(storage.read_removed_authors()),
+        take(30),
+    )
+    with storage.open_writer(config.rss_filename) as f:
+        write_feed(f, source, items)
+"""
+import logging
+from datetime import datetime, timedelta
+from itertools import islice
+from time import mktime, strptime
+from typing import BinaryIO, Callable, Iterable, Iterator, List
+
+from lxml import etree
+from lxml.etree import Element
+
+from feed_processing.episode_store import EpisodeStore
+from feed_processing.feed_config import PodcastProviderFeedConfig
+from feed_processing.feed_item import FeedItem
+from feed_processing.feed_writer import RssWriter
+from feed_processing.utils import DOWNLOAD_CHUNK_SIZE, item_title_is_duplicate, request_url
+
+
+Stage = Callable[[Iterable[FeedItem]], Iterator[FeedItem]]
+
+
+class FeedSource:
+    """
+    Iterable over the items of an RSS document that is parsed incrementally from `chunks` of bytes. Each item is
+    detached from the document once it is parsed, so the document doesn't grow with the number of items.
+
+    `channel` is the channel element, without its items. It holds the channel metadata written before the first item
+    once the first record has been yielded, and all of it once the iteration is over.
+    """
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = chunks
+        self.channel: Element | None = None
+
+    @classmethod
+    def from_file(cls, filename: str) -> "FeedSource":
+        def read_chunks():
+            with open(filename, 'rb') as f:
+                yield from iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b'')
+
+        return cls(read_chunks())
+
+    @classmethod
+    def from_url(cls, url: str) -> "FeedSource":
+        """
+        Stream the document at `url` as it is downloaded. Like `get_feed_tree_from_url`, a path to a local file is
+        also accepted.
+        """
+        def read_chunks():
+            try:
+                response = request_url(url, cache=False, stream=True)
+            except ValueError:
+                yield from cls.from_file(url)._chunks
+                return
+            with response:
+                response.raise_for_status()
+                yield from response.iter_content(DOWNLOAD_CHUNK_SIZE)
+
+        return cls(read_chunks())
+
+    def __iter__(self) -> Iterator[FeedItem]:
+        parser = etree.XMLPullParser(events=('start', 'end'), strip_cdata=False, remove_blank_text=True)
+        for chunk in self._chunks:
+            parser.feed(chunk)
+            yield from self._read_items(parser)
+        parser.close()
+        yield from self._read_items(parser)
+
+    def _read_items(self, parser: etree.XMLPullParser) -> Iterator[FeedItem]:
+        for event, element in parser.read_events():
+            if event == 'start' and element.tag == 'channel':
+                self.channel = element
+            elif event == 'end' and element.tag == 'item':
+                element.getparent().remove(element)
+                yield FeedItem.from_element(element)
+
+
+def iter_tree_items(feed: Element) -> Iterator[FeedItem]:
+    """
+    Source over the items of a feed that is already parsed, e.g. by `get_feed_tree_from_url`.
+    """
+    for element in feed.iterfind('channel/item'):
+        yield FeedItem.from_element(element)
+
+
+def pipe(items: Iterable[FeedItem], *stages: Stage) -> Iterator[FeedItem]:
+    for stage in stages:
+        items = stage(items)
+    return iter(items)
+
+
+def take(n: int) -> Stage:
+    """
+    Stop after `n` items, without reading the rest of the source.
+    """
+    def stage(items):
+        return islice(items, n)
+
+    return stage
+
+
+def filter_by_title_prefix(title_prefix: str | None) -> Stage:
+    def stage(items):
+        for item in items:
+            if not title_prefix or item.title.startswith(title_prefix):
+                yield item
+
+    return stage
+
+
+def filter_by_search_period(period: timedelta, date_format: str = PodcastProviderFeedConfig.date_format) -> Stage:
+    """
+    Same as `filter_entries_by_search_period`, with the search period and the date format of the feed config. Like
+    there, a pubDate that isn't an RFC 2822 date is parsed with `date_format`.
+    """
+    def stage(items):
+        oldest_post_time = (datetime.now() - period).timestamp()
+        for item in items:
+            pub_date = item.pub_date
+            if pub_date is None:
+                pub_date = mktime(strptime(item.element.findtext('pubDate'), date_format))
+            if pub_date > oldest_post_time:
+                yield item
+
+    return stage
+
+
+def remove_authors(removed_authors: List[str]) -> Stage:
+    """
+    Same as `remove_items_from_removed_authors`, with the removed authors already read.
+    """
+    logger = logging.getLogger(f"function:{remove_authors.__name__}")
+
+    def stage(items):
+        for item in items:
+            if (item.author or "Unknown") in removed_authors:
+                logger.info(f"Removing post '{item.title}' because it was written by removed author {item.author}.")
+                continue
+            yield item
+
+    return stage
+
+
+def remove_duplicate_titles(existing_titles: List[str]) -> Stage:
+    """
+    Same as `remove_items_also_found_in_other_relevant_files`.
+    """
+    def stage(items):
+        for item in items:
+            if not item_title_is_duplicate(item.title, existing_titles):
+                yield item
+
+    return stage
+
+
+def filter_by_min_description_chars(min_chars: int) -> Stage:
+    """
+    Same as `remove_posts_with_less_than_the_minimum_characters_in_description`.
+    """
+    def stage(items):
+        for item in items:
+            if len(item.description or '') >= min_chars:
+                yield item
+
+    return stage
+
+
+def prepend_to_titles(prefix: str) -> Stage:
+    """
+    Same as `prepend_website_abbreviation_to_feed_item_titles`, given the abbreviation, e.g. `EA - `.
+    """
+    def stage(items):
+        for item in items:
+            item.set_title(f'{prefix}{item.title}')
+            yield item
+
+    return stage
+
+
+def append_author_to_titles(items: Iterable[FeedItem]) -> Iterator[FeedItem]:
+    """
+    Same as `append_author_to_item_titles`.
+    """
+    for item in items:
+        item.set_title(f'{item.title} by {item.author}')
+        yield item
+
+
+def write_feed(output: BinaryIO, channel: Element | FeedSource, items: Iterable[FeedItem]) -> int:
+    """
+    Stream an RSS document with the metadata of `channel` and the `items` into `output`.
+
+    Args:
+        output: Binary file object, e.g. from `StorageInterface.open_writer`.
+        channel: Channel element, or the FeedSource the items come from to copy its channel.
+        items: Items to write.
+
+    Returns: The number of items written.
+    """
+    items = iter(items)
+    # Reading the first item parses the channel metadata that comes before it.
+    first_item = next(items, None)
+    if isinstance(channel, FeedSource):
+        channel = channel.channel
+    nsmap = {prefix: uri for prefix, uri in channel.nsmap.items() if prefix}
+    n_items = 0
+    with RssWriter(output, nsmap) as writer:
+        for element in channel:
+            if element.tag != 'item':
+                writer.write(element)
+        if first_item is not None:
+            writer.write(first_item.element)
+            n_items += 1
+        for item in items:
+            writer.write(item.element)
+            n_items += 1
+    return n_items
+
+
+def append_to_episode_store(episode_store: EpisodeStore, feed_name: str, items: Iterable[FeedItem]) -> List[Element]:
+    """
+    Append the items to a feed of an EpisodeStore as they come, and return the ones that were new.
+    """
+    return episode_store.append_items(feed_name, (item.element for item in items))
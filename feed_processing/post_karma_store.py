@@ -0,0 +1,80 @@
+import json
+import logging
+import time
+from dataclasses import replace
+from typing import Dict, Iterable
+
+from feed_processing.feed_config import PodcastProviderFeedConfig
+from feed_processing.storage import StorageInterface, create_storage
+
+# BeyondWords appends this and the forum abbreviation to the guid of the input item, e.g. `ZKYpu4WAiwTXDSrX8_NL_EA`.
+BEYONDWORDS_GUID_SEPARATOR = '_NL_'
+
+
+def get_post_guid(guid: str) -> str:
+    """
+    Return the guid of the forum post an item is about, for items of both the BeyondWords input and output feeds.
+    """
+    return guid.strip().split(BEYONDWORDS_GUID_SEPARATOR)[0]
+
+
+class PostKarmaStore:
+    """
+    Persistent map from the guid of a forum post to its karma, kept as a JSON Lines file in a StorageInterface.
+
+    Each line holds one post: `{"post": <guid>, "karma": <karma>, "fetched_at": <unix time>}`.
+    """
+
+    def __init__(self, storage: StorageInterface, filename: str):
+        self.storage = storage
+        self.filename = filename
+        self._records: Dict[str, dict] = {}
+        self._logger = logging.getLogger("PostKarmaStore")
+
+    def load(self):
+        content = self.storage.read_file(self.filename)
+        self._records = {}
+        if content:
+            for line in content.decode("utf-8").splitlines():
+                if line.strip():
+                    record = json.loads(line)
+                    self._records[record["post"]] = record
+        self._logger.info(f"Loaded the karma of {len(self._records)} posts from '{self.filename}'")
+        return self
+
+    def save(self):
+        content = "".join(json.dumps(record) + "\n" for record in self._records.values())
+        self.storage.write_file(self.filename, content.encode("utf-8"))
+        self._logger.info(f"Saved the karma of {len(self._records)} posts to '{self.filename}'")
+
+    def __contains__(self, post: str) -> bool:
+        return get_post_guid(post) in self._records
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def get(self, post: str) -> int | None:
+        record = self._records.get(get_post_guid(post))
+        return record["karma"] if record else None
+
+    def put(self, post: str, karma: int):
+        post = get_post_guid(post)
+        self._records[post] = {"post": post, "karma": karma, "fetched_at": time.time()}
+
+    def retain(self, posts: Iterable[str]):
+        """
+        Drop every post that isn't in `posts`, so the store doesn't grow beyond the size of the feed.
+        """
+        posts = {get_post_guid(post) for post in posts}
+        self._records = {post: record for post, record in self._records.items() if post in posts}
+
+
+def open_post_karma_store(feed_config: PodcastProviderFeedConfig, running_on_gcp) -> PostKarmaStore | None:
+    """
+    Return the loaded PostKarmaStore of a podcast feed, or None if the feed doesn't have one. The store lives in the
+    bucket of the BeyondWords input feeds, which may not be the bucket of the podcast feed.
+    """
+    if not feed_config.karma_filename:
+        return None
+    storage_config = replace(feed_config, gcp_bucket=feed_config.karma_gcp_bucket or feed_config.gcp_bucket)
+    return PostKarmaStore(create_storage(storage_config, running_on_gcp), feed_config.karma_filename).load()
@@ -0,0 +1,56 @@
+import json
+import logging
+import time
+from typing import Dict, Iterable, Set
+
+from feed_processing.storage import StorageInterface
+
+
+class PostTagsStore:
+    """
+    Persistent map from post to the slugs of its tags, kept as a JSON Lines file in a StorageInterface.
+
+    Each line holds one post: `{"post": <post id>, "tags": [<slug>, ...], "fetched_at": <unix time>}`.
+    """
+
+    def __init__(self, storage: StorageInterface, filename: str = "post_tags.jsonl"):
+        self.storage = storage
+        self.filename = filename
+        self._records: Dict[str, dict] = {}
+        self._logger = logging.getLogger("PostTagsStore")
+
+    def load(self):
+        content = self.storage.read_file(self.filename)
+        self._records = {}
+        if content:
+            for line in content.decode("utf-8").splitlines():
+                if line.strip():
+                    record = json.loads(line)
+                    self._records[record["post"]] = record
+        self._logger.info(f"Loaded the tags of {len(self._records)} posts from '{self.filename}'")
+        return self
+
+    def save(self):
+        content = "".join(json.dumps(record) + "\n" for record in self._records.values())
+        self.storage.write_file(self.filename, content.encode("utf-8"))
+        self._logger.info(f"Saved the tags of {len(self._records)} posts to '{self.filename}'")
+
+    def __contains__(self, post: str) -> bool:
+        return post in self._records
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def get(self, post: str) -> Set[str] | None:
+        record = self._records.get(post)
+        return set(record["tags"]) if record else None
+
+    def put(self, post: str, tags: Iterable[str]):
+        self._records[post] = {"post": post, "tags": sorted(tags), "fetched_at": time.time()}
+
+    def retain(self, posts: Iterable[str]):
+        """
+        Drop every post that isn't in `posts`, so the store doesn't grow beyond the size of the feed.
+        """
+        posts = set(posts)
+        self._records = {post: record for post, record in self._records.items() if post in posts}
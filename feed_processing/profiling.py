@@ -0,0 +1,179 @@
+import cProfile
+import functools
+import io
+import logging
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+PROFILE_MODES = ("cprofile", "sample", "tracemalloc")
+
+logger = logging.getLogger("Profiling")
+
+# Held by the active `profile_run`. cProfile, the sampler and tracemalloc all see the whole process, so a second run
+# at the same time would fail to start or mix its results with the first one.
+_profiling_lock = threading.Lock()
+
+
+class StackSampler:
+    """
+    Sampling profiler which periodically records the call stack of every thread.
+
+    The samples are returned in the collapsed stack format (`frame;frame;frame count`) which is understood by
+    flamegraph tools such as `flamegraph.pl` or speedscope.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="StackSampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}")
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed_stacks(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+def _tracemalloc_report(snapshot: tracemalloc.Snapshot, peak: int, top: int = 25) -> str:
+    lines = [f"Peak traced memory: {peak / 1024 / 1024:.1f} MiB", f"Top {top} allocation sites:"]
+    for stat in snapshot.statistics("lineno")[:top]:
+        lines.append(f"{stat.size / 1024:10.1f} KiB {stat.count:8d} blocks  {stat.traceback}")
+    return "\n".join(lines) + "\n"
+
+
+def _write_profile(filename: str, content: bytes, storage=None, output_dir: str = None):
+    """
+    Write a profile, logging the failure instead of raising it. It is written once the profiled run ends, so an error
+    raised here would replace the run's own exception.
+    """
+    try:
+        if storage is not None:
+            storage.write_file(f"profiles/{filename}", content)
+            return
+        output_dir = output_dir or os.environ.get("PROFILE_DIR", "/tmp/profiles")
+        os.makedirs(output_dir, exist_ok=True)
+        path = os.path.join(output_dir, filename)
+        with open(path, "wb") as f:
+            f.write(content)
+        logger.info(f"Wrote profile to '{path}'")
+    except Exception:
+        logger.exception(f"Could not write profile '{filename}'")
+
+
+@contextmanager
+def profile_run(run_name: str, mode: str = None, storage=None, output_dir: str = None):
+    """
+    Profile the code inside the `with` block and write the results once it finishes.
+
+    Args:
+        run_name: Used as prefix for the names of the written files.
+        mode: One of `PROFILE_MODES`. Defaults to the `PROFILE_MODE` environment variable. Nothing is profiled if
+            neither is set.
+            - cprofile: deterministic profile written as a pstats file (open it with `python -m pstats`).
+            - sample: low overhead sampling profile written as collapsed stacks for flamegraphs.
+            - tracemalloc: top allocation sites and peak memory written as a text report.
+        storage: StorageInterface used to write the results under `profiles/`. Defaults to local files.
+        output_dir: Directory for local files. Defaults to the `PROFILE_DIR` environment variable or `/tmp/profiles`.
+
+    Only one run is profiled at a time. A run that starts while another one is being profiled, in another thread or
+    nested in it, is not profiled.
+    """
+    mode = mode or os.environ.get("PROFILE_MODE")
+    if not mode:
+        yield
+        return
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode '{mode}'. Valid modes are: {', '.join(PROFILE_MODES)}")
+
+    if not _profiling_lock.acquire(blocking=False):
+        logger.warning(f"Not profiling '{run_name}', another run is already being profiled")
+        yield
+        return
+
+    # The process id and a random suffix keep runs started in the same second from overwriting each other's files.
+    basename = f"{run_name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    logger.info(f"Profiling '{run_name}' with {mode}")
+    started = time.perf_counter()
+    try:
+        if mode == "cprofile":
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+                stats = pstats.Stats(profiler)
+                _write_profile(f"{basename}.pstats", marshal.dumps(stats.stats), storage, output_dir)
+                summary = io.StringIO()
+                stats.stream = summary
+                stats.sort_stats("cumulative").print_stats(40)
+                _write_profile(f"{basename}.txt", summary.getvalue().encode("utf-8"), storage, output_dir)
+        elif mode == "sample":
+            sampler = StackSampler()
+            sampler.start()
+            try:
+                yield
+            finally:
+                sampler.stop()
+                collapsed_stacks = sampler.collapsed_stacks().encode("utf-8")
+                _write_profile(f"{basename}.collapsed", collapsed_stacks, storage, output_dir)
+        else:
+            tracemalloc.start(25)
+            try:
+                yield
+            finally:
+                snapshot = tracemalloc.take_snapshot()
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                report = _tracemalloc_report(snapshot, peak)
+                _write_profile(f"{basename}.tracemalloc.txt", report.encode("utf-8"), storage, output_dir)
+    finally:
+        _profiling_lock.release()
+
+    logger.info(f"Profiled '{run_name}' in {time.perf_counter() - started:.2f} s")
+
+
+def profiled(entry_point):
+    """
+    Decorator to profile an entry point on demand, controlled through environment variables:
+
+    - PROFILE_MODE: see `profile_run`.
+    - PROFILE_BUCKET: if set, the results are written to this GCP bucket instead of the local disk.
+    """
+
+    @functools.wraps(entry_point)
+    def wrapper(*args, **kwargs):
+        storage = None
+        if os.environ.get("PROFILE_MODE") and os.environ.get("PROFILE_BUCKET"):
+            from feed_processing.storage import GoogleCloudStorage
+            storage = GoogleCloudStorage(gcp_bucket=os.environ["PROFILE_BUCKET"], rss_filename=None)
+        with profile_run(entry_point.__name__, storage=storage):
+            return entry_point(*args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,68 @@
+import heapq
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, List
+
+
+@dataclass
+class Job:
+    """
+    Function run every `interval` seconds by a Scheduler.
+    """
+    name: str
+    run: Callable[[], None]
+    interval: float
+
+
+class Scheduler:
+    """
+    Runs jobs one at a time on their cadences, in a single process. A job that fails is logged and runs again at its
+    next time. Runs that were missed while another job was running are skipped rather than run back to back.
+
+    Args:
+        jobs: Jobs to run. Each one runs first when `run_forever` starts.
+        clock: Returns the current time in seconds.
+        wait: Waits the given seconds, or less if the scheduler is stopped. Returns True once it is stopped.
+    """
+
+    def __init__(self, jobs: List[Job], clock: Callable[[], float] = time.monotonic,
+                 wait: Callable[[float], bool] = None):
+        self.jobs = jobs
+        self._clock = clock
+        self._stopped = threading.Event()
+        self._wait = wait or self._stopped.wait
+        self._logger = logging.getLogger("Scheduler")
+
+    def stop(self):
+        self._stopped.set()
+
+    def run_forever(self):
+        now = self._clock()
+        queue = [(now, i) for i in range(len(self.jobs))]
+        heapq.heapify(queue)
+        while not self._stopped.is_set():
+            next_time, i = queue[0]
+            delay = next_time - self._clock()
+            if delay > 0:
+                if self._wait(delay):
+                    break
+                continue
+            heapq.heappop(queue)
+            job = self.jobs[i]
+            self.run_job(job)
+            now = self._clock()
+            while next_time <= now:
+                next_time += job.interval
+            heapq.heappush(queue, (next_time, i))
+
+    def run_job(self, job: Job):
+        self._logger.info(f"Running '{job.name}'")
+        started = time.perf_counter()
+        try:
+            job.run()
+        except Exception:
+            self._logger.exception(f"'{job.name}' failed")
+        else:
+            self._logger.info(f"'{job.name}' finished in {time.perf_counter() - started:.1f}s")
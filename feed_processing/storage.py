@@ -1,10 +1,47 @@
+import fcntl
+import hashlib
 import logging
-from typing import List
+import os
+import tempfile
+from typing import BinaryIO, ContextManager, List
 
 from lxml import etree
 from lxml.etree import XMLParser, Element
 
 from feed_processing.feed_config import BaseFeedConfig
+from feed_processing.feed_writer import open_local_feed
+
+# Bound of the CachingStorage directory if `STORAGE_CACHE_MAX_MB` isn't set.
+DEFAULT_STORAGE_CACHE_MAX_MB = 256
+
+_gcs_client = None
+
+
+class VersionConflictError(Exception):
+    """
+    Raised by `StorageInterface.write_file_if_unchanged` when the file was written by someone else in the meantime.
+    """
+
+
+def get_gcs_client():
+    """
+    Return the Google Cloud Storage client shared by every GoogleCloudStorage instance in this process. The client is
+    created on first use.
+    """
+    global _gcs_client
+    if _gcs_client is None:
+        from google.cloud import storage
+        _gcs_client = storage.Client()
+    return _gcs_client
+
+
+def set_gcs_client(client):
+    """
+    Replace the shared Google Cloud Storage client, e.g. with a stand-in that works on the local file system. Passing
+    None resets it, so a real client is created on next use.
+    """
+    global _gcs_client
+    _gcs_client = client
 
 
 class StorageInterface:
@@ -18,15 +55,64 @@ class StorageInterface:
         self._logger = logging.getLogger("Storage")
         self._parser = XMLParser(encoding="utf-8", strip_cdata=True, remove_blank_text=True)
 
-    def write_podcast_feed(self, feed: str):
-        raise NotImplementedError()
+    def write_podcast_feed(self, feed: Element):
+        """
+        Serialize the feed into `rss_filename` through `open_writer`, a few KB at a time, so the document is never held
+        in memory as a whole.
+        """
+        self._logger.info(f"Writing podcast feed to '{self.rss_filename}'")
+        with self.open_writer(self.rss_filename) as f:
+            feed.getroottree().write(f, xml_declaration=True, encoding='utf-8')
 
     def read_podcast_feed(self, filename: str = None) -> Element:
+        """
+        Return the root `rss` element of the feed in `filename`, `rss_filename` by default, or of an empty feed if it
+        doesn't exist. Every implementation returns the root element, like `get_feed_tree_from_url`, so the feeds
+        read from storage and from URLs are handled the same way.
+        """
         raise NotImplementedError()
 
+    def _parse_feed(self, source) -> Element:
+        return etree.parse(source, self._parser).getroot()
+
     def read_removed_authors(self) -> List[str]:
         raise NotImplementedError()
 
+    def read_file(self, filename: str) -> bytes | None:
+        """
+        Return the content of a file, or None if it doesn't exist.
+        """
+        raise NotImplementedError()
+
+    def write_file(self, filename: str, content: bytes):
+        raise NotImplementedError()
+
+    def get_version(self, filename: str) -> str | None:
+        """
+        Return a string identifying the file and the version of its content, or None if it doesn't exist. It changes
+        whenever the file is written, and only needs a metadata request.
+        """
+        raise NotImplementedError()
+
+    def write_file_if_unchanged(self, filename: str, content: bytes, version: str | None) -> str | None:
+        """
+        Write a file only if it is still at `version`, as returned by `get_version` before it was read, None meaning
+        that it must not exist yet. This keeps two runs that read the same file from overwriting each other's changes.
+
+        Returns: The version of the written file.
+
+        Raises:
+            VersionConflictError: If the file has another version.
+        """
+        raise NotImplementedError()
+
+    def open_writer(self, filename: str) -> ContextManager[BinaryIO]:
+        """
+        Return a context manager with a binary stream that writes into `filename`. The file is only replaced if the
+        `with` block completes, so a failed write leaves the previous content in place.
+        """
+        raise NotImplementedError()
+
 
 class LocalStorage(StorageInterface):
     """
@@ -47,18 +133,52 @@ class LocalStorage(StorageInterface):
         if not filename:
             filename = self.rss_filename
         try:
-            return etree.parse(filename, self._parser)
+            return self._parse_feed(filename)
         except (FileNotFoundError, OSError) as e:
             empty_xml_feed = 'rss_files/empty_feed.xml'
             self._logger.info(
                 f"{type(e).__name__} when trying to parse XML from file at '{filename}', so returning XML from "
                 f"'{empty_xml_feed}' instead."
             )
-            return etree.parse(empty_xml_feed, self._parser)
+            return self._parse_feed(empty_xml_feed)
+
+    def read_file(self, filename: str) -> bytes | None:
+        try:
+            with open(filename, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def write_file(self, filename: str, content: bytes):
+        os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+        self.__write_file_as_bytes(filename, content)
+
+    def get_version(self, filename: str) -> str | None:
+        try:
+            stat = os.stat(filename)
+        except FileNotFoundError:
+            return None
+        return f"file://{os.path.abspath(filename)}#{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+    def write_file_if_unchanged(self, filename: str, content: bytes, version: str | None) -> str | None:
+        # The lock serializes the writers of this process and of the other processes on this machine, between the
+        # version check and the file being replaced.
+        os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+        with open(f"{filename}.lock", 'wb') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            current = self.get_version(filename)
+            if current != version:
+                raise VersionConflictError(f"'{filename}' changed from version {version} to {current}")
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(filename) or ".", suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, filename)
+            self._logger.info(f"Writing {int(len(content) / 1024)} KB to {filename}")
+            return self.get_version(filename)
 
-    def write_podcast_feed(self, feed):
-        self._logger.info(f"writing RSS content to '{self.rss_filename}'")
-        self.__write_file_as_bytes(self.rss_filename, feed)
+    def open_writer(self, filename: str):
+        os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+        return open_local_feed(filename)
 
     def __read_file(self, filename: str):
         self._logger.info(f"reading from file with name {filename}")
@@ -82,9 +202,18 @@ class GoogleCloudStorage(StorageInterface):
     """
     gcp_bucket: str
 
-    def __init__(self, gcp_bucket, rss_filename: str, removed_authors_filename: str = "./removed_authors.txt"):
+    def __init__(self, gcp_bucket, rss_filename: str, removed_authors_filename: str = "./removed_authors.txt",
+                 client=None):
         super().__init__(rss_filename, removed_authors_filename)
         self.gcp_bucket = gcp_bucket
+        self._client = client
+        self._bucket = None
+
+    def _get_bucket(self):
+        if self._bucket is None:
+            client = self._client or get_gcs_client()
+            self._bucket = client.get_bucket(self.gcp_bucket)
+        return self._bucket
 
     def read_removed_authors(self):
         self._logger.info(f"Loading removed authors from {self.removed_authors_filename}")
@@ -92,45 +221,172 @@ class GoogleCloudStorage(StorageInterface):
         self._logger.info(f"Returning list of removed authors: {', '.join(removed_authors)}")
         return removed_authors
 
-    def write_podcast_feed(self, feed: str):
-        self._logger.info(f"Writing podcast feed '{feed}' to file '{self.rss_filename}'")
-        self.__write_file(self.rss_filename, feed)
+    def read_file(self, filename: str) -> bytes | None:
+        blob = self._get_bucket().get_blob(filename)
+        if blob is None:
+            return None
+        return blob.download_as_bytes()
+
+    def write_file(self, filename: str, content: bytes):
+        self.__write_file(filename, content)
+
+    def get_version(self, filename: str) -> str | None:
+        blob = self._get_bucket().get_blob(filename)
+        if blob is None:
+            return None
+        return f"gs://{self.gcp_bucket}/{filename}#{blob.generation}"
+
+    def write_file_if_unchanged(self, filename: str, content: bytes, version: str | None) -> str | None:
+        from google.api_core.exceptions import PreconditionFailed
+
+        # Generation 0 only matches a blob that doesn't exist.
+        generation = int(version.rsplit('#', 1)[1]) if version else 0
+        self._logger.info(f"Writing to bucket {self.gcp_bucket} and path {filename} if at generation {generation}")
+        blob = self._get_bucket().blob(filename)
+        try:
+            blob.upload_from_string(content, if_generation_match=generation)
+        except PreconditionFailed as e:
+            raise VersionConflictError(f"'{filename}' changed since generation {generation}") from e
+        return f"gs://{self.gcp_bucket}/{filename}#{blob.generation}"
+
+    def open_writer(self, filename: str):
+        # A resumable upload sends the stream in chunks and only creates the blob when it is closed. If the `with` block
+        # raises, the upload is cancelled and the previous blob is kept.
+        self._logger.info(f"Streaming to bucket {self.gcp_bucket} and path {filename}")
+        return self._get_bucket().blob(filename).open('wb', ignore_flush=True)
 
     def read_podcast_feed(self, filename: str = None) -> Element:
         if not filename:
             filename = self.rss_filename
         self._logger.info(f'Reading podcast feed from file {filename}')
-        rss_feed_str = "".join(self.__read_file(filename))
-        if rss_feed_str:
-            return etree.fromstring(bytes(rss_feed_str, "utf-8"), self._parser)
-        else:
+        blob = self._get_bucket().get_blob(filename)
+        if blob is None or not blob.size:
             self._logger.info(f'File {filename} not found, trying to return an empty feed file.')
-            return etree.parse('rss_files/empty_feed.xml', self._parser)
+            return self._parse_feed('rss_files/empty_feed.xml')
+        # The parser reads the download stream chunk by chunk, so the blob is never held in memory as a whole.
+        with blob.open('rb') as f:
+            return self._parse_feed(f)
 
     def __read_file(self, path: str):
         self._logger.info(f"Reading from bucket '{self.gcp_bucket}' and path '{path}'")
-        from google.cloud import storage
-        client = storage.Client()
-        bucket = client.get_bucket(self.gcp_bucket)
-        blob = bucket.get_blob(path)
+        blob = self._get_bucket().get_blob(path)
         if blob is None:
             self._logger.info(f"blob {blob} not found, so returning an empty List.")
             return []
         downloaded_blob = blob.download_as_string()
         return [line.rstrip() for line in downloaded_blob.decode('UTF-8').split('\n')]
 
-    def __write_file(self, path: str, content: str):
+    def __write_file(self, path: str, content: str | bytes):
         self._logger.info(f"Writing to bucket {self.gcp_bucket} and path {path}")
-        from google.cloud import storage
-        client = storage.Client()
-        bucket = client.get_bucket(self.gcp_bucket)
-        blob = bucket.blob(path)
+        blob = self._get_bucket().blob(path)
         blob.upload_from_string(content)
 
 
+class CachingStorage(StorageInterface):
+    """
+    StorageInterface decorator that keeps the files it reads in a local directory, so a warm Cloud Function instance or
+    a repeated local run only downloads the files that changed.
+
+    Every read asks the wrapped storage for the file version, which is a single metadata request, and serves the
+    cached copy of that version if there is one. Cached files are named after the hash of the version, so a new
+    version is a cache miss. The least recently used files are removed once the directory grows above `max_bytes`.
+    Writes go straight to the wrapped storage.
+    """
+
+    def __init__(self, storage: StorageInterface, cache_dir: str, max_bytes: int = DEFAULT_STORAGE_CACHE_MAX_MB << 20):
+        super().__init__(storage.rss_filename, storage.removed_authors_filename)
+        self.storage = storage
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def read_removed_authors(self) -> List[str]:
+        content = self.read_file(self.removed_authors_filename)
+        if content is None:
+            return self.storage.read_removed_authors()
+        return [line.rstrip() for line in content.decode('utf-8').splitlines()]
+
+    def read_podcast_feed(self, filename: str = None) -> Element:
+        path = self._get_cached_path(filename or self.rss_filename)
+        if path is None:
+            return self.storage.read_podcast_feed(filename)
+        return self._parse_feed(path)
+
+    def read_file(self, filename: str) -> bytes | None:
+        path = self._get_cached_path(filename)
+        if path is None:
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def write_podcast_feed(self, feed: Element):
+        self.storage.write_podcast_feed(feed)
+
+    def write_file(self, filename: str, content: bytes):
+        self.storage.write_file(filename, content)
+
+    def get_version(self, filename: str) -> str | None:
+        return self.storage.get_version(filename)
+
+    def write_file_if_unchanged(self, filename: str, content: bytes, version: str | None) -> str | None:
+        return self.storage.write_file_if_unchanged(filename, content, version)
+
+    def open_writer(self, filename: str):
+        return self.storage.open_writer(filename)
+
+    def _get_cached_path(self, filename: str) -> str | None:
+        """
+        Return the path of the cached copy of the current version of a file, downloading it on a cache miss, or None
+        if the file doesn't exist.
+        """
+        version = self.storage.get_version(filename)
+        if version is None:
+            return None
+        path = os.path.join(self.cache_dir, hashlib.sha256(version.encode('utf-8')).hexdigest())
+        try:
+            # The modification time orders the cached files by their last use.
+            os.utime(path)
+            self._logger.info(f"Reading '{filename}' from the cache")
+            return path
+        except FileNotFoundError:
+            pass
+
+        content = self.storage.read_file(filename)
+        if content is None:
+            return None
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+        self._evict(keep=path)
+        return path
+
+    def _evict(self, keep: str):
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and not entry.name.endswith('.tmp'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, entry.path, stat.st_size))
+        size = sum(entry_size for _, _, entry_size in entries)
+        for _, path, entry_size in sorted(entries):
+            if size <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+
+
 def create_storage(feed_config: BaseFeedConfig, running_on_gcp: bool):
     """
     Factory to retrieve a storage interface implementation for local or cloud environments.
+
+    If the `STORAGE_CACHE_DIR` environment variable is set, e.g. to `/tmp/storage-cache`, the storage is wrapped in a
+    CachingStorage using that directory, bounded by `STORAGE_CACHE_MAX_MB`.
+
     Args:
         feed_config: Feed configuration data
         running_on_gcp: True if running on GCP. False if running locally.
@@ -139,10 +395,16 @@ def create_storage(feed_config: BaseFeedConfig, running_on_gcp: bool):
 
     """
     if running_on_gcp:
-        return GoogleCloudStorage(
+        storage = GoogleCloudStorage(
             gcp_bucket=feed_config.gcp_bucket,
             rss_filename=feed_config.rss_filename,
             removed_authors_filename=feed_config.removed_authors_file)
     else:
-        return LocalStorage(rss_filename=feed_config.rss_filename,
-                            removed_authors_filename=feed_config.removed_authors_file, )
+        storage = LocalStorage(rss_filename=feed_config.rss_filename,
+                               removed_authors_filename=feed_config.removed_authors_file, )
+
+    cache_dir = os.environ.get("STORAGE_CACHE_DIR")
+    if cache_dir:
+        max_mb = int(os.environ.get("STORAGE_CACHE_MAX_MB", DEFAULT_STORAGE_CACHE_MAX_MB))
+        storage = CachingStorage(storage, cache_dir, max_mb << 20)
+    return storage
@@ -1,22 +1,32 @@
 import asyncio
-import copy
 import functools
+import hashlib
 import json
 import logging
+import os
 import pathlib
 import re
 import ssl
 import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from urllib.parse import urlparse
 
 import feedparser
 import httpx
-from bs4 import BeautifulSoup
-from google.cloud import storage
-from gql import Client, gql
-from gql.transport.aiohttp import AIOHTTPTransport
 from tqdm import tqdm
 from tqdm.asyncio import tqdm_asyncio
 
+from feed_processing.feed_writer import RssWriter, podcast_nsmap, write_podcast_channel, write_podcast_item
+from feed_processing.fetching import AsyncFetcher, CircuitOpenError, execute_graphql
+from feed_processing.post_tags_store import PostTagsStore
+from feed_processing.storage import LocalStorage, GoogleCloudStorage
+
 log = logging.getLogger(__name__)
 log.setLevel(logging.INFO)
 
@@ -26,31 +36,108 @@ formatter = logging.Formatter('[%(asctime)s][%(name)s][%(levelname)s] %(message)
 handler.setFormatter(formatter)
 log.addHandler(handler)
 
+html_hyperlink_format_spotify = "<a href=\"{hyperlink}\">{hyperlink_text}</a>"
+
 TAG_URL_PATTERN = re.compile(r'.*/tag/([^/]+).*')
+POST_ID_PATTERN = re.compile(r'/posts/([A-Za-z0-9]+)')
+GRAPHQL_BATCH_SIZE = 50
+UPLOAD_WORKERS = 8
+TAG_SLUGS_TTL = 24 * 60 * 60
+# Age beyond which the tag slugs cache is too stale to use even once, and is refreshed before returning.
+TAG_SLUGS_MAX_AGE = 7 * 24 * 60 * 60
+TAG_SLUGS_MIN_REFRESH_INTERVAL = 10 * 60
+# Number of the newest entries whose tags are fetched on every run, even if they are already in the tags store.
+TAGS_REFRESH_WINDOW = 20
+TAGS_CHECKPOINT_SIZE = 200
+CHANNELS_CHECKPOINT_INTERVAL = 5
+
+
+TAG_SLUGS_QUERY = """
+query {
+    tags {
+        results {
+            slug
+            name
+        }
+    }
+}
+"""
 
 
-def load_channels(graphql_url="https://forum.effectivealtruism.org/graphql", channels_filename="channels.json"):
+def fetch_tag_slugs(graphql_url):
     log.info(f'Fetching tag slugs from: {graphql_url}')
-    channels_config = json.loads(pathlib.Path(channels_filename).read_text())
-    transport = AIOHTTPTransport(url=graphql_url)
-    client = Client(transport=transport, fetch_schema_from_transport=True)
-    query = gql("""
-    query {
-        tags {
-            results {
-                slug
-                name
-    
-            }
-        }
-    }
-    """)
-    result = client.execute(query)
-    tags = result["tags"]["results"]
-    tag_to_slug = {
+
+    async def fetch():
+        async with AsyncFetcher() as fetcher:
+            return await execute_graphql(fetcher, graphql_url, TAG_SLUGS_QUERY)
+
+    tags = asyncio.run(fetch())["tags"]["results"]
+    return {
         tag['name']: tag['slug']
         for tag in tags
     }
+
+
+def read_tag_slugs_cache(cache_filename):
+    try:
+        return json.loads(pathlib.Path(cache_filename).read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def refresh_tag_slugs_cache(graphql_url, cache_filename):
+    tag_to_slug = fetch_tag_slugs(graphql_url)
+    cache = {'fetched_at': time.time(), 'tag_slugs': tag_to_slug}
+    try:
+        # Write to a temporary file first, so a concurrent reader never sees a partially written cache.
+        tmp_filename = pathlib.Path(f'{cache_filename}.tmp')
+        tmp_filename.write_text(json.dumps(cache))
+        os.replace(tmp_filename, cache_filename)
+    except OSError as e:
+        log.warning(f'Could not write tag slugs cache to {cache_filename}: {e!r}')
+    return cache
+
+
+def get_tag_slugs(graphql_url, cache_filename, tag_names, ttl=TAG_SLUGS_TTL, max_age=TAG_SLUGS_MAX_AGE):
+    """
+    Return a dict from tag name to tag slug, read from a cache file whenever possible.
+
+    The tags are fetched from the GraphQL API before returning if there is no cache yet, if it is older than
+    `max_age`, or if one of the `tag_names` is not in it. A cache older than `ttl` is still used, but refreshed in a
+    background thread for the next run.
+    """
+    cache = read_tag_slugs_cache(cache_filename)
+    if cache is None:
+        return refresh_tag_slugs_cache(graphql_url, cache_filename)['tag_slugs']
+
+    age = time.time() - cache['fetched_at']
+    if age > max_age:
+        log.info(f'The tag slugs cache is {age / 3600:.0f} hours old, refreshing it')
+        return refresh_tag_slugs_cache(graphql_url, cache_filename)['tag_slugs']
+    missing_tag_names = set(tag_names) - set(cache['tag_slugs'])
+    if missing_tag_names and age > TAG_SLUGS_MIN_REFRESH_INTERVAL:
+        log.info(f'Tags {", ".join(sorted(missing_tag_names))} not found in the tag slugs cache')
+        return refresh_tag_slugs_cache(graphql_url, cache_filename)['tag_slugs']
+    if age > ttl:
+        log.info(f'Refreshing the tag slugs cache in the background')
+        threading.Thread(target=refresh_tag_slugs_cache, args=(graphql_url, cache_filename), daemon=True).start()
+    return cache['tag_slugs']
+
+
+def load_channels(graphql_url="https://forum.effectivealtruism.org/graphql", channels_filename="channels.json",
+                  tag_slugs_filename=None):
+    """
+    Return the tag slugs of each channel in `channels_filename`.
+
+    The tag slugs are cached in `tag_slugs_filename`, by default the file named by the `TAG_SLUGS_CACHE` environment
+    variable or else `tag_slugs.json` in the temporary directory. The directory of the deployed sources is read-only on
+    Cloud Functions, so the cache doesn't go next to `channels_filename`.
+    """
+    channels_config = json.loads(pathlib.Path(channels_filename).read_text())
+    if tag_slugs_filename is None:
+        tag_slugs_filename = os.environ.get('TAG_SLUGS_CACHE', os.path.join(tempfile.gettempdir(), 'tag_slugs.json'))
+    tag_names = {tag for channel in channels_config.values() for tag in channel['tags']}
+    tag_to_slug = get_tag_slugs(graphql_url, tag_slugs_filename, tag_names)
     slugs_per_channel = {
         channel_name: [
             tag_to_slug[tag]
@@ -65,62 +152,327 @@ def load_channels(graphql_url="https://forum.effectivealtruism.org/graphql", cha
     return channels_config
 
 
-def merge_topics_to_feed(_feed, list_of_topics):
-    feed = copy.deepcopy(_feed)
-    for i in range(len(feed.entries)):
-        feed.entries[i]['article_tags'] = list_of_topics[i]
+def merge_topics_to_feed(feed, list_of_topics):
+    for entry, topics in zip(feed.entries, list_of_topics):
+        entry['article_tags'] = topics
     return feed
 
 
+class TagLinkParser(HTMLParser):
+    """
+    Collects the slugs of the tag links of a page, without building a document tree.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.tags = set()
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'a':
+            href = dict(attrs).get('href')
+            if href and '/tag/' in href:
+                self.tags.add(re.sub(TAG_URL_PATTERN, r'\1', href))
+
+
 def parse_tags(text):
-    soup = BeautifulSoup(text, "html.parser")
-    tags = {
-        re.sub(TAG_URL_PATTERN, r'\1', a['href'])
-        for a in soup.find_all('a', href=True)
-        if '/tag/' in a['href']
+    parser = TagLinkParser()
+    parser.feed(text)
+    parser.close()
+    return parser.tags
+
+
+def get_post_id(link):
+    match = POST_ID_PATTERN.search(link)
+    return match.group(1) if match else None
+
+
+def get_graphql_url(link):
+    url = urlparse(link)
+    return f'{url.scheme}://{url.netloc}/graphql'
+
+
+def build_post_tags_query(post_ids):
+    """
+    Build a single GraphQL query which asks for the tags of all the posts in `post_ids`, one aliased field per post.
+    """
+    fields = '\n'.join(
+        f'p{i}: post(input: {{selector: {{_id: "{post_id}"}}}}) {{ result {{ _id tags {{ slug }} }} }}'
+        for i, post_id in enumerate(post_ids)
+    )
+    return f'query {{\n{fields}\n}}'
+
+
+async def fetch_post_tags_from_graphql(fetcher, graphql_url, post_ids):
+    """
+    Return a dict from post id to the set of its tag slugs. Posts the API doesn't know about are left out.
+    """
+    result = await execute_graphql(fetcher, graphql_url, build_post_tags_query(post_ids))
+    return {
+        post['result']['_id']: {tag['slug'] for tag in post['result']['tags'] or []}
+        for post in result.values()
+        if post and post.get('result')
     }
-    return tags
-
-
-async def fetch_tags_async(feed):
-    log.info(f'Fetching article tags')
-    limits = httpx.Limits(max_connections=50, max_keepalive_connections=10)
-    timeout = httpx.Timeout(None)
-    transport = httpx.AsyncHTTPTransport(retries=10)
-    client = httpx.AsyncClient(limits=limits, timeout=timeout, transport=transport)
-    results = await tqdm_asyncio.gather(*[
-        client.get(item['link'])
-        for item in feed.entries
-    ], desc='Fetch Articles')
-    list_of_tags = [
-        parse_tags(r.text)
-        for r in tqdm(results, desc='Parse Tags')
+
+
+async def fetch_tags_from_graphql_async(fetcher, links):
+    """
+    Look up the tags of the linked posts with batched GraphQL queries to the forum each link points to.
+
+    Returns: A list with the set of tag slugs of each link, or None for the links whose tags couldn't be retrieved.
+    """
+    post_ids_per_graphql_url = defaultdict(list)
+    for link in links:
+        post_id = get_post_id(link)
+        if post_id:
+            post_ids_per_graphql_url[get_graphql_url(link)].append(post_id)
+
+    batches = [
+        (graphql_url, post_ids[i:i + GRAPHQL_BATCH_SIZE])
+        for graphql_url, post_ids in post_ids_per_graphql_url.items()
+        for i in range(0, len(post_ids), GRAPHQL_BATCH_SIZE)
+    ]
+    results = await asyncio.gather(*[
+        fetch_post_tags_from_graphql(fetcher, graphql_url, post_ids)
+        for graphql_url, post_ids in batches
+    ], return_exceptions=True)
+
+    tags_per_post_id = {}
+    for (graphql_url, post_ids), result in zip(batches, results):
+        if isinstance(result, Exception):
+            log.warning(f'Fetching tags of {len(post_ids)} posts from {graphql_url} failed: {result!r}')
+            continue
+        tags_per_post_id.update(result)
+
+    return [
+        tags_per_post_id.get(get_post_id(link))
+        for link in links
     ]
+
+
+async def scrape_tags_async(fetcher, links):
+    """
+    Scrape the tags from the article pages. Each page is parsed in a worker thread as soon as it arrives and its body
+    is dropped right after, so only the pages in flight are held in memory.
+
+    Returns: A list with the set of tag slugs of each link, or None for the pages that couldn't be fetched.
+    """
+    loop = asyncio.get_running_loop()
+
+    async def scrape_tags(link):
+        try:
+            response = await fetcher.get(link)
+        except (httpx.HTTPError, CircuitOpenError, asyncio.TimeoutError) as e:
+            log.warning(f'Fetching {link} failed: {e!r}')
+            return None
+        if not response.is_success:
+            log.warning(f'Fetching {link} failed: {response!r}')
+            return None
+        text = response.text
+        del response
+        return await loop.run_in_executor(None, parse_tags, text)
+
+    return await tqdm_asyncio.gather(*[
+        scrape_tags(link)
+        for link in links
+    ], desc='Fetch and Parse Articles')
+
+
+async def fetch_links_tags_async(links):
+    async with AsyncFetcher() as fetcher:
+        list_of_tags = await fetch_tags_from_graphql_async(fetcher, links)
+
+        # Fall back to scraping the article pages for the links the GraphQL API didn't return tags for.
+        missing = [i for i, tags in enumerate(list_of_tags) if tags is None]
+        if missing:
+            log.info(f'Scraping the tags of {len(missing)} articles')
+            scraped_tags = await scrape_tags_async(fetcher, [links[i] for i in missing])
+            for i, tags in zip(missing, scraped_tags):
+                list_of_tags[i] = tags
     return list_of_tags
 
 
-def fetch_tags(feed):
-    return asyncio.run(fetch_tags_async(feed))
+def get_post_key(link):
+    return get_post_id(link) or link
+
+
+async def fetch_tags_async(feed, tags_store=None):
+    """
+    Fetch the tags of every feed entry.
+
+    Args:
+        feed: Parsed feed whose entries are tagged.
+        tags_store: Optional PostTagsStore. When given, only the entries the store hasn't seen yet and the newest
+            TAGS_REFRESH_WINDOW entries are fetched, the rest are read from the store, and the store is saved.
+
+    Returns: A list with the set of tag slugs of each entry.
+    """
+    links = [item['link'] for item in feed.entries]
+    if tags_store is None:
+        log.info(f'Fetching article tags')
+        return [tags or set() for tags in await fetch_links_tags_async(links)]
+
+    keys = [get_post_key(link) for link in links]
+    stale = [i for i, key in enumerate(keys) if i < TAGS_REFRESH_WINDOW or key not in tags_store]
+    log.info(f'Fetching article tags of {len(stale)} of {len(links)} entries')
+    # The store is saved after every chunk, so a run that times out resumes from the tags it already fetched.
+    for chunk_start in range(0, len(stale), TAGS_CHECKPOINT_SIZE):
+        chunk = stale[chunk_start:chunk_start + TAGS_CHECKPOINT_SIZE]
+        fetched_tags = await fetch_links_tags_async([links[i] for i in chunk])
+        for i, tags in zip(chunk, fetched_tags):
+            # Posts whose tags couldn't be fetched keep the stored tags, or are fetched again on the next run.
+            if tags is not None:
+                tags_store.put(keys[i], tags)
+        tags_store.save()
+    tags_store.retain(keys)
+    tags_store.save()
+    return [tags_store.get(key) or set() for key in keys]
+
 
+def fetch_tags(feed, tags_store=None):
+    return asyncio.run(fetch_tags_async(feed, tags_store))
 
-@functools.lru_cache()
-def get_feed(url):
+
+def get_feed(url, tags_store=None):
     log.info(f'Fetching feed from: {url}')
     news_feed = feedparser.parse(url)
-    list_of_topics = fetch_tags(news_feed)
+    list_of_topics = fetch_tags(news_feed, tags_store)
     news_feed = merge_topics_to_feed(news_feed, list(list_of_topics))
     return news_feed
 
 
-# def filter_feed(news_feed, channel_tags: set[str]):
-def filter_feed(news_feed, channel_tags):
-    feed = copy.deepcopy(news_feed)
-    feed.entries = [
-        item
-        for item in feed.entries
-        if channel_tags.intersection(item['article_tags'])
-    ]
-    return feed
+@dataclass(frozen=True)
+class EntryRecord:
+    """
+    The fields of a feed entry needed to render it as an item in a channel feed. Records are built once per run and
+    shared by all channels.
+    """
+    guid: str
+    guidislink: str
+    title: str
+    summary: str
+    author: str
+    link: str
+    enclosure_length: str
+    enclosure_type: str
+    enclosure_url: str
+    published: str
+    itunes_duration: str
+    itunes_explicit: str
+    itunes_episodetype: str
+    itunes_episode: str
+
+
+def create_entry_record(item):
+    enclosure = item['links'][1] if 'enclosure' in item['links'][1].values() else item['links'][0]
+    return EntryRecord(
+        guid=item['guid'],
+        guidislink=str(item['guidislink']).lower(),
+        title=item['title'].replace('&', 'and'),
+        summary=html_hyperlink_format_spotify.format(
+            hyperlink=item['link'], hyperlink_text='Link to original article') + '<br/>' + '<br/>' + item['summary'],
+        author=item['author'],
+        link=item['link'],
+        enclosure_length=enclosure['length'],
+        enclosure_type=enclosure['type'],
+        enclosure_url=enclosure['href'],
+        published=item['published'],
+        itunes_duration=item['itunes_duration'],
+        itunes_explicit=item['itunes_explicit'],
+        itunes_episodetype=item['itunes_episodetype'],
+        itunes_episode=item['itunes_episode'],
+    )
+
+
+def build_tag_index(entries):
+    """
+    Return a dict from tag slug to the indices of the entries with that tag, in feed order.
+    """
+    tag_index = defaultdict(list)
+    for i, entry in enumerate(entries):
+        for slug in entry['article_tags']:
+            tag_index[slug].append(i)
+    return tag_index
+
+
+def select_channel_entries(entries, tag_index, channel_slugs):
+    """
+    Return the entries with at least one of the `channel_slugs`, in feed order.
+    """
+    indices = set()
+    for slug in channel_slugs:
+        indices.update(tag_index.get(slug, ()))
+    return [entries[i] for i in sorted(indices)]
+
+
+def publish_channels(rendered_channels, write, max_workers=UPLOAD_WORKERS):
+    """
+    Call `write(filename, rss_feed)` for the pairs produced by `rendered_channels` on a pool of `max_workers` threads.
+    `rss_feed` is whatever `write` expects, e.g. the feed itself or a function that renders it into a stream.
+
+    The next channel is prepared while the previous ones are being written. At most `2 * max_workers` channels wait
+    for a free worker, so the memory used by pending feeds stays bounded.
+    """
+    pending = set()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='publish_channels') as executor:
+        for filename, rss_feed in rendered_channels:
+            if len(pending) >= 2 * max_workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+            pending.add(executor.submit(write, filename, rss_feed))
+        for future in wait(pending).done:
+            future.result()
+
+
+def feed_fingerprint(news_feed, channels):
+    """
+    Return a hash of everything the channel feeds are built from, so a checkpoint is only resumed for the same input.
+    """
+    digest = hashlib.sha256()
+    for entry in news_feed.entries:
+        digest.update(json.dumps([entry.get('id'), entry['link'], sorted(entry['article_tags'])]).encode('utf-8'))
+    digest.update(json.dumps(channels, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ChannelsCheckpoint(object):
+    """
+    Records which channel feeds of a run have been written, so a run that is interrupted can skip them when resumed.
+
+    The checkpoint is a JSON file `{"fingerprint": ..., "completed": [<filename>, ...]}` in the storage backend. It is
+    saved at most every `interval` seconds while channels are written, and once more at the end of the run.
+    """
+
+    def __init__(self, storage, filename, fingerprint, interval=CHANNELS_CHECKPOINT_INTERVAL):
+        self.storage = storage
+        self.filename = filename
+        self.fingerprint = fingerprint
+        self.interval = interval
+        self.completed = set()
+        self._lock = threading.Lock()
+        self._saved_at = time.monotonic()
+
+    def load(self):
+        content = self.storage.read_file(self.filename)
+        if content:
+            checkpoint = json.loads(content)
+            if checkpoint['fingerprint'] == self.fingerprint:
+                self.completed = set(checkpoint['completed'])
+                log.info(f'Resuming from {self.filename}: {len(self.completed)} channels already written')
+        return self
+
+    def save(self):
+        with self._lock:
+            content = json.dumps({'fingerprint': self.fingerprint, 'completed': sorted(self.completed)})
+            self._saved_at = time.monotonic()
+        self.storage.write_file(self.filename, content.encode('utf-8'))
+
+    def mark_completed(self, filename):
+        with self._lock:
+            self.completed.add(filename)
+            save = time.monotonic() - self._saved_at >= self.interval
+        if save:
+            self.save()
 
 
 def main(data, context):
@@ -138,56 +490,12 @@ def main(data, context):
         },
         'system': {
             'output_file_basename': 'nonlinear-library-aggregated',
-            'gcp_bucket_name': 'rssfile'
+            'gcp_bucket_name': 'rssfile',
+            # Skip the channels a previous, interrupted run over the same feed already wrote.
+            'resume': True
         }
     }
 
-    feed_initial_str = """<?xml version="1.0" encoding="{_encoding}"?>\
-        <rss xmlns:atom="{_namespaces_}" xmlns:itunes="{_namespaces_itunes}" xmlns:content="{_namespaces_content}" \
-        version="2.0"><channel><title>{_feed_title}</title>\
-        <description>{_feed_subtitle}</description>\
-        <author>{_feed_author}</author>\
-        <copyright>{_feed_rights}</copyright>\
-        <language>{_feed_language}</language>\
-        <link>{_feed_link}</link>\
-        <image><url>{_feed_image_href}</url></image>\
-        <itunes:keywords></itunes:keywords>\
-        <itunes:owner>\
-          <itunes:name>{_feed_publishderdetail_name}</itunes:name>\
-          <itunes:email>{_feed_publishderdetail_email}</itunes:email>\
-        </itunes:owner>\
-        <itunes:category text="{_feed_tags0}"><itunes:category text="{_feed_tags0}"/></itunes:category>\
-        <itunes:explicit>{_feed_itunesexplicit}</itunes:explicit>\
-        <itunes:image href="{_feed_image_href}"/>\
-        <itunes:author>{_feed_publishderdetail_name}</itunes:author>\
-        <itunes:summary><![CDATA[{_feed_subtitle}]]></itunes:summary>\
-        <lastBuildDate>{_feed_updated}</lastBuildDate>
-"""
-
-    item_str = """<item><guid isPermaLink="{item_guidislink}">{item_guid}</guid>\
-        <title>{item_title}</title>\
-        <description><![CDATA[{item_summary}]]></description>\
-        <author>{item_author}</author>\
-        <link>{item_link}</link>\
-        <content:encoded><![CDATA[{item_summary}]]></content:encoded>\
-        <enclosure length="{item_enclosure_length}" type="{item_enclosure_type}" url="{item_enclosure_url}"/>\
-        <pubDate>{item_published}</pubDate>\
-        <itunes:title>{item_title}</itunes:title>\
-        <itunes:subtitle><![CDATA[{item_summary}]]></itunes:subtitle>\
-        <itunes:summary><![CDATA[{item_summary}]]></itunes:summary>\
-        <itunes:author>{item_author}</itunes:author>\
-        <itunes:image>{_feed_image_href}</itunes:image>\
-        <itunes:duration>{item_itunes_duration}</itunes:duration>\
-        <itunes:keywords></itunes:keywords>\
-        <itunes:explicit>{item_itunesexplicit}</itunes:explicit>\
-        <itunes:episodeType>{item_itunes_episodetype}</itunes:episodeType>\
-        <itunes:episode>{item_itunes_episode}</itunes:episode></item>
-"""
-
-    feed_final_str = '\n</channel></rss>'
-
-    html_hyperlink_format_spotify = "<a href=\"{hyperlink}\">{hyperlink_text}</a>"
-
     class Feed(object):
         def __init__(self, config, local=False):
             # Obtain SSL certificate
@@ -197,6 +505,7 @@ def main(data, context):
             self.sources_list = config['sources']['list']
             self.output_file_basename = config['system']['output_file_basename']
             self.gcp_bucket_name = config['system']['gcp_bucket_name']
+            self.resume = config['system']['resume']
             self.local = local
             self.list_modified_sources = []
             self.image_url = config['feed']['image_url']
@@ -209,74 +518,65 @@ def main(data, context):
         def _modify_feed(self, url, src_idx):
             log.info(f'Creating modified feeds per channel')
             channels = load_channels()
-            news_feed = get_feed(url)
-
-            for channel_name, channel in tqdm(channels.items(), desc='Write Feed XML'):
-                slugs = set(channel['slugs'])
-                feed = filter_feed(news_feed, slugs)
-                rss_feed = self.format_feed(feed, channel, channel_name)
-                filename = f'{self.output_file_basename}-{channel_name}.xml'
-                if self.local:
-                    pathlib.Path(filename).write_text(rss_feed)
-                else:
-                    client = storage.Client()
-                    bucket = client.get_bucket(self.gcp_bucket_name)
-                    blob = bucket.blob(filename)
-                    blob.upload_from_string(rss_feed)
-
-        def format_feed(self, news_feed, channel_config, channel_name):
-            news_feed['feed']['title'] = f'The Nonlinear Library: {channel_name.replace("-", " ")}'
-            news_feed['feed']['image']['href'] = channel_config['imageUrl']
-
-            rss_feed = feed_initial_str.format(
-                _encoding=news_feed['encoding'].upper(),
-                _namespaces_=news_feed['namespaces'][''],
-                _namespaces_itunes=news_feed['namespaces']['itunes'],
-                _namespaces_content=news_feed['namespaces']['content'],
-                _feed_title=news_feed['feed']['title'],
-                _feed_subtitle=news_feed['feed']['subtitle'],
-                _feed_author=news_feed['feed']['author'],
-                _feed_rights=news_feed['feed']['rights'],
-                _feed_language=news_feed['feed']['language'],
-                _feed_link=news_feed['feed']['link'],
-                _feed_image_href=news_feed['feed']['image']['href'],
-                _feed_publishderdetail_name=news_feed['feed']['publisher_detail']['name'],
-                _feed_publishderdetail_email=news_feed['feed']['publisher_detail']['email'],
-                _feed_tags0=news_feed['feed']['tags'][0]['term'],
-                # _feed_tags1=news_feed['feed']['tags'][1]['term'], #NOTE: removed due to IndexError: list index out of range
-                _feed_itunesexplicit='yes' if news_feed['feed']['itunes_explicit'] else 'no',
-                _feed_updated=news_feed['feed']['updated'],
+            if self.local:
+                storage = LocalStorage(rss_filename=None)
+            else:
+                storage = GoogleCloudStorage(gcp_bucket=self.gcp_bucket_name, rss_filename=None)
+            news_feed = get_feed(url, PostTagsStore(storage).load())
+            tag_index = build_tag_index(news_feed.entries)
+            records = [create_entry_record(item) for item in news_feed.entries]
+            checkpoint = ChannelsCheckpoint(
+                storage, f'{self.output_file_basename}-checkpoint.json', feed_fingerprint(news_feed, channels)
             )
-            for item in news_feed.entries:
-                item['title'] = item['title'].replace('&', 'and')
-
-                rss_feed += item_str.format(
-                    item_guidislink=str(item['guidislink']).lower(),
-                    # does the guid have to be unique PER SHOW or GLOBALLY?
-                    item_guid=item['guid'] + channel_name.replace("-", "_"),
-                    item_title=item['title'],
-                    item_summary=html_hyperlink_format_spotify.format(
-                        hyperlink=item['link'], hyperlink_text='Link to original article') + '<br/>' + '<br/>' + item[
-                                     'summary'],
-                    item_author=item['author'],
-                    item_link=item['link'],
-                    item_enclosure_length=item['links'][1]['length'] if 'enclosure' in item['links'][1].values() \
-                        else item['links'][0]['length'],
-                    item_enclosure_type=item['links'][1]['type'] if 'enclosure' in item['links'][1].values() \
-                        else item['links'][0]['type'],
-                    item_enclosure_url=item['links'][1]['href'] if 'enclosure' in item['links'][1].values() \
-                        else item['links'][0]['href'],
-                    item_published=item['published'],
-                    _feed_image_href=news_feed['feed']['image']['href'],
-                    item_itunes_duration=item['itunes_duration'],
-                    item_itunesexplicit=item['itunes_explicit'],
-                    item_itunes_episodetype=item['itunes_episodetype'],
-                    item_itunes_episode=item['itunes_episode']
-                )
-            # harcoded solution to solve unescaped `<` XML RSS feed validation problem
-            rss_feed = rss_feed.replace('<5', '5')
-            rss_feed += feed_final_str
-            return rss_feed
+            if self.resume:
+                checkpoint.load()
+
+            def render_channels():
+                for channel_name, channel in tqdm(channels.items(), desc='Write Feed XML'):
+                    filename = f'{self.output_file_basename}-{channel_name}.xml'
+                    if filename in checkpoint.completed:
+                        continue
+                    entries = select_channel_entries(records, tag_index, channel['slugs'])
+                    # The feed is rendered by the publishing worker, straight into the file or upload stream.
+                    yield filename, functools.partial(self.format_feed, news_feed, entries, channel, channel_name)
+
+            def write(filename, format_feed):
+                with storage.open_writer(filename) as output:
+                    format_feed(output)
+                checkpoint.mark_completed(filename)
+
+            try:
+                publish_channels(render_channels(), write)
+            finally:
+                checkpoint.save()
+
+        def format_feed(self, news_feed, entries, channel_config, channel_name, output):
+            feed_title = f'The Nonlinear Library: {channel_name.replace("-", " ")}'
+            feed_image_href = channel_config['imageUrl']
+            guid_suffix = channel_name.replace("-", "_")
+
+            with RssWriter(output, podcast_nsmap(news_feed), news_feed['encoding'].upper()) as writer:
+                write_podcast_channel(writer, news_feed, feed_title, feed_image_href)
+                for entry in entries:
+                    write_podcast_item(
+                        writer,
+                        # does the guid have to be unique PER SHOW or GLOBALLY?
+                        guid=entry.guid + guid_suffix,
+                        guidislink=entry.guidislink,
+                        title=entry.title,
+                        summary=entry.summary,
+                        author=entry.author,
+                        link=entry.link,
+                        enclosure_length=entry.enclosure_length,
+                        enclosure_type=entry.enclosure_type,
+                        enclosure_url=entry.enclosure_url,
+                        published=entry.published,
+                        image_href=feed_image_href,
+                        itunes_duration=entry.itunes_duration,
+                        itunes_explicit=entry.itunes_explicit,
+                        itunes_episodetype=entry.itunes_episodetype,
+                        itunes_episode=entry.itunes_episode,
+                    )
 
     feed = Feed(config, local=False)
     # feed = Feed(config, local=True)
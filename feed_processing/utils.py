@@ -1,23 +1,48 @@
+import asyncio
+import copy
 import logging
 from datetime import datetime
 from difflib import SequenceMatcher
 from time import strptime, mktime
-from typing import List, Tuple
+from collections import defaultdict
+from typing import Dict, List, Tuple, Callable
 from urllib.parse import urlparse
 
+import httpx
 import requests
-from bs4 import BeautifulSoup
 from lxml import etree
 from lxml.etree import XMLParser, Element, CDATA
 
-from feed_processing.configs import beyondwords_feed_namespaces
+from feed_processing.configs import beyondwords_feed_namespaces, nonlinear_feed_namespaces
 from feed_processing.feed_config import PodcastProviderFeedConfig, BaseFeedConfig
+from feed_processing.feed_item import FeedItem, find_website
+from feed_processing.fetching import AsyncFetcher, CircuitOpenError, execute_graphql
 from feed_processing.storage import create_storage
+from feed_processing.ttl_cache import MISSING, TtlCache
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+KARMA_BATCH_SIZE = 50
+KARMA_TAG = "{%s}karma" % nonlinear_feed_namespaces["nonlinear"]
+
+# Parsed source feeds and post karma, kept in memory between the runs of a long-running worker. See `set_warm_caches`.
+_source_cache: TtlCache | None = None
+_karma_cache: TtlCache | None = None
 
 outro_str = '<p>Thanks for listening. To help us out with The Nonlinear Library or to learn more, please visit ' \
             'nonlinear.org</p>'
 
 
+def set_warm_caches(ttl: float | None):
+    """
+    Keep the parsed source feeds and the karma of posts in memory for `ttl` seconds, so jobs that run shortly after
+    each other in the same process share them. Passing None disables the caches, which is the default for one-off
+    runs.
+    """
+    global _source_cache, _karma_cache
+    _source_cache = TtlCache(ttl) if ttl else None
+    _karma_cache = TtlCache(ttl) if ttl else None
+
+
 def get_post_karma(url) -> int:
     """
     Return a post's karma based on the provided url
@@ -27,6 +52,18 @@ def get_post_karma(url) -> int:
     Returns: String with the post's karma
 
     """
+    if _karma_cache is not None:
+        karma = _karma_cache.get(url)
+        if karma is MISSING:
+            karma = _fetch_post_karma(url)
+            _karma_cache.set(url, karma)
+        return karma
+    return _fetch_post_karma(url)
+
+
+def _fetch_post_karma(url) -> int:
+    from bs4 import BeautifulSoup
+
     # disguising the request using headers
     page = requests.get(url, headers={
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
@@ -39,7 +76,118 @@ def get_post_karma(url) -> int:
     return int(soup.find('h1', {'class': 'PostsVote-voteScore'}).text)
 
 
-def remove_items_from_removed_authors(feed: Element, config: BaseFeedConfig, running_on_gcp):
+def build_posts_karma_query(post_ids: List[str]) -> str:
+    """
+    Build a single GraphQL query which asks for the karma of all the posts in `post_ids`, one aliased field per post.
+    """
+    fields = '\n'.join(
+        f'p{i}: post(input: {{selector: {{_id: "{post_id}"}}}}) {{ result {{ _id baseScore }} }}'
+        for i, post_id in enumerate(post_ids)
+    )
+    return f'query {{\n{fields}\n}}'
+
+
+def fetch_posts_karma(posts: List[Tuple[str, str]]) -> Dict[str, int]:
+    """
+    Look up the karma of posts with batched GraphQL queries to the forum each one was published in.
+
+    Args:
+        posts: Pairs of the id and the url of a post. The guid of a forum feed item is the id of its post.
+
+    Returns: A dict from post id to karma. The posts whose karma couldn't be retrieved are left out.
+    """
+    logger = logging.getLogger(f"function:{fetch_posts_karma.__name__}")
+    post_ids_per_graphql_url = defaultdict(list)
+    for post_id, url in posts:
+        url = urlparse(url.strip())
+        post_ids_per_graphql_url[f'{url.scheme}://{url.netloc}/graphql'].append(post_id.strip())
+
+    async def fetch_batch(fetcher, graphql_url, batch):
+        try:
+            data = await execute_graphql(fetcher, graphql_url, build_posts_karma_query(batch))
+        except (httpx.HTTPError, CircuitOpenError, asyncio.TimeoutError, ValueError) as e:
+            logger.warning(f'Fetching the karma of {len(batch)} posts from {graphql_url} failed: {e!r}')
+            return {}
+        return {
+            post['result']['_id']: int(post['result']['baseScore'])
+            for post in data.values()
+            if post and post.get('result') and post['result'].get('baseScore') is not None
+        }
+
+    async def fetch_batches():
+        # The AsyncFetcher bounds every query with its deadline and backs off a forum that is failing.
+        async with AsyncFetcher() as fetcher:
+            return await asyncio.gather(*[
+                fetch_batch(fetcher, graphql_url, post_ids[i:i + KARMA_BATCH_SIZE])
+                for graphql_url, post_ids in post_ids_per_graphql_url.items()
+                for i in range(0, len(post_ids), KARMA_BATCH_SIZE)
+            ])
+
+    karma_per_post_id = {}
+    for batch_karma in asyncio.run(fetch_batches()):
+        karma_per_post_id.update(batch_karma)
+    return karma_per_post_id
+
+
+def get_feed_items(feed: Element) -> List[FeedItem]:
+    """
+    Return the items of a feed as FeedItems. A run builds this list once and passes it to each stage as `items`, so
+    the stages share the fields they look up instead of searching the elements again. The stages that remove items
+    remove them from both the feed and the list.
+    """
+    return [FeedItem.from_element(element) for element in feed.iterfind('channel/item')]
+
+
+def _get_items(feed: Element, items: List[FeedItem] | None) -> List[FeedItem]:
+    return get_feed_items(feed) if items is None else items
+
+
+def _remove_items(feed: Element, items: List[FeedItem], removed_items: List[FeedItem]):
+    channel = feed.find('channel')
+    for item in removed_items:
+        channel.remove(item.element)
+    removed_items = set(removed_items)
+    items[:] = [item for item in items if item not in removed_items]
+
+
+def add_karma_to_feed_items(feed: Element, karma_store, items: List[FeedItem] = None) -> int:
+    """
+    Look up the current karma of every item of a forum feed, record it in `karma_store` and in a `nonlinear:karma`
+    element of the item. Items whose karma can't be looked up keep the karma already in the store, if any.
+
+    Returns: The number of items whose karma was looked up.
+    """
+    items = _get_items(feed, items)
+    karma_per_post_id = fetch_posts_karma([(item.guid, item.link) for item in items])
+    for item in items:
+        if item.guid in karma_per_post_id:
+            karma_store.put(item.guid, karma_per_post_id[item.guid])
+        karma = karma_store.get(item.guid)
+        if karma is not None:
+            karma_element = item.element.find(KARMA_TAG)
+            if karma_element is None:
+                karma_element = etree.SubElement(item.element, KARMA_TAG, nsmap=nonlinear_feed_namespaces)
+            karma_element.text = str(karma)
+    return len(karma_per_post_id)
+
+
+def get_item_karma(item: FeedItem, karma_store=None) -> int | None:
+    """
+    Return the karma recorded for a feed item when it was ingested, from `karma_store` or from its `nonlinear:karma`
+    element, or None if it wasn't recorded.
+    """
+    if karma_store is not None:
+        karma = karma_store.get(item.guid)
+        if karma is not None:
+            return karma
+    karma_element = item.element.find(KARMA_TAG)
+    if karma_element is not None and karma_element.text:
+        return int(karma_element.text)
+    return None
+
+
+def remove_items_from_removed_authors(feed: Element, config: BaseFeedConfig, running_on_gcp,
+                                      items: List[FeedItem] = None):
     """
     Take an element tree and remove the entries whose author is in the list of removed authors.
 
@@ -47,32 +195,36 @@ def remove_items_from_removed_authors(feed: Element, config: BaseFeedConfig, run
         running_on_gcp: True if running in Google Cloud Platform, False if running locally.
         config: Configuration parameters to retrieve storage interface
         feed: An XML element tree
+        items: The items of the feed, see `get_feed_items`.
 
     """
     logger = logging.getLogger("remove_items_from_removed_authors")
     # Retrieve removed authors
     storage = create_storage(config, running_on_gcp)
     removed_authors = storage.read_removed_authors()
-    for item in feed.findall('channel/item'):
-        author_tag = item.find("author")
-        if author_tag.text is None:
+    items = _get_items(feed, items)
+    removed_items = []
+    for item in items:
+        author = item.author
+        if author is None:
             author = "Unknown"
-            logger.warning(f"Post {item.find('title').text} from unknown author.")
-        else:
-            author = item.find('author').text.strip()
+            logger.warning(f"Post {item.title} from unknown author.")
         if author in removed_authors:
-            feed.find('channel').remove(item)
-            logger.info(f"Removing post '{item.find('title').text}' because it was written by removed author {author}.")
+            removed_items.append(item)
+            logger.info(f"Removing post '{item.title}' because it was written by removed author {author}.")
+    _remove_items(feed, items, removed_items)
     return feed
 
 
-def filter_entries_by_search_period(feed: Element, feed_config: PodcastProviderFeedConfig):
+def filter_entries_by_search_period(feed: Element, feed_config: PodcastProviderFeedConfig,
+                                    items: List[FeedItem] = None):
     """
     Return entries that were published within a period defined in the FeedGeneratorConfig object.
 
     Args:
         feed: An XML element tree
         feed_config: Parameters for podcast feed generation
+        items: The items of the feed, see `get_feed_items`.
 
     """
     logger = logging.getLogger(__name__)
@@ -83,22 +235,22 @@ def filter_entries_by_search_period(feed: Element, feed_config: PodcastProviderF
     oldest_post_time = datetime.now() - period_timedelta
 
     logger.info(f"Filtering entries published before {oldest_post_time.strftime('%Y-%m-%d %H:%M')}")
-    removal_count = 0
-    for entry in feed.findall('channel/item'):
-        published_date_str = entry.find('pubDate').text
-        published_datetime = strptime(published_date_str, feed_config.date_format)
-        published_date = mktime(published_datetime)
+    items = _get_items(feed, items)
+    removed_items = []
+    for entry in items:
+        published_date = entry.pub_date
+        if published_date is None:
+            published_date = mktime(strptime(entry.element.findtext('pubDate'), feed_config.date_format))
         if published_date <= oldest_post_time.timestamp():
-            removal_count += 1
-            logger.debug(
-                f"Removing item {entry.find('title').text} because it was published outside the requested period.")
-            feed.find('channel').remove(entry)
+            removed_items.append(entry)
+            logger.debug(f"Removing item {entry.title} because it was published outside the requested period.")
+    _remove_items(feed, items, removed_items)
     logger.info(
-        f"Removed {removal_count} items from the feed because they were published outside the requested period.")
+        f"Removed {len(removed_items)} items from the feed because they were published outside the requested period.")
     return feed
 
 
-def download_file_from_url(url, cache: bool = True, encoding: str = "utf-8"):
+def request_url(url, cache: bool = True, stream: bool = False) -> requests.Response:
     parsed_uri = urlparse(url)
 
     if parsed_uri.scheme not in ['http', 'https']:
@@ -114,14 +266,23 @@ def download_file_from_url(url, cache: bool = True, encoding: str = "utf-8"):
             "Pragma": "no-cache"
         }
 
-    response = requests.get(url, headers=headers)
-    return bytes(response.text, encoding)
+    return requests.get(url, headers=headers, stream=stream)
+
+
+def download_file_from_url(url, cache: bool = True) -> bytes:
+    """
+    Return the body of the response as it was received. XML is decoded by the parser, according to its declaration.
+    """
+    return request_url(url, cache).content
 
 
 def get_feed_tree_from_url(url, cache: bool = True) -> Element:
     """
     Return an element tree from the provided url (or path to local file).
 
+    The response is fed to the parser chunk by chunk as it is downloaded, so the document is never held in memory
+    as a whole.
+
     Args:
         cache: Cache requests data
         url: Url to a XML document
@@ -129,16 +290,29 @@ def get_feed_tree_from_url(url, cache: bool = True) -> Element:
     Returns: A XML element tree
     """
 
+    if _source_cache is not None:
+        root = _source_cache.get(url)
+        if root is MISSING:
+            root = _parse_feed_tree_from_url(url)
+            _source_cache.set(url, root)
+        # The callers filter the tree in place, so each one gets its own copy.
+        return copy.deepcopy(root)
+    return _parse_feed_tree_from_url(url)
+
+
+def _parse_feed_tree_from_url(url) -> Element:
     parser = XMLParser(strip_cdata=False, encoding='utf-8')
 
     try:
-        xml_data = download_file_from_url(url, cache=False, encoding="utf-8")
+        response = request_url(url, cache=False, stream=True)
     except ValueError:
         tree = etree.parse(url, parser)
         return tree.getroot()
 
-    # Parse to an XML tree
-    return etree.fromstring(xml_data, parser)
+    with response:
+        for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+            parser.feed(chunk)
+    return parser.close()
 
 
 def filter_items(feed, feed_config, running_on_gcp) -> List[Element]:
@@ -272,22 +446,10 @@ def remove_posts_in_history(feed, config, running_on_gcp):
     return feed
 
 
-def find_website(url, short=True):
-    website = 'Unknown'
-    if 'forum.effectivealtruism.org' in url:
-        website = 'EA' if short else 'The Effective Altruism Forum'
-    elif 'lesswrong.com' in url:
-        website = 'LW' if short else "LessWrong"
-    elif 'alignmentforum.org' in url:
-        website = 'AF' if short else "The AI Alignment Forum"
-
-    return website
-
-
-def prepend_website_abbreviation_to_feed_item_titles(feed):
+def prepend_website_abbreviation_to_feed_item_titles(feed, items: List[FeedItem] = None):
     prefix = find_website(feed.find('channel/link').text)
-    for item_title in feed.findall('channel/item/title'):
-        item_title.text = f'{prefix} - {item_title.text.strip()}'
+    for item in _get_items(feed, items):
+        item.set_title(f'{prefix} - {item.title}')
     return feed
 
 
@@ -296,8 +458,7 @@ def get_feed_str(feed):
 
 
 def save_feed(feed, storage):
-    xml_str = get_feed_str(feed)
-    storage.write_podcast_feed(xml_str)
+    storage.write_podcast_feed(feed)
 
 
 def append_new_items_to_feed(new_items, feed):
@@ -322,45 +483,42 @@ def append_new_items_to_feed(new_items, feed):
     return appended_items, feed
 
 
-def add_author_tag_to_feed_items(feed):
-    for item in feed.findall('channel/item'):
-        author = etree.Element('author')
-        author.text = item.find('dc:creator', namespaces=beyondwords_feed_namespaces).text.replace('_', ' ')
-        item.append(author)
+def add_author_tag_to_feed_items(feed, items: List[FeedItem] = None):
+    for item in _get_items(feed, items):
+        item.set_author(item.element.findtext('dc:creator', namespaces=beyondwords_feed_namespaces).replace('_', ' '))
     return feed
 
 
-def append_author_to_item_titles(feed):
-    for item in feed.findall('channel/item'):
-        item.find('title').text = CDATA(f'{item.find("title").text.strip()} by {item.find("author").text.strip()}')
+def append_author_to_item_titles(feed, items: List[FeedItem] = None):
+    for item in _get_items(feed, items):
+        item.set_title(f'{item.title} by {item.author}', cdata=True)
     return feed
 
 
-def get_intro_str(item):
-    title = item.find('title').text
-    published_date_str = item.find('pubDate').text
+def get_intro_str(item: FeedItem):
+    title = item.title
+    published_date_str = item.element.findtext('pubDate')
     published_datetime = datetime.strptime(published_date_str, '%a, %d %b %Y %H:%M:%S %Z')
     summary_date_str = published_datetime.strftime('%B %-d, %Y')
-    website = find_website(item.find('link').text, short=False)
-    authors = item.find('author').text
+    website = find_website(item.link, short=False)
+    authors = item.author
     return f"Welcome to The Nonlinear Library, where we use Text-to-Speech software to convert the best writing from " \
            f"the Rationalist and EA communities into audio. This is: {title.rstrip()}, published by " \
            f"{authors} on {summary_date_str} on {website}. "
 
 
-def get_html_link_to_original_article(item):
-    link = item.find("link")
-    return f'<a href="{link.text}">Link to original article</a><br/>'
+def get_html_link_to_original_article(item: FeedItem):
+    return f'<a href="{item.link}">Link to original article</a><br/>'
 
 
-def edit_item_description(feed):
-    for item in feed.findall('channel/item'):
-        description_text = item.find('description').text
-        description_html = BeautifulSoup(description_text, "html.parser")
+def edit_item_description(feed, items: List[FeedItem] = None):
+    from bs4 import BeautifulSoup
+
+    for item in _get_items(feed, items):
+        description_html = BeautifulSoup(item.description, "html.parser")
         description_text_without_date = "".join(str(content) for content in description_html.contents[3:])
         intro_str = get_intro_str(item)
-        description = f"<p>{intro_str}</p> {description_text_without_date} <p>{outro_str}</p>"
-        item.find('description').text = etree.CDATA(description)
+        item.set_description(f"<p>{intro_str}</p> {description_text_without_date} <p>{outro_str}</p>")
 
     return feed
 
@@ -380,49 +538,70 @@ def item_title_is_duplicate(title: str, existing_titles: List[str]):
     return any(title_exists)
 
 
-def remove_items_also_found_in_other_relevant_files(feed: Element, existing_titles: List[str]) -> Element:
+def remove_items_also_found_in_other_relevant_files(feed: Element, existing_titles: List[str],
+                                                    items: List[FeedItem] = None) -> Element:
     logger = logging.getLogger(f"function:{remove_items_also_found_in_other_relevant_files.__name__}")
-    n_entries = len(feed.findall('channel/item'))
-    for item in feed.findall('channel/item'):
-        if item_title_is_duplicate(item.find('title').text, existing_titles):
-            feed.find('channel').remove(item)
-    logger.info(f'Removed {n_entries - len(feed.findall("channel/item"))} duplicate entries.')
+    items = _get_items(feed, items)
+    removed_items = [item for item in items if item_title_is_duplicate(item.title, existing_titles)]
+    _remove_items(feed, items, removed_items)
+    logger.info(f'Removed {len(removed_items)} duplicate entries.')
     return feed
 
 
-def filter_entries_by_forum_title_prefix(feed, title_prefix):
+def remove_items_published_in_feeds(feed: Element, episode_store, feed_names: List[str],
+                                    items: List[FeedItem] = None) -> Element:
+    """
+    Same as `remove_items_also_found_in_other_relevant_files`, but looks the items up in an EpisodeStore. Titles must
+    match exactly once normalized, see `EpisodeStore.contains_post`.
+    """
+    logger = logging.getLogger(f"function:{remove_items_published_in_feeds.__name__}")
+    items = _get_items(feed, items)
+    removed_items = [item for item in items if episode_store.contains_post(feed_names, item.title, item.author)]
+    _remove_items(feed, items, removed_items)
+    logger.info(f'Removed {len(removed_items)} duplicate entries.')
+    return feed
+
+
+def filter_entries_by_forum_title_prefix(feed, title_prefix, items: List[FeedItem] = None):
     # Filter entries by checking if their titles match the provided title_prefix
-    n_items = len(feed.findall("channel/item"))
+    items = _get_items(feed, items)
+    removed_items = []
     if title_prefix:
-        for entry in feed.findall('channel/item'):
-            if not entry.find('title').text.startswith(title_prefix):
-                feed.find('channel').remove(entry)
+        removed_items = [entry for entry in items if not entry.title.startswith(title_prefix)]
+        _remove_items(feed, items, removed_items)
     logger = logging.getLogger(f"function:{filter_entries_by_forum_title_prefix.__name__}")
-    logger.info(
-        f"Removed {n_items - len(feed.findall('channel/item'))} because they didn't match the prefix '{title_prefix}'")
+    logger.info(f"Removed {len(removed_items)} because they didn't match the prefix '{title_prefix}'")
     return feed
 
 
-def find_top_post(feed: Element) -> Tuple[Element, int]:
+def find_top_post(feed: Element, get_karma: Callable[[str], int] = get_post_karma,
+                  karma_store=None, items: List[FeedItem] = None) -> Tuple[Element, int]:
+    """
+    Return the item with the most karma and its karma. The karma recorded at ingest time is used when there is one, so
+    `get_karma` is only called for the items without it.
+    """
+    logger = logging.getLogger(f"function:{find_top_post.__name__}")
     top_karma = 0
     top_post = None
-    for i, item in enumerate(feed.findall("channel/item")):
-        post_karma = get_post_karma(item.find("link").text)
+    n_looked_up = 0
+    for item in _get_items(feed, items):
+        post_karma = get_item_karma(item, karma_store)
+        if post_karma is None:
+            post_karma = get_karma(item.link)
+            n_looked_up += 1
         if post_karma > top_karma:
             top_karma = post_karma
-            top_post = item
+            top_post = item.element
+    if n_looked_up:
+        logger.info(f"Looked up the karma of {n_looked_up} posts without recorded karma")
     return top_post, top_karma
 
 
-def filter_top_post(feed: Element):
-    top_post, _ = find_top_post(feed)
-    top_post_id = top_post.find("guid").text
-
-    non_top_posts = feed.xpath(f"//channel/item[guid != '{top_post_id}']")
-
-    for item in non_top_posts:
-        feed.find("channel").remove(item)
-
+def filter_top_post(feed: Element, get_karma: Callable[[str], int] = get_post_karma, karma_store=None,
+                    items: List[FeedItem] = None):
+    items = _get_items(feed, items)
+    top_post, _ = find_top_post(feed, get_karma, karma_store, items)
+    _remove_items(feed, items, [item for item in items if item.element is not top_post])
     return feed
 
 
@@ -454,56 +633,62 @@ def update_feed_datum(feed, xpath: str, new_value: str, namespaces: object = Non
     return feed
 
 
-def add_link_to_original_article_to_feed_items_description(feed):
-    for item in feed.findall("channel/item"):
+def add_link_to_original_article_to_feed_items_description(feed, items: List[FeedItem] = None):
+    from bs4 import BeautifulSoup
 
-        item_description = item.find("description")
+    for item in _get_items(feed, items):
 
-        if item_description is None:
+        if item.description is None:
             continue
 
-        description_text = item_description.text
-        description_html = BeautifulSoup(description_text, features="lxml")
+        description_html = BeautifulSoup(item.description, features="lxml")
 
         # TODO: Check for a tag with the post to the original article before adding it, otherwise it might be
         #  duplicated.
-        link_to_original_article = item.find("link")
-        if link_to_original_article is None:
+        if item.element.find("link") is None:
             continue
 
         link_to_original_article_html = get_html_link_to_original_article(item)
         description_html.body.insert(0, BeautifulSoup(link_to_original_article_html, "html.parser").a)
-        item.find("description").text = CDATA(str(description_html))
+        item.set_description(str(description_html))
 
     return feed
 
 
-def remove_posts_with_less_than_the_minimum_characters_in_description(feed, min_chars: int):
+def remove_posts_with_less_than_the_minimum_characters_in_description(feed, min_chars: int,
+                                                                      items: List[FeedItem] = None):
     logger = logging.getLogger(f"function:{remove_posts_with_less_than_the_minimum_characters_in_description.__name__}")
-    for item in feed.findall('channel/item'):
-        if len(item.find("description").text) < min_chars:
-            feed.find('channel').remove(item)
-            logger.info(f"Removed item '{item.find('title').text}' because it has less than {min_chars}.")
+    items = _get_items(feed, items)
+    removed_items = []
+    for item in items:
+        if len(item.description) < min_chars:
+            removed_items.append(item)
+            logger.info(f"Removed item '{item.title}' because it has less than {min_chars}.")
+    _remove_items(feed, items, removed_items)
     return feed
 
 
-def remove_posts_without_paragraphs_in_description(feed):
+def remove_posts_without_paragraphs_in_description(feed, items: List[FeedItem] = None):
+    from bs4 import BeautifulSoup
+
     logger = logging.getLogger(f"function:{remove_posts_without_paragraphs_in_description.__name__}")
-    for item in feed.findall('channel/item'):
-        description_html = BeautifulSoup(item.find('description').text, 'html.parser')
+    items = _get_items(feed, items)
+    removed_items = []
+    for item in items:
+        description_html = BeautifulSoup(item.description, 'html.parser')
         if len(description_html.find_all('p')) < 1:
-            feed.find('channel').remove(item)
-            logger.info(f"Removed item '{item.find('title').text}' due to empty content, possibly a cross post.")
+            removed_items.append(item)
+            logger.info(f"Removed item '{item.title}' due to empty content, possibly a cross post.")
+    _remove_items(feed, items, removed_items)
 
     return feed
 
 
 def add_content_to_feed_items(feed):
-    for item in feed.findall("channel/item"):
+    for item in get_feed_items(feed):
         intro_str = get_intro_str(item)
-        description_text = item.find('description').text
-        content_text = intro_str + description_text + outro_str
-        content_element = etree.SubElement(item, "content")
+        content_text = intro_str + item.description + outro_str
+        content_element = etree.SubElement(item.element, "content")
         content_element.text = CDATA(content_text)
 
     return feed
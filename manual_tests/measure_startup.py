@@ -0,0 +1,79 @@
+"""
+Measure the import time of the Cloud Function entry points with `python -X importtime` and check it against a budget.
+
+Every module is imported in a fresh interpreter, so nothing is already cached in `sys.modules`. The exit status is 1
+if any module is over its budget.
+
+Example:
+    python -m manual_tests.measure_startup --runs 5 --top 10
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from statistics import median
+from typing import Dict, List, Tuple
+
+# Milliseconds. `main` must stay cheap to import because every cold start pays for it, whatever the entry point.
+STARTUP_BUDGETS_MS = {
+    'main': 100,
+    'feed_processing.feed_updaters': 400,
+}
+
+IMPORTTIME_LINE_PATTERN = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_importtime(output: str) -> Dict[str, Tuple[int, int]]:
+    """
+    Return a dict from module name to its self and cumulative import time in microseconds.
+    """
+    times = {}
+    for line in output.splitlines():
+        match = IMPORTTIME_LINE_PATTERN.match(line)
+        if match:
+            self_us, cumulative_us, _, module = match.groups()
+            times[module] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def measure_import(module: str) -> Dict[str, Tuple[int, int]]:
+    env = {**os.environ, 'GCP_BUCKET_NAME': os.environ.get('GCP_BUCKET_NAME', 'rssfile')}
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=PROJECT_ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return parse_importtime(result.stderr)
+
+
+def check_budgets(budgets: Dict[str, float], runs: int, top: int) -> List[str]:
+    """
+    Print the median import time of every module and its slowest dependencies, and return the modules over budget.
+    """
+    over_budget = []
+    for module, budget_ms in budgets.items():
+        measurements = [measure_import(module) for _ in range(runs)]
+        cumulative_ms = median(times[module][1] for times in measurements) / 1000
+        status = 'ok' if cumulative_ms <= budget_ms else 'OVER BUDGET'
+        print(f'{module}: {cumulative_ms:.1f} ms (budget {budget_ms} ms) {status}')
+        slowest = sorted(measurements[-1].items(), key=lambda item: item[1][0], reverse=True)[:top]
+        for name, (self_us, _) in slowest:
+            print(f'    {self_us / 1000:8.1f} ms  {name}')
+        if cumulative_ms > budget_ms:
+            over_budget.append(module)
+    return over_budget
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3, help='Number of measurements per module, the median is used')
+    parser.add_argument('--top', type=int, default=5, help='Number of slowest modules to list')
+    args = parser.parse_args()
+
+    over_budget = check_budgets(STARTUP_BUDGETS_MS, args.runs, args.top)
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Run the feed updaters end-to-end against the local stand-ins and report throughput.
+
+Example:
+    python -m manual_tests.run_load_test --items 500 --runs 9 --concurrency 3 --latency 0.02 --error-rate 0.01
+"""
+import argparse
+import logging
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from feed_processing.feed_config import PodcastProviderFeedConfig
+from feed_processing.feed_updaters import update_podcast_provider_feed
+from feed_processing.storage import set_gcs_client
+from manual_tests.stand_ins import StandInServer, FilesystemGcsClient
+
+
+def podcast_provider_config(source: str, forum: str, run: int) -> PodcastProviderFeedConfig:
+    return PodcastProviderFeedConfig(
+        source=source,
+        author="The Nonlinear Fund",
+        email="podcast@nonlinear.org",
+        image_url="https://storage.googleapis.com/rssfile/images/logo.png",
+        title=f"The Nonlinear Library: {forum} load test",
+        description="Load test feed",
+        title_prefix=f"{forum} - ",
+        guid_suffix=f"_{forum}",
+        gcp_bucket="load-test",
+        rss_filename=f"nonlinear-library-load-test-{forum}-{run}.xml",
+        removed_authors_file="removed_authors.txt",
+        top_post_only=run % 3 == 0,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=300, help="Number of items in the BeyondWords output feed")
+    parser.add_argument("--runs", type=int, default=9, help="Number of podcast provider feed updates")
+    parser.add_argument("--concurrency", type=int, default=1, help="Number of updates running at the same time")
+    parser.add_argument("--latency", type=float, default=0.0, help="HTTP latency in seconds")
+    parser.add_argument("--gcs-latency", type=float, default=0.0, help="Bucket latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of HTTP requests that fail")
+    args = parser.parse_args()
+
+    logging.basicConfig(stream=sys.stdout, level=logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as bucket_root, \
+            StandInServer(latency=args.latency, error_rate=args.error_rate) as server:
+        gcs_client = FilesystemGcsClient(bucket_root, latency=args.gcs_latency)
+        bucket = gcs_client.get_bucket("load-test")
+        bucket.upload_file("removed_authors.txt", "manual_tests/removed_authors.txt")
+        set_gcs_client(gcs_client)
+        source = server.add_synthetic_beyondwords_feed("beyondwords/output.xml", args.items)
+
+        forums = ("EA", "LW", "AF")
+        configs = [podcast_provider_config(source, forums[i % 3], i) for i in range(args.runs)]
+        for config in configs:
+            # Start every run from an empty podcast feed.
+            bucket.upload_file(config.rss_filename, "manual_tests/rss_files/empty_feed.xml")
+        durations = []
+        failures = 0
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            def run(i):
+                run_started = time.perf_counter()
+                update_podcast_provider_feed(configs[i], True)
+                return time.perf_counter() - run_started
+
+            for future in as_completed([executor.submit(run, i) for i in range(args.runs)]):
+                try:
+                    durations.append(future.result())
+                except Exception as e:
+                    failures += 1
+                    print(f"Run failed: {type(e).__name__}: {e}")
+        elapsed = time.perf_counter() - started
+        set_gcs_client(None)
+
+    print(f"{len(durations)} runs succeeded and {failures} failed in {elapsed:.2f} s "
+          f"({len(durations) / elapsed:.2f} runs/s)")
+    if durations:
+        durations.sort()
+        print(f"Run duration: min {durations[0]:.3f} s, median {durations[len(durations) // 2]:.3f} s, "
+              f"max {durations[-1]:.3f} s")
+    print(f"HTTP requests: {sum(server.request_counts.values())}, bucket calls: {gcs_client.calls}")
+
+
+if __name__ == '__main__':
+    main()
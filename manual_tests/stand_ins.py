@@ -0,0 +1,444 @@
+"""
+Local stand-ins for the services the feed updaters talk to, so the whole pipeline can run offline:
+
+- StandInServer: an HTTP server serving forum RSS feeds, BeyondWords output feeds, post pages and a GraphQL endpoint,
+  with configurable latency and error rate.
+- FilesystemGcsClient: a stand-in for `google.cloud.storage.Client` that keeps blobs in a local directory.
+
+Point a feed config's `source` at `StandInServer.url(...)` and call `feed_processing.storage.set_gcs_client` with a
+FilesystemGcsClient to wire them into `download_file_from_url` and `GoogleCloudStorage`.
+"""
+import io
+import json
+import os
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from xml.sax.saxutils import escape
+
+FORUM_HOSTS = {
+    "EA": "forum.effectivealtruism.org",
+    "LW": "www.lesswrong.com",
+    "AF": "www.alignmentforum.org",
+}
+
+POST_PATH_PATTERN = re.compile(r"^/posts/([^/]+)")
+GRAPHQL_POST_PATTERN = re.compile(r'(\w+)\s*:\s*post\(input:\s*{\s*selector:\s*{\s*_id:\s*"([^"]+)"')
+
+
+class StandInServer:
+    """
+    Threaded HTTP server that replays recorded or synthetic responses.
+
+    Args:
+        latency: Seconds to wait before answering each request.
+        error_rate: Fraction of requests answered with `503 Service Unavailable`.
+        seed: Seed for the random number generator which decides which requests fail.
+    """
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.request_counts = Counter()
+        self.tag_slugs = {}
+        self._routes = {}
+        self._posts = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="StandInServer", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def url(self, path: str) -> str:
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def add_file(self, path: str, content: bytes | str, content_type: str = "application/rss+xml") -> str:
+        """
+        Serve `content` at `path` and return its url.
+        """
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        self._routes["/" + path.lstrip("/")] = (content_type, content)
+        return self.url(path)
+
+    def add_recorded_file(self, path: str, filename: str) -> str:
+        """
+        Serve a recorded file at `path`. Links to the forums inside the file are rewritten to point to this server, so
+        post pages are served locally as well.
+        """
+        with open(filename, "r", encoding="utf-8") as f:
+            content = f.read()
+        for host in FORUM_HOSTS.values():
+            content = content.replace(f"https://{host}", self.base_url)
+        return self.add_file(path, content)
+
+    def add_post(self, post_id: str, karma: int, tags=()) -> str:
+        """
+        Serve a post page with the given karma and tags and return its url.
+        """
+        self._posts[post_id] = {"karma": karma, "tags": list(tags)}
+        return self.url(f"posts/{post_id}/{post_id.lower()}")
+
+    def add_synthetic_beyondwords_feed(self, path: str, n_items: int, forums=("EA", "LW", "AF")) -> str:
+        """
+        Serve a feed that looks like the BeyondWords output feed, with `n_items` items spread over `forums`. A post
+        page is added for every item.
+        """
+        items = []
+        now = datetime.now(timezone.utc)
+        for i in range(n_items):
+            forum = forums[i % len(forums)]
+            post_id = f"post{i:06d}"
+            link = self.add_post(post_id, karma=self._random.randint(0, 300),
+                                 tags=[f"tag-{i % 7}", f"tag-{i % 11}"])
+            published = format_datetime(now - timedelta(hours=i), usegmt=False)
+            description = escape(f"<p>{_paragraph(i)}</p>")
+            items.append(f"""
+        <item>
+            <guid isPermaLink="false">{post_id}_NL_{forum}</guid>
+            <title>{forum} - Synthetic post number {i} by Author {i % 13}</title>
+            <description>{description}</description>
+            <author>Author {i % 13}</author>
+            <link>{link}</link>
+            <content:encoded>{description}</content:encoded>
+            <enclosure length="{1000 + i}" type="audio/mpeg" url="{self.url(f'audio/{post_id}.mp3')}"/>
+            <pubDate>{published}</pubDate>
+            <itunes:title>{forum} - Synthetic post number {i} by Author {i % 13}</itunes:title>
+            <itunes:author>Author {i % 13}</itunes:author>
+            <itunes:duration>02:15</itunes:duration>
+            <itunes:explicit>no</itunes:explicit>
+            <itunes:episodeType>full</itunes:episodeType>
+            <itunes:episode>{i}</itunes:episode>
+        </item>""")
+        return self.add_file(path, f"""<?xml version="1.0" encoding="UTF-8"?>
+<rss xmlns:atom="http://www.w3.org/2005/Atom" xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd"
+     xmlns:content="http://purl.org/rss/1.0/modules/content/" version="2.0">
+    <channel>
+        <title>The Nonlinear Library</title>
+        <description>Synthetic BeyondWords output feed</description>
+        <author>The Nonlinear Fund</author>
+        <copyright>The Nonlinear Fund</copyright>
+        <language>en-us</language>
+        <link>https://www.nonlinear.org</link>
+        <image><url>{self.url('images/logo.png')}</url></image>
+        <itunes:owner>
+            <itunes:name>The Nonlinear Fund</itunes:name>
+            <itunes:email>podcast@nonlinear.org</itunes:email>
+        </itunes:owner>
+        <itunes:category text="Education"/>
+        <itunes:explicit>no</itunes:explicit>
+        <lastBuildDate>{format_datetime(now, usegmt=False)}</lastBuildDate>{''.join(items)}
+    </channel>
+</rss>
+""")
+
+    def add_synthetic_forum_feed(self, path: str, n_items: int, forum: str = "EA") -> str:
+        """
+        Serve a feed that looks like a forum's community RSS feed, with `n_items` items.
+        """
+        items = []
+        now = datetime.now(timezone.utc)
+        for i in range(n_items):
+            post_id = f"{forum.lower()}{i:06d}"
+            link = self.add_post(post_id, karma=self._random.randint(0, 300), tags=[f"tag-{i % 7}"])
+            published = now - timedelta(hours=i)
+            items.append(f"""
+        <item>
+            <title><![CDATA[Synthetic forum post number {i}]]></title>
+            <description><![CDATA[Published on {published.strftime('%B %-d, %Y %-I:%M %p')} GMT<br/><br/>
+                <p>{_paragraph(i)}</p><p>{_paragraph(i + 1)}</p>]]></description>
+            <link>{link}</link>
+            <guid isPermaLink="false">{post_id}</guid>
+            <dc:creator><![CDATA[Author_{i % 13}]]></dc:creator>
+            <pubDate>{published.strftime('%a, %d %b %Y %H:%M:%S GMT')}</pubDate>
+        </item>""")
+        return self.add_file(path, f"""<?xml version="1.0" encoding="UTF-8"?>
+<rss xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:content="http://purl.org/rss/1.0/modules/content/"
+     xmlns:atom="http://www.w3.org/2005/Atom" version="2.0">
+    <channel>
+        <title><![CDATA[Synthetic forum feed]]></title>
+        <description><![CDATA[A forum on this machine]]></description>
+        <link>https://{FORUM_HOSTS[forum]}</link>
+        <generator>RSS for Node</generator>
+        <atom:link href="{self.url(path)}" rel="self" type="application/rss+xml"/>
+        <lastBuildDate>{now.strftime('%a, %d %b %Y %H:%M:%S GMT')}</lastBuildDate>{''.join(items)}
+    </channel>
+</rss>
+""")
+
+    def handle_graphql(self, query: str, variables: dict) -> dict:
+        """
+        Answer a GraphQL query. Only the queries sent by the feed processing code are understood.
+        """
+        data = {}
+        if re.search(r"\btags\s*{", query):
+            data["tags"] = {"results": [{"name": name, "slug": slug} for name, slug in self.tag_slugs.items()]}
+        for alias, post_id in GRAPHQL_POST_PATTERN.findall(query):
+            post = self._posts.get(post_id)
+            data[alias] = {"result": post and {
+                "_id": post_id,
+                "baseScore": post["karma"],
+                "tags": [{"slug": tag} for tag in post["tags"]],
+            }}
+        return {"data": data}
+
+    def _post_page(self, post_id: str) -> bytes | None:
+        post = self._posts.get(post_id)
+        if post is None:
+            return None
+        tag_links = "".join(f'<a href="/tag/{tag}">{tag}</a>' for tag in post["tags"])
+        return (f'<html><head><title>{post_id}</title></head><body>'
+                f'<h1 class="PostsVote-voteScore">{post["karma"]}</h1>{tag_links}'
+                f'<p>{_paragraph(len(post_id))}</p></body></html>').encode("utf-8")
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _respond(self, status: int, content_type: str = "text/plain", body: bytes = b"", headers=None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _before_request(self) -> bool:
+                path = self.path.split("?")[0]
+                with server._lock:
+                    server.request_counts[path] += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                if server._should_fail():
+                    self._respond(503, body=b"Service Unavailable", headers={"Retry-After": "1"})
+                    return False
+                return True
+
+            def do_GET(self):
+                if not self._before_request():
+                    return
+                path = self.path.split("?")[0]
+                if path in server._routes:
+                    content_type, body = server._routes[path]
+                    return self._respond(200, content_type, body)
+                post_match = POST_PATH_PATTERN.match(path)
+                page = post_match and server._post_page(post_match.group(1))
+                if page:
+                    return self._respond(200, "text/html; charset=utf-8", page)
+                self._respond(404, body=b"Not Found")
+
+            def do_POST(self):
+                if not self._before_request():
+                    return
+                if self.path.split("?")[0] != "/graphql":
+                    return self._respond(404, body=b"Not Found")
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                response = server.handle_graphql(request.get("query", ""), request.get("variables") or {})
+                self._respond(200, "application/json", json.dumps(response).encode("utf-8"))
+
+        return Handler
+
+
+def _paragraph(seed: int) -> str:
+    return f"Paragraph {seed}. " + "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 6
+
+
+class FilesystemBlob:
+    """
+    Subset of `google.cloud.storage.Blob` backed by a local file.
+    """
+
+    def __init__(self, bucket, name: str):
+        self.bucket = bucket
+        self.name = name
+        self.generation = None
+        self.etag = None
+        self.size = None
+        self.updated = None
+
+    @property
+    def _path(self) -> str:
+        return os.path.join(self.bucket.path, self.name)
+
+    def exists(self) -> bool:
+        return os.path.isfile(self._path)
+
+    def reload(self):
+        stat = os.stat(self._path)
+        self.generation = stat.st_mtime_ns
+        self.etag = f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+        self.size = stat.st_size
+        self.updated = datetime.fromtimestamp(stat.st_mtime, timezone.utc)
+
+    def download_as_bytes(self) -> bytes:
+        self.bucket.client.simulate_latency()
+        with open(self._path, "rb") as f:
+            return f.read()
+
+    download_as_string = download_as_bytes
+
+    def upload_from_string(self, data: bytes | str, content_type: str = None, if_generation_match: int = None):
+        self.bucket.client.simulate_latency()
+        if if_generation_match is not None:
+            from google.api_core.exceptions import PreconditionFailed
+
+            generation = os.stat(self._path).st_mtime_ns if self.exists() else 0
+            if generation != if_generation_match:
+                raise PreconditionFailed(f"{self.name} is at generation {generation}, not {if_generation_match}")
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        with open(self._path, "wb") as f:
+            f.write(data)
+        self.reload()
+
+    def open(self, mode: str = "r", ignore_flush: bool = False, **kwargs):
+        self.bucket.client.simulate_latency()
+        if mode == "wb":
+            return FilesystemBlobWriter(self, ignore_flush)
+        return open(self._path, mode, **({} if "b" in mode else {"encoding": "utf-8"}))
+
+
+class FilesystemBlobWriter(io.BufferedIOBase):
+    """
+    Subset of `google.cloud.storage.fileio.BlobWriter` backed by a temporary file. Like an upload, the blob is only
+    replaced when the writer is closed, and is left as it was if the `with` block raises.
+    """
+
+    def __init__(self, blob: FilesystemBlob, ignore_flush: bool = False):
+        super().__init__()
+        self.blob = blob
+        self._ignore_flush = ignore_flush
+        directory = os.path.dirname(blob._path)
+        os.makedirs(directory, exist_ok=True)
+        fd, self._tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        self._file = os.fdopen(fd, "wb")
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        return self._file.write(data)
+
+    def flush(self):
+        # An upload can't be flushed without finalizing it, which the real writer refuses unless told to ignore it.
+        if not self._ignore_flush:
+            raise io.UnsupportedOperation("Cannot flush without finalizing upload. Use close() instead, or set "
+                                          "ignore_flush=True.")
+
+    @property
+    def closed(self) -> bool:
+        return self._file.closed
+
+    def close(self):
+        if not self.closed:
+            self._file.close()
+            os.replace(self._tmp_path, self.blob._path)
+            self.blob.reload()
+
+    def terminate(self):
+        """
+        Cancel the upload, leaving the blob as it was.
+        """
+        self._file.close()
+        os.remove(self._tmp_path)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None:
+            self.terminate()
+        else:
+            self.close()
+
+
+class FilesystemBucket:
+    """
+    Subset of `google.cloud.storage.Bucket` backed by a local directory.
+    """
+
+    def __init__(self, client, name: str):
+        self.client = client
+        self.name = name
+        self.path = os.path.join(client.root, name)
+
+    def blob(self, name: str) -> FilesystemBlob:
+        return FilesystemBlob(self, name)
+
+    def get_blob(self, name: str) -> FilesystemBlob | None:
+        self.client.simulate_latency()
+        blob = self.blob(name)
+        if not blob.exists():
+            return None
+        blob.reload()
+        return blob
+
+    def upload_file(self, name: str, filename: str):
+        """
+        Copy a local file into the bucket, e.g. to seed it with fixtures.
+        """
+        blob = self.blob(name)
+        os.makedirs(os.path.dirname(blob._path), exist_ok=True)
+        shutil.copyfile(filename, blob._path)
+
+
+class FilesystemGcsClient:
+    """
+    Stand-in for `google.cloud.storage.Client` that stores every bucket as a directory under `root`.
+
+    Args:
+        root: Directory holding one sub-directory per bucket.
+        latency: Seconds to wait on every call that would reach GCS.
+    """
+
+    def __init__(self, root: str, latency: float = 0.0):
+        self.root = root
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def simulate_latency(self):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def bucket(self, name: str) -> FilesystemBucket:
+        return FilesystemBucket(self, name)
+
+    def get_bucket(self, name: str) -> FilesystemBucket:
+        self.simulate_latency()
+        os.makedirs(os.path.join(self.root, name), exist_ok=True)
+        return self.bucket(name)
@@ -1,6 +1,5 @@
 import logging
 
-from google.cloud import logging as gcloud_logging
 from lxml import etree
 from lxml.etree import XMLParser, XMLSyntaxError
 
@@ -20,6 +19,7 @@ def xml_string_is_valid(xml_str):
 
 def check_xml_files_integrity(urls, running_on_gcp=True):
     if running_on_gcp:
+        from google.cloud import logging as gcloud_logging
         logging_client = gcloud_logging.Client()
 
         # This log can be found in the Cloud Logging console under 'Custom Logs'.
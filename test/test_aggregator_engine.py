@@ -0,0 +1,80 @@
+import dataclasses
+import datetime
+
+import pytest
+import requests
+from lxml import etree
+
+from aggregations.engine import AggregatorEngine, VARIANTS, get_periods_back
+from aggregations.history import TitleHistory
+from manual_tests.stand_ins import StandInServer
+
+
+@pytest.fixture
+def server():
+    with StandInServer() as server:
+        yield server
+
+
+@pytest.fixture
+def variants(tmp_path):
+    return [dataclasses.replace(variant, local_dir=str(tmp_path)) for variant in VARIANTS]
+
+
+def item_titles(filename):
+    return [title.text for title in etree.parse(filename).findall("channel/item/title")]
+
+
+def test_all_aggregated_feeds_are_built_from_one_parse_of_the_source(server, variants):
+    source_url = server.add_synthetic_beyondwords_feed("output.xml", 90)
+
+    written = AggregatorEngine(variants, local=True, source_url=source_url).run()
+
+    assert len(written) == 9
+    assert server.request_counts["/output.xml"] == 1
+    # The daily and weekly feeds of a forum share the karma of the posts they both consider.
+    assert all(count == 1 for path, count in server.request_counts.items() if path.startswith("/posts/"))
+    ea_titles = item_titles(written["ea"])
+    assert len(ea_titles) == 30 and all(title.startswith("EA - ") for title in ea_titles)
+    assert len(item_titles(written["lw_daily"])) == 1
+
+
+def test_posts_in_the_history_stay_in_the_daily_feed(server, variants, tmp_path):
+    source_url = server.add_synthetic_beyondwords_feed("output.xml", 90)
+    old_title = "EA - A post picked a few days ago"
+    source = requests.get(source_url).text.replace("EA - Synthetic post number 87 by Author 9", old_title)
+    source_url = server.add_file("output.xml", source)
+    history_filename = tmp_path / "history_titles_nonlinear-library-aggregated-EA-daily.txt"
+    history_filename.write_text(old_title)
+
+    written = AggregatorEngine(variants, local=True, source_url=source_url).run()
+
+    titles = item_titles(written["ea_daily"])
+    assert old_title in titles
+    assert len(titles) == 2
+    # The plain list of titles is imported into the binary history.
+    history_bytes = (tmp_path / "history_titles_nonlinear-library-aggregated-EA-daily.bin").read_bytes()
+    history = TitleHistory.from_bytes(history_bytes)
+    assert sorted(history) == sorted(titles)
+
+
+def test_periods_back_are_counted_in_days_and_iso_weeks():
+    wednesday = datetime.date(2026, 10, 21)
+
+    assert get_periods_back("daily", datetime.datetime(2026, 10, 20, 23, 59), wednesday) == 1
+    assert get_periods_back("weekly", datetime.datetime(2026, 10, 19, 0, 0), wednesday) == 0
+    assert get_periods_back("weekly", datetime.datetime(2026, 10, 18, 23, 59), wednesday) == 1
+
+
+def test_posts_whose_karma_cannot_be_fetched_count_as_zero_karma(variants):
+    links = ["https://www.lesswrong.com/posts/a", "https://www.lesswrong.com/posts/b"]
+
+    def get_karma(link):
+        if link == links[0]:
+            raise requests.ConnectionError("Forum unavailable")
+        return 12
+
+    engine = AggregatorEngine(variants, local=True, get_karma=get_karma)
+    engine.fetch_karmas(links)
+
+    assert engine.karmas == {links[0]: 0, links[1]: 12}
@@ -0,0 +1,119 @@
+import threading
+import time
+
+import pytest
+
+from feed_processing.dag import DagRunner, Node, get_url_version
+from feed_processing.storage import LocalStorage
+from manual_tests.stand_ins import StandInServer
+
+
+class Inputs:
+    def __init__(self, **versions):
+        self.versions = versions
+
+    def __getitem__(self, name):
+        return lambda: self.versions[name]
+
+
+def test_independent_nodes_run_in_parallel_and_dependents_after_them():
+    both_started = threading.Barrier(2, timeout=5)
+    runs = []
+    nodes = [Node("a", run=lambda: both_started.wait()),
+             Node("b", run=lambda: both_started.wait()),
+             Node("c", run=lambda: runs.append("c"), deps=["a", "b"])]
+
+    report = DagRunner(nodes).run()
+
+    assert runs == ["c"]
+    assert {name: result.status for name, result in report.results.items()} == {"a": "ran", "b": "ran", "c": "ran"}
+
+
+def test_nodes_only_run_when_their_inputs_changed(tmp_path):
+    inputs = Inputs(source="v1")
+    runs = []
+    nodes = [Node("sensor", inputs=[inputs["source"]]),
+             Node("feed", run=lambda: runs.append("feed"), deps=["sensor"]),
+             Node("checks", run=lambda: runs.append("checks"), deps=["feed"])]
+    state_filename = str(tmp_path / "dag_state.json")
+
+    DagRunner(nodes, storage=LocalStorage(None), state_filename=state_filename).run()
+    report = DagRunner(nodes, storage=LocalStorage(None), state_filename=state_filename).run()
+    assert runs == ["feed", "checks"]
+    assert report.results["checks"].status == "unchanged"
+
+    inputs.versions["source"] = "v2"
+    DagRunner(nodes, storage=LocalStorage(None), state_filename=state_filename).run()
+    assert runs == ["feed", "checks", "feed", "checks"]
+
+
+def test_failed_node_skips_its_dependents_and_runs_again():
+    inputs = Inputs(source="v1")
+    attempts = []
+
+    def failing():
+        attempts.append("feed")
+        raise RuntimeError("Feed unavailable")
+
+    runner = DagRunner([Node("feed", run=failing, inputs=[inputs["source"]]),
+                        Node("checks", run=lambda: attempts.append("checks"), deps=["feed"])])
+    first = runner.run()
+    runner.run()
+
+    assert first.results["feed"].status == "failed"
+    assert first.results["checks"].status == "upstream_failed"
+    # The input versions are only recorded after a successful run.
+    assert attempts == ["feed", "feed"]
+
+
+def test_dependent_that_failed_runs_again_although_the_sensor_is_unchanged(tmp_path):
+    inputs = Inputs(output="etag-1")
+    attempts = []
+
+    def flaky():
+        attempts.append("podcast")
+        if len(attempts) == 1:
+            raise RuntimeError("Bucket unavailable")
+
+    nodes = [Node("beyondwords_output", inputs=[inputs["output"]]),
+             Node("podcast", run=flaky, deps=["beyondwords_output"])]
+    state_filename = str(tmp_path / "dag_state.json")
+
+    first = DagRunner(nodes, storage=LocalStorage(None), state_filename=state_filename).run()
+    second = DagRunner(nodes, storage=LocalStorage(None), state_filename=state_filename).run()
+    third = DagRunner(nodes, storage=LocalStorage(None), state_filename=state_filename).run()
+
+    assert first.results["podcast"].status == "failed"
+    assert second.results["beyondwords_output"].status == "unchanged"
+    assert second.results["podcast"].status == "ran"
+    assert third.results["podcast"].status == "unchanged"
+    assert attempts == ["podcast", "podcast"]
+
+
+def test_critical_path_follows_the_slowest_dependencies():
+    nodes = [Node("fast", run=lambda: None),
+             Node("slow", run=lambda: time.sleep(0.05)),
+             Node("feed", run=lambda: None, deps=["fast", "slow"]),
+             Node("other", run=lambda: None)]
+
+    # A single worker runs the nodes one after the other, so "slow" always finishes after "fast".
+    report = DagRunner(nodes, max_workers=1).run()
+
+    assert report.critical_path == ["slow", "feed"]
+    assert "Critical path" in report.format()
+
+
+def test_invalid_graphs_are_rejected():
+    with pytest.raises(ValueError):
+        DagRunner([Node("feed", deps=["missing"])])
+    with pytest.raises(ValueError):
+        DagRunner([Node("a", deps=["b"]), Node("b", deps=["a"])]).run()
+
+
+def test_url_version_changes_with_the_content():
+    with StandInServer() as server:
+        url = server.add_file("/output.xml", "<rss/>")
+        first = get_url_version(url)
+        assert get_url_version(url) == first
+        server.add_file("/output.xml", "<rss><channel/></rss>")
+        assert get_url_version(url) != first
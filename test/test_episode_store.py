@@ -0,0 +1,158 @@
+import pytest
+from lxml import etree
+
+from feed_processing.episode_store import EpisodeStore
+from feed_processing.feed_config import BeyondWordsInputConfig
+from feed_processing.feed_item import normalize_title
+from feed_processing.feed_updaters import update_beyondwords_input_feed
+from feed_processing.storage import GoogleCloudStorage, LocalStorage, VersionConflictError, set_gcs_client
+from feed_processing.utils import item_title_is_duplicate
+from manual_tests.stand_ins import FilesystemGcsClient, StandInServer
+
+
+@pytest.fixture
+def episode_store(tmp_path):
+    store = EpisodeStore(LocalStorage(rss_filename=None), str(tmp_path / "episodes.sqlite")).load()
+    yield store
+    store.close()
+
+
+def item_titles(feed):
+    return [title.text for title in feed.findall("channel/item/title")]
+
+
+def test_imported_feed_is_rendered_with_its_items_in_order(episode_store):
+    storage = LocalStorage(rss_filename="./files/beyondwords_input_feed.xml")
+    feed = storage.read_podcast_feed()
+
+    episode_store.ensure_feed("input.xml", storage.read_podcast_feed)
+    episode_store.ensure_feed("input.xml", lambda: pytest.fail("The feed is imported only once"))
+
+    assert item_titles(episode_store.render("input.xml")) == item_titles(feed)
+
+
+def test_only_new_titles_are_appended(episode_store):
+    feed = LocalStorage(rss_filename="./files/beyondwords_input_feed.xml").read_podcast_feed()
+    items = feed.findall("channel/item")
+    episode_store.ensure_feed("input.xml", lambda: feed)
+
+    new_item = etree.fromstring(
+        b"<item><title>EA - A new post by Someone</title><guid>new</guid>"
+        b"<description><![CDATA[<p>Summary</p>]]></description></item>",
+        etree.XMLParser(strip_cdata=False)
+    )
+    appended = episode_store.append_items("input.xml", [items[0], new_item])
+
+    assert appended == [new_item]
+    assert item_titles(episode_store.render("input.xml"))[-1] == "EA - A new post by Someone"
+    assert b"<![CDATA[<p>Summary</p>]]>" in etree.tostring(episode_store.render("input.xml"))
+    assert episode_store.count("input.xml") == len(items) + 1
+
+
+def test_posts_are_found_with_or_without_prefix_and_author(episode_store):
+    item = etree.fromstring(
+        b"<item><title>LW - Some Post Title by The Author</title><author>The Author</author><guid>a</guid></item>"
+    )
+    episode_store.ensure_feed("lw.xml", lambda: etree.fromstring(b"<rss><channel/></rss>"))
+    episode_store.append_items("lw.xml", [item])
+
+    assert episode_store.contains_post(["ea.xml", "lw.xml"], "Some  Post Title", "The Author")
+    assert not episode_store.contains_post(["ea.xml"], "Some Post Title", "The Author")
+    assert normalize_title("EA - Some Post Title by The Author", " The\n Author ") == "some post title"
+
+
+def test_posts_only_match_whole_normalized_titles(episode_store):
+    item = etree.fromstring(b"<item><title>EA - AI Safety Basics by Someone</title><author>Someone</author>"
+                            b"<guid>a</guid></item>")
+    episode_store.ensure_feed("ea.xml", lambda: etree.fromstring(b"<rss><channel/></rss>"))
+    episode_store.append_items("ea.xml", [item])
+
+    assert episode_store.contains_post(["ea.xml"], "ai  safety BASICS", "Someone")
+    # `item_title_is_duplicate` matches titles contained in a published title, the store doesn't.
+    assert item_title_is_duplicate("AI Safety", ["EA - AI Safety Basics by Someone"])
+    assert not episode_store.contains_post(["ea.xml"], "AI Safety", "Someone")
+
+
+def test_store_is_saved_and_loaded_from_storage(episode_store):
+    storage = LocalStorage(rss_filename="./files/beyondwords_input_feed.xml")
+    episode_store.ensure_feed("input.xml", storage.read_podcast_feed)
+    episode_store.save()
+
+    reloaded = EpisodeStore(episode_store.storage, episode_store.filename).load()
+
+    assert reloaded.count("input.xml") == episode_store.count("input.xml") > 0
+    reloaded.close()
+
+
+def test_beyondwords_input_feed_is_deduplicated_with_the_episode_store(tmp_path, monkeypatch):
+    client = FilesystemGcsClient(str(tmp_path))
+    bucket = client.get_bucket("rssfile")
+    bucket.upload_file("removed_authors.txt", "./files/removed_authors.txt")
+    bucket.upload_file("nonlinear-library-EA.xml", "./files/beyondwords_input_feed.xml")
+    set_gcs_client(client)
+    monkeypatch.setenv("EPISODE_STORE", "episodes.sqlite")
+    try:
+        with StandInServer() as server:
+            config = BeyondWordsInputConfig(
+                author="The Nonlinear Fund",
+                email="main@nonlinear.com",
+                gcp_bucket="rssfile",
+                source=server.add_synthetic_forum_feed("feed.xml", 5),
+                max_entries=30,
+                rss_filename="nonlinear-library-EA.xml",
+                removed_authors_file="removed_authors.txt",
+                relevant_feeds=["nonlinear-library-EA.xml"]
+            )
+            update_beyondwords_input_feed(config, True)
+            first_titles = item_titles(etree.fromstring(bucket.get_blob(config.rss_filename).download_as_bytes()))
+            update_beyondwords_input_feed(config, True)
+    finally:
+        set_gcs_client(None)
+
+    titles = item_titles(etree.fromstring(bucket.get_blob(config.rss_filename).download_as_bytes()))
+    assert sum("Synthetic forum post" in title for title in first_titles) == 5
+    assert titles == first_titles
+    assert bucket.get_blob("episodes.sqlite") is not None
+
+
+@pytest.mark.parametrize("on_gcs", [False, True])
+def test_save_fails_if_another_run_saved_the_store_since_it_was_loaded(tmp_path, on_gcs):
+    if on_gcs:
+        storage = GoogleCloudStorage("episodes", rss_filename=None, client=FilesystemGcsClient(str(tmp_path)))
+        filename = "episodes.sqlite"
+    else:
+        storage = LocalStorage(rss_filename=None)
+        filename = str(tmp_path / "episodes.sqlite")
+    with EpisodeStore(storage, filename).load() as store:
+        store.save()
+
+    with EpisodeStore(storage, filename).load() as first, EpisodeStore(storage, filename).load() as second:
+        first.ensure_feed("lw.xml", lambda: etree.fromstring(b"<rss><channel/></rss>"))
+        first.save()
+        first.save()
+        with pytest.raises(VersionConflictError):
+            second.save()
+
+    with EpisodeStore(storage, filename).load() as reloaded:
+        assert reloaded.has_feed("lw.xml")
+
+
+def test_changes_are_applied_again_to_a_store_saved_by_another_run(tmp_path):
+    storage = LocalStorage(rss_filename=None)
+    filename = str(tmp_path / "episodes.sqlite")
+    item = etree.fromstring(b"<item><title>EA - A post by Someone</title><guid>a</guid></item>")
+
+    with EpisodeStore(storage, filename).load() as first, EpisodeStore(storage, filename).load() as second:
+        second.ensure_feed("lw.xml", lambda: etree.fromstring(b"<rss><channel/></rss>"))
+        second.save()
+
+        def append_item():
+            first.ensure_feed("ea.xml", lambda: etree.fromstring(b"<rss><channel/></rss>"))
+            first.append_items("ea.xml", [item])
+
+        append_item()
+        first.save(reapply=append_item)
+
+    with EpisodeStore(storage, filename).load() as reloaded:
+        assert reloaded.has_feed("lw.xml")
+        assert item_titles(reloaded.render("ea.xml")) == ["EA - A post by Someone"]
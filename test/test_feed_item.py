@@ -0,0 +1,66 @@
+from lxml import etree
+
+from feed_processing.feed_item import FeedItem
+from feed_processing.storage import LocalStorage
+from feed_processing.utils import filter_entries_by_forum_title_prefix, get_feed_items, \
+    remove_items_also_found_in_other_relevant_files
+
+
+def test_fields_are_parsed_once_from_the_element():
+    feed = LocalStorage(rss_filename=None).read_podcast_feed("./files/beyondwords_output_feed.xml")
+    element = feed.find("channel/item")
+
+    item = FeedItem.from_element(element)
+
+    assert item.element is element
+    assert item.guid == "a3r2Qru84Rz5LsQk9_NL_LW"
+    assert item.title == "TF - A post from TestForum by Author One"
+    assert item.author == "Author One"
+    assert item.link == "https://testforum.com/anentry"
+    assert item.pub_date == 1683142419
+    assert not hasattr(item, "__dict__")
+
+
+def test_forum_and_normalized_title_follow_the_title():
+    element = etree.fromstring(
+        "<item><title>A post</title><link>https://www.lesswrong.com/posts/abc/a-post</link>"
+        "<author>Someone</author><pubDate>not a date</pubDate></item>")
+
+    item = FeedItem.from_element(element)
+    assert (item.forum, item.normalized_title, item.pub_date) == ("LW", "a post", None)
+
+    item.set_title("EA - A post by Someone")
+    assert (item.forum, item.normalized_title) == ("EA", "a post")
+    assert element.findtext("title") == "EA - A post by Someone"
+
+
+def test_fields_are_only_parsed_when_read():
+    element = etree.fromstring("<item><title>A post</title><pubDate>Wed, 03 May 2023 19:33:39 +0000</pubDate></item>")
+    item = FeedItem.from_element(element)
+
+    element.find("pubDate").text = "Thu, 04 May 2023 19:33:39 +0000"
+    assert item.pub_date == 1683228819
+
+    element.find("pubDate").text = "not a date"
+    assert item.pub_date == 1683228819
+
+
+def test_stages_share_the_items_of_a_run():
+    feed = etree.fromstring(
+        "<rss><channel>"
+        "<item><title>LW - A post</title></item>"
+        "<item><title>EA - Another post</title></item>"
+        "<item><title>LW - A third post</title></item>"
+        "</channel></rss>")
+    items = get_feed_items(feed)
+    first, _, third = items
+
+    filter_entries_by_forum_title_prefix(feed, "LW", items=items)
+    assert items == [first, third]
+
+    # The titles were read by the first stage and aren't looked up again.
+    third.element.find("title").text = "Edited"
+    remove_items_also_found_in_other_relevant_files(feed, ["LW - A third post by Someone"], items=items)
+
+    assert items == [first]
+    assert feed.findall("channel/item") == [first.element]
@@ -0,0 +1,69 @@
+import io
+
+import pytest
+from lxml import etree
+
+from feed_processing.feed_writer import RssWriter, open_local_feed
+
+ITUNES_NAMESPACE = "http://www.itunes.com/dtds/podcast-1.0.dtd"
+
+
+def write_feed(write_items):
+    output = io.BytesIO()
+    with RssWriter(output, {"itunes": ITUNES_NAMESPACE}) as writer:
+        writer.element("title", "The Nonlinear Library")
+        write_items(writer)
+    return output.getvalue()
+
+
+def test_text_is_escaped_instead_of_patched():
+    def write_items(writer):
+        with writer.item():
+            writer.element("title", "EA - Why <5% of funding & more")
+            writer.element("description", "<p>Summary</p>", cdata=True)
+
+    feed = write_feed(write_items)
+
+    assert b"<![CDATA[<p>Summary</p>]]>" in feed
+    item = etree.fromstring(feed).find("channel/item")
+    assert item.findtext("title") == "EA - Why <5% of funding & more"
+
+
+def test_namespaces_are_declared_once_on_the_root():
+    def write_items(writer):
+        for i in range(3):
+            with writer.item():
+                writer.element("itunes:episode", i)
+                writer.element("itunes:category", text="Education")
+
+    feed = write_feed(write_items)
+
+    assert feed.count(ITUNES_NAMESPACE.encode()) == 1
+    episodes = etree.fromstring(feed).findall(f"channel/item/{{{ITUNES_NAMESPACE}}}episode")
+    assert [episode.text for episode in episodes] == ["0", "1", "2"]
+    assert etree.fromstring(feed).find(f"channel/item/{{{ITUNES_NAMESPACE}}}category").get("text") == "Education"
+
+
+def test_text_that_cannot_be_cdata_or_xml_is_still_written_as_valid_xml():
+    def write_items(writer):
+        with writer.item():
+            writer.element("description", "Ends a CDATA section ]]> early", cdata=True)
+            writer.element("title", "Control\x0b character")
+
+    item = etree.fromstring(write_feed(write_items)).find("channel/item")
+
+    assert item.findtext("description") == "Ends a CDATA section ]]> early"
+    assert item.findtext("title") == "Control character"
+
+
+def test_local_feed_is_kept_if_writing_the_new_one_fails(tmp_path):
+    filename = tmp_path / "feed.xml"
+    filename.write_bytes(b"<rss>previous</rss>")
+
+    with pytest.raises(KeyError):
+        with open_local_feed(str(filename)) as f, RssWriter(f) as writer:
+            writer.element("title", "New feed")
+            raise KeyError("itunes_duration")
+
+    assert filename.read_bytes() == b"<rss>previous</rss>"
+    assert list(tmp_path.iterdir()) == [filename]
@@ -0,0 +1,134 @@
+import asyncio
+import time
+import types
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+from feed_processing import fetching  # noqa: E402
+from feed_processing.fetching import AsyncFetcher, CircuitOpenError, get_retry_after  # noqa: E402
+
+
+def fetch_all(urls, handler, **kwargs):
+    """
+    Fetch every url concurrently and return the response or the exception of each one, and the fetcher.
+    """
+    async def fetch(fetcher, url):
+        try:
+            return await fetcher.get(url)
+        except (httpx.HTTPError, CircuitOpenError, asyncio.TimeoutError) as e:
+            return e
+
+    async def run():
+        async with AsyncFetcher(transport=httpx.MockTransport(handler), **kwargs) as fetcher:
+            return await asyncio.gather(*[fetch(fetcher, url) for url in urls]), fetcher
+
+    return asyncio.run(run())
+
+
+def test_throttled_requests_are_retried_with_a_lower_concurrency_limit():
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        if len(calls) == 1:
+            return httpx.Response(429, headers={"Retry-After": "0"})
+        return httpx.Response(200, text="ok")
+
+    responses, fetcher = fetch_all(["https://forum.test/a"], handler, initial_concurrency=8)
+
+    assert responses[0].text == "ok"
+    assert calls == ["/a", "/a"]
+    assert fetcher.host("https://forum.test/a").limiter.limit < 8
+
+
+def test_concurrency_never_exceeds_the_limit():
+    in_flight = 0
+    max_in_flight = 0
+
+    async def handler(request):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return httpx.Response(200)
+
+    fetch_all([f"https://forum.test/{i}" for i in range(30)], handler, rate=1000, burst=1000,
+              initial_concurrency=3, max_concurrency=3)
+
+    assert max_in_flight == 3
+
+
+def test_requests_are_spread_out_by_the_token_bucket(monkeypatch):
+    # The clock only advances when the fetcher sleeps, so the result doesn't depend on how fast the test runs.
+    now = 0.0
+    real_sleep = asyncio.sleep
+
+    async def sleep(seconds):
+        nonlocal now
+        # Like a real clock, advance by at least a tick, so a sleep shorter than the float precision of `now` ends.
+        now += max(seconds, 1e-6)
+        await real_sleep(0)
+
+    monkeypatch.setattr(fetching, "time", types.SimpleNamespace(monotonic=lambda: now, time=time.time))
+    monkeypatch.setattr(asyncio, "sleep", sleep)
+    fetch_all([f"https://forum.test/{i}" for i in range(10)], lambda request: httpx.Response(200), rate=20, burst=1)
+
+    # The first request uses the burst, the other 9 wait for a token, 50 ms each.
+    assert now == pytest.approx(9 / 20, abs=1e-3)
+
+
+def test_circuit_opens_after_consecutive_failures():
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        return httpx.Response(500)
+
+    responses, _ = fetch_all([f"https://forum.test/{i}" for i in range(6)], handler, initial_concurrency=1,
+                             max_retries=0, failure_threshold=3)
+
+    assert len(calls) == 3
+    assert sum(isinstance(response, CircuitOpenError) for response in responses) == 3
+
+
+def test_circuit_opens_for_a_host_that_hangs():
+    calls = []
+
+    async def handler(request):
+        calls.append(request.url.path)
+        await asyncio.sleep(1)
+        return httpx.Response(200)
+
+    responses, _ = fetch_all([f"https://forum.test/{i}" for i in range(6)], handler, initial_concurrency=1,
+                             deadline=0.05, failure_threshold=3)
+
+    assert len(calls) == 3
+    assert sum(isinstance(response, asyncio.TimeoutError) for response in responses) == 3
+    assert sum(isinstance(response, CircuitOpenError) for response in responses) == 3
+
+
+def test_requests_fail_after_the_deadline():
+    async def handler(request):
+        await asyncio.sleep(1)
+        return httpx.Response(200)
+
+    responses, _ = fetch_all(["https://forum.test/slow"], handler, deadline=0.05)
+
+    assert isinstance(responses[0], asyncio.TimeoutError)
+
+
+def test_time_queued_behind_the_rate_limit_does_not_count_towards_the_deadline():
+    # At 50 requests per second, the last of 20 requests is sent about 0.4 s after the first one.
+    responses, _ = fetch_all([f"https://forum.test/{i}" for i in range(20)], lambda request: httpx.Response(200),
+                             rate=50, burst=1, deadline=0.2)
+
+    assert all(isinstance(response, httpx.Response) for response in responses)
+
+
+def test_retry_after_accepts_seconds_and_dates():
+    assert get_retry_after(httpx.Response(503, headers={"Retry-After": "3"})) == 3
+    assert get_retry_after(httpx.Response(503, headers={"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})) == 0
+    assert get_retry_after(httpx.Response(503)) is None
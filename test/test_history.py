@@ -0,0 +1,38 @@
+from aggregations.history import BloomFilter, TitleHistory
+
+
+def test_titles_are_found_exactly_or_by_similarity():
+    history = TitleHistory(["EA - Why we should fund more research by Author A"])
+
+    assert "EA - Why we should fund more research by Author A" in history
+    assert "EA - Why we should fund more research! by Author A" in history
+    assert "EA - Something else entirely by Author B" not in history
+
+
+def test_old_titles_are_still_found_exactly_after_leaving_the_ring_buffer():
+    history = TitleHistory([f"EA - Post number {i}" for i in range(100)], ring_buffer_size=10)
+
+    assert len(list(history)) == 10
+    assert "EA - Post number 0" in history
+    assert "LW - Unrelated title" not in history
+
+
+def test_history_is_serialized_to_a_constant_size():
+    small = TitleHistory(["EA - One post"], ring_buffer_size=4)
+    large = TitleHistory([f"EA - Post {i:04d}" for i in range(5000)], ring_buffer_size=4)
+
+    restored = TitleHistory.from_bytes(large.to_bytes())
+
+    assert abs(len(large.to_bytes()) - len(small.to_bytes())) < 64
+    assert list(restored) == list(large)
+    assert all(f"EA - Post {i:04d}" in restored for i in range(5000))
+
+
+def test_bloom_filter_false_positive_rate_is_low():
+    bloom_filter = BloomFilter()
+    for i in range(4000):
+        bloom_filter.add(f"added {i}")
+
+    false_positives = sum(f"not added {i}" in bloom_filter for i in range(10000))
+
+    assert false_positives <= 5
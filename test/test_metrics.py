@@ -0,0 +1,48 @@
+import json
+import logging
+
+import pytest
+
+from feed_processing.metrics import track_run
+
+
+def test_run_summary_contains_one_entry_per_stage(caplog):
+    with caplog.at_level(logging.INFO, logger="RunMetrics"):
+        with track_run("test_run", rss_filename="feed.xml") as metrics:
+            with metrics.stage("download") as stage:
+                stage.items = 3
+            with metrics.stage("upload"):
+                pass
+
+    summary = json.loads(caplog.records[-1].getMessage())
+    assert summary["run"] == "test_run"
+    assert summary["rss_filename"] == "feed.xml"
+    assert summary["status"] == "ok"
+    assert [stage["name"] for stage in summary["stages"]] == ["download", "upload"]
+    assert summary["stages"][0]["items"] == 3
+
+
+def test_run_summary_is_emitted_when_a_stage_fails(caplog):
+    with caplog.at_level(logging.INFO, logger="RunMetrics"):
+        with pytest.raises(RuntimeError):
+            with track_run("failing_run") as metrics:
+                with metrics.stage("download"):
+                    raise RuntimeError("Network is down")
+
+    summary = json.loads(caplog.records[-1].getMessage())
+    assert summary["status"] == "error"
+    assert summary["stages"][0]["name"] == "download"
+
+
+def test_run_summary_is_appended_to_metrics_file(tmp_path, monkeypatch):
+    metrics_file = tmp_path / "metrics.jsonl"
+    monkeypatch.setenv("METRICS_FILE", str(metrics_file))
+
+    for _ in range(2):
+        with track_run("test_run") as metrics:
+            with metrics.stage("download"):
+                pass
+
+    lines = metrics_file.read_text().splitlines()
+    assert len(lines) == 2
+    assert all(json.loads(line)["run"] == "test_run" for line in lines)
@@ -0,0 +1,89 @@
+import dataclasses
+import io
+from datetime import datetime, timedelta, timezone
+
+from lxml import etree
+
+from feed_processing.feed_config import PodcastProviderFeedConfig
+from feed_processing.pipeline import FeedSource, filter_by_title_prefix, iter_tree_items, pipe, prepend_to_titles, \
+    remove_authors, take, write_feed, append_author_to_titles, filter_by_search_period
+from feed_processing.storage import LocalStorage
+from feed_processing.utils import filter_entries_by_forum_title_prefix, filter_entries_by_search_period
+from manual_tests.stand_ins import StandInServer
+
+
+def test_items_are_detached_from_the_source_as_they_are_parsed():
+    source = FeedSource.from_file("./files/forum_feed.xml")
+
+    items = list(source)
+
+    assert [item.guid for item in items] == ["ZKYpu4WAiwTXDSrX8", "ZKYpu4WAiwTXDSrX8"]
+    assert all(item.element.getparent() is None for item in items)
+    assert source.channel.find("item") is None
+    assert source.channel.findtext("title")
+
+
+def test_stages_select_the_same_items_as_the_tree_functions():
+    storage = LocalStorage(rss_filename=None)
+    feed = storage.read_podcast_feed("./files/beyondwords_output_feed.xml")
+    title_prefix = feed.findtext("channel/item/title")[:4]
+
+    selected = [item.guid for item in pipe(iter_tree_items(feed), filter_by_title_prefix(title_prefix))]
+
+    expected = filter_entries_by_forum_title_prefix(feed, title_prefix)
+    assert selected == [guid.text.strip() for guid in expected.findall("channel/item/guid")]
+
+
+def test_search_period_stage_selects_the_same_items_as_the_tree_function(default_podcast_provider_feed_config):
+    date_format = "%Y-%m-%d %H:%M:%S %z"
+    config = dataclasses.replace(default_podcast_provider_feed_config, date_format=date_format,
+                                 search_period=PodcastProviderFeedConfig.SearchPeriod.ONE_DAY)
+    now = datetime.now(timezone.utc)
+    pub_dates = {
+        "recent-rfc-2822": now.strftime("%a, %d %b %Y %H:%M:%S %z"),
+        "old-rfc-2822": (now - timedelta(days=3)).strftime("%a, %d %b %Y %H:%M:%S %z"),
+        "recent-custom-format": (now - timedelta(hours=1)).strftime(date_format),
+        "old-custom-format": (now - timedelta(days=3)).strftime(date_format),
+    }
+    items = "".join(f"<item><title>{guid}</title><guid>{guid}</guid><pubDate>{pub_date}</pubDate></item>"
+                    for guid, pub_date in pub_dates.items())
+    feed = etree.fromstring(f"<rss><channel>{items}</channel></rss>")
+
+    selected = [item.guid for item in pipe(iter_tree_items(feed),
+                                           filter_by_search_period(config.get_search_period_timedelta(), date_format))]
+
+    expected = filter_entries_by_search_period(feed, config)
+    assert selected == [guid.text for guid in expected.findall("channel/item/guid")]
+    assert selected == ["recent-rfc-2822", "recent-custom-format"]
+
+
+def test_streamed_feed_is_filtered_and_written_without_reading_it_whole():
+    with StandInServer() as server:
+        url = server.add_synthetic_beyondwords_feed("output.xml", 200)
+        source = FeedSource.from_url(url)
+        parsed = []
+
+        def count_parsed(items):
+            for item in items:
+                parsed.append(item)
+                yield item
+
+        output = io.BytesIO()
+        n_written = write_feed(output, source, pipe(
+            source,
+            count_parsed,
+            filter_by_title_prefix("EA - "),
+            remove_authors(["Author 0"]),
+            prepend_to_titles("Top: "),
+            append_author_to_titles,
+            take(5),
+        ))
+
+    feed = etree.fromstring(output.getvalue())
+    titles = [title.text for title in feed.findall("channel/item/title")]
+    assert n_written == 5
+    assert feed.findtext("channel/title") == "The Nonlinear Library"
+    assert all(title.startswith("Top: EA - ") and title.count(" by Author ") == 2 for title in titles)
+    assert not any(title.endswith("by Author 0") for title in titles)
+    # The source stops being read once enough items went through.
+    assert len(parsed) < 200
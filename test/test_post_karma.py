@@ -0,0 +1,86 @@
+import json
+from unittest.mock import Mock
+
+from lxml import etree
+
+from feed_processing.feed_config import BeyondWordsInputConfig
+from feed_processing.feed_updaters import update_beyondwords_input_feed
+from feed_processing.post_karma_store import PostKarmaStore
+from feed_processing.storage import LocalStorage, set_gcs_client
+from feed_processing.utils import KARMA_TAG, find_top_post
+from manual_tests.stand_ins import FilesystemGcsClient, StandInServer
+
+
+def test_karma_is_recorded_when_the_beyondwords_input_feed_is_updated(tmp_path):
+    client = FilesystemGcsClient(str(tmp_path))
+    bucket = client.get_bucket("rssfile")
+    bucket.upload_file("removed_authors.txt", "./files/removed_authors.txt")
+    bucket.upload_file("nonlinear-library-EA.xml", "./files/beyondwords_input_feed.xml")
+    set_gcs_client(client)
+    try:
+        with StandInServer() as server:
+            config = BeyondWordsInputConfig(
+                author="The Nonlinear Fund",
+                email="main@nonlinear.com",
+                gcp_bucket="rssfile",
+                source=server.add_synthetic_forum_feed("feed.xml", 5),
+                max_entries=30,
+                rss_filename="nonlinear-library-EA.xml",
+                removed_authors_file="removed_authors.txt",
+                karma_filename="nonlinear-library-EA-karma.jsonl",
+                relevant_feeds=[]
+            )
+            update_beyondwords_input_feed(config, True)
+            expected = {post_id: post["karma"] for post_id, post in server._posts.items()}
+    finally:
+        set_gcs_client(None)
+
+    assert server.request_counts["/graphql"] == 1
+    assert not any(path.startswith("/posts/") for path in server.request_counts)
+    records = bucket.get_blob(config.karma_filename).download_as_bytes().decode("utf-8").splitlines()
+    assert {record["post"]: record["karma"] for record in map(json.loads, records)} == expected
+    feed = etree.fromstring(bucket.get_blob(config.rss_filename).download_as_bytes())
+    recorded = {item.findtext("guid"): int(item.findtext(KARMA_TAG))
+                for item in feed.findall("channel/item") if item.find(KARMA_TAG) is not None}
+    assert recorded == expected
+
+
+def beyondwords_output_item(guid, link, karma=None):
+    item = etree.Element("item")
+    etree.SubElement(item, "guid").text = guid
+    etree.SubElement(item, "link").text = link
+    if karma is not None:
+        etree.SubElement(item, KARMA_TAG).text = str(karma)
+    return item
+
+
+def test_top_post_is_picked_from_recorded_karma_without_scraping(tmp_path):
+    karma_store = PostKarmaStore(LocalStorage(rss_filename=None), str(tmp_path / "karma.jsonl"))
+    karma_store.put("first", 10)
+    karma_store.put("second", 50)
+    karma_store.save()
+    feed = etree.fromstring("<rss><channel/></rss>")
+    channel = feed.find("channel")
+    channel.append(beyondwords_output_item("first_NL_EA", "https://forum/posts/first"))
+    channel.append(beyondwords_output_item("second_NL_EA", "https://forum/posts/second"))
+    channel.append(beyondwords_output_item("third_NL_EA", "https://forum/posts/third", karma=30))
+    get_karma = Mock(return_value=0)
+
+    top_post, top_karma = find_top_post(feed, get_karma, karma_store.load())
+
+    assert top_post.findtext("guid") == "second_NL_EA"
+    assert top_karma == 50
+    get_karma.assert_not_called()
+
+
+def test_karma_is_scraped_for_posts_without_recorded_karma(tmp_path):
+    karma_store = PostKarmaStore(LocalStorage(rss_filename=None), str(tmp_path / "karma.jsonl"))
+    karma_store.put("first", 10)
+    karma_store.retain(["first_NL_EA"])
+    feed = etree.fromstring("<rss><channel/></rss>")
+    feed.find("channel").append(beyondwords_output_item("first_NL_EA", "https://forum/posts/first"))
+    feed.find("channel").append(beyondwords_output_item("new_NL_EA", "https://forum/posts/new"))
+
+    top_post, _ = find_top_post(feed, Mock(return_value=20), karma_store)
+
+    assert top_post.findtext("guid") == "new_NL_EA"
@@ -0,0 +1,94 @@
+import pstats
+import time
+
+import pytest
+
+from feed_processing.profiling import profile_run, profiled
+
+
+def busy_work():
+    deadline = time.perf_counter() + 0.05
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(1000))
+    return total
+
+
+def test_nothing_is_written_if_no_profile_mode_is_set(tmp_path, monkeypatch):
+    monkeypatch.delenv("PROFILE_MODE", raising=False)
+
+    with profile_run("test_run", output_dir=str(tmp_path)):
+        busy_work()
+
+    assert not list(tmp_path.iterdir())
+
+
+def test_cprofile_mode_writes_a_loadable_pstats_file(tmp_path):
+    with profile_run("test_run", mode="cprofile", output_dir=str(tmp_path)):
+        busy_work()
+
+    pstats_file = next(tmp_path.glob("test_run-*.pstats"))
+    stats = pstats.Stats(str(pstats_file))
+    assert any(function_name == "busy_work" for _, _, function_name in stats.stats)
+
+
+def test_sample_mode_writes_collapsed_stacks(tmp_path):
+    with profile_run("test_run", mode="sample", output_dir=str(tmp_path)):
+        busy_work()
+
+    collapsed_stacks = next(tmp_path.glob("test_run-*.collapsed")).read_text().splitlines()
+    assert any("test_profiling:busy_work" in line for line in collapsed_stacks)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in collapsed_stacks)
+
+
+def test_tracemalloc_mode_reports_peak_memory(tmp_path):
+    with profile_run("test_run", mode="tracemalloc", output_dir=str(tmp_path)):
+        _ = [bytes(1024) for _ in range(1000)]
+
+    report = next(tmp_path.glob("test_run-*.tracemalloc.txt")).read_text()
+    assert report.startswith("Peak traced memory")
+
+
+def test_unknown_profile_mode_raises_value_error(tmp_path):
+    with pytest.raises(ValueError):
+        with profile_run("test_run", mode="perf", output_dir=str(tmp_path)):
+            pass
+
+
+def test_profiled_entry_point_is_controlled_by_environment(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROFILE_MODE", "cprofile")
+    monkeypatch.setenv("PROFILE_DIR", str(tmp_path))
+
+    @profiled
+    def entry_point(a=None, b=None):
+        return busy_work()
+
+    entry_point()
+
+    assert list(tmp_path.glob("entry_point-*.pstats"))
+
+
+def test_runs_started_while_another_is_profiled_are_not_profiled(tmp_path):
+    with profile_run("outer", mode="cprofile", output_dir=str(tmp_path)):
+        with profile_run("inner", mode="tracemalloc", output_dir=str(tmp_path)):
+            busy_work()
+    with profile_run("outer", mode="cprofile", output_dir=str(tmp_path)):
+        busy_work()
+
+    assert not list(tmp_path.glob("inner-*"))
+    assert len(list(tmp_path.glob("outer-*.pstats"))) == 2
+
+
+def test_failing_profile_write_does_not_replace_the_run_error(tmp_path):
+    class FailingStorage:
+        def write_file(self, filename, content):
+            raise OSError("Upload failed")
+
+    with pytest.raises(KeyError):
+        with profile_run("test_run", mode="sample", storage=FailingStorage()):
+            raise KeyError("run failed")
+
+    # The lock is released, so the next run is profiled.
+    with profile_run("test_run", mode="sample", output_dir=str(tmp_path)):
+        busy_work()
+    assert list(tmp_path.glob("test_run-*.collapsed"))
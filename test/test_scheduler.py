@@ -0,0 +1,66 @@
+import pytest
+
+from feed_processing.scheduler import Job, Scheduler
+from feed_processing.utils import get_feed_tree_from_url, set_warm_caches
+from manual_tests.stand_ins import StandInServer
+
+
+class FakeClock:
+    def __init__(self, until):
+        self.now = 0.0
+        self.until = until
+
+    def __call__(self):
+        return self.now
+
+    def wait(self, seconds):
+        self.now += seconds
+        return self.now > self.until
+
+
+def test_jobs_run_on_their_own_cadences():
+    clock = FakeClock(until=60)
+    runs = []
+    jobs = [Job("fast", lambda: runs.append(("fast", clock.now)), 10),
+            Job("slow", lambda: runs.append(("slow", clock.now)), 25)]
+
+    Scheduler(jobs, clock=clock, wait=clock.wait).run_forever()
+
+    assert [time for name, time in runs if name == "fast"] == [0, 10, 20, 30, 40, 50, 60]
+    assert [time for name, time in runs if name == "slow"] == [0, 25, 50]
+
+
+def test_failing_and_slow_jobs_do_not_stop_the_others():
+    clock = FakeClock(until=30)
+    runs = []
+
+    def slow():
+        runs.append("slow")
+        clock.now += 25
+
+    def failing():
+        runs.append("failing")
+        raise RuntimeError("Feed unavailable")
+
+    Scheduler([Job("slow", slow, 10), Job("failing", failing, 10)], clock=clock, wait=clock.wait).run_forever()
+
+    # The slow job skips the runs it missed while it was running.
+    assert runs == ["slow", "failing", "slow", "failing"]
+
+
+@pytest.fixture
+def warm_caches():
+    set_warm_caches(60)
+    yield
+    set_warm_caches(None)
+
+
+def test_source_feed_is_parsed_once_while_the_caches_are_warm(warm_caches):
+    with StandInServer() as server:
+        url = server.add_synthetic_beyondwords_feed("output.xml", 3)
+        first = get_feed_tree_from_url(url)
+        first.find("channel").remove(first.find("channel/item"))
+        second = get_feed_tree_from_url(url)
+
+    assert server.request_counts["/output.xml"] == 1
+    assert len(second.findall("channel/item")) == 3
@@ -0,0 +1,78 @@
+import pytest
+import requests
+from lxml import etree
+
+from feed_processing.feed_config import BeyondWordsInputConfig
+from feed_processing.feed_updaters import update_podcast_provider_feed, update_beyondwords_input_feed
+from feed_processing.storage import set_gcs_client
+from manual_tests.stand_ins import StandInServer, FilesystemGcsClient
+
+"""
+End-to-end tests of the feed updaters against the local stand-ins, without mocking any of the pipeline functions.
+"""
+
+
+@pytest.fixture
+def server():
+    with StandInServer() as server:
+        yield server
+
+
+@pytest.fixture
+def gcs_bucket(tmp_path):
+    client = FilesystemGcsClient(str(tmp_path))
+    bucket = client.get_bucket("rssfile")
+    bucket.upload_file("removed_authors.txt", "./files/removed_authors.txt")
+    set_gcs_client(client)
+    yield bucket
+    set_gcs_client(None)
+
+
+def test_stand_in_server_fails_requests_at_the_configured_error_rate():
+    with StandInServer(error_rate=1.0) as server:
+        url = server.add_file("feed.xml", "<rss/>")
+        response = requests.get(url)
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_podcast_provider_feed_is_built_from_stand_in_services(
+        default_podcast_provider_feed_config,
+        server,
+        gcs_bucket
+):
+    gcs_bucket.upload_file("podcast_provider_feed.xml", "./files/podcast_provider_feed.xml")
+    default_podcast_provider_feed_config.source = server.add_synthetic_beyondwords_feed("output.xml", 30)
+    default_podcast_provider_feed_config.removed_authors_file = "removed_authors.txt"
+    default_podcast_provider_feed_config.rss_filename = "podcast_provider_feed.xml"
+    default_podcast_provider_feed_config.title_prefix = "EA - "
+    default_podcast_provider_feed_config.top_post_only = True
+
+    update_podcast_provider_feed(default_podcast_provider_feed_config, True)
+
+    written_feed = etree.fromstring(gcs_bucket.get_blob("podcast_provider_feed.xml").download_as_bytes())
+    titles = [title.text for title in written_feed.findall("channel/item/title")]
+    assert sum(title.startswith("EA - Synthetic post") for title in titles) == 1
+    # The karma of every EA post was scraped from the stand-in post pages.
+    assert sum(path.startswith("/posts/") for path in server.request_counts) == 10
+
+
+def test_beyondwords_input_feed_is_built_from_stand_in_services(server, gcs_bucket):
+    gcs_bucket.upload_file("nonlinear-library-EA.xml", "./files/beyondwords_input_feed.xml")
+    config = BeyondWordsInputConfig(
+        author="The Nonlinear Fund",
+        email="main@nonlinear.com",
+        gcp_bucket="rssfile",
+        source=server.add_synthetic_forum_feed("feed.xml", 5),
+        max_entries=30,
+        rss_filename="nonlinear-library-EA.xml",
+        removed_authors_file="removed_authors.txt",
+        relevant_feeds=["nonlinear-library-EA.xml"]
+    )
+
+    update_beyondwords_input_feed(config, True)
+
+    written_feed = etree.fromstring(gcs_bucket.get_blob("nonlinear-library-EA.xml").download_as_bytes())
+    titles = [title.text for title in written_feed.findall("channel/item/title")]
+    assert sum("Synthetic forum post" in title for title in titles) == 5
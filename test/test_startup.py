@@ -0,0 +1,25 @@
+import os
+import subprocess
+import sys
+
+from manual_tests.measure_startup import PROJECT_ROOT, parse_importtime
+
+HEAVY_MODULES = ["google.cloud.logging", "feedparser", "bs4", "requests", "lxml.etree"]
+
+
+def test_importing_main_does_not_load_the_dependencies_of_the_entry_points():
+    code = f"import sys, main; print([name for name in {HEAVY_MODULES!r} if name in sys.modules])"
+    result = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, capture_output=True, text=True,
+                            env={**os.environ, "GCP_BUCKET_NAME": "rssfile"}, check=True)
+
+    assert result.stdout.strip() == "[]"
+
+
+def test_importtime_output_is_parsed():
+    output = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       120 |        120 |     _io",
+        "import time:      2055 |      28530 | main",
+    ])
+
+    assert parse_importtime(output) == {"_io": (120, 120), "main": (2055, 28530)}
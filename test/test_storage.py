@@ -0,0 +1,171 @@
+import io
+import time
+
+import pytest
+from lxml import etree
+
+from feed_processing.storage import CachingStorage, GoogleCloudStorage, LocalStorage, create_storage
+from manual_tests.stand_ins import FilesystemGcsClient
+
+
+class ChunkRecorder(io.RawIOBase):
+    """
+    Binary stream that only records the size of each write.
+    """
+
+    def __init__(self):
+        self.chunk_sizes = []
+
+    def writable(self):
+        return True
+
+    def write(self, chunk):
+        self.chunk_sizes.append(len(chunk))
+        return len(chunk)
+
+
+@pytest.fixture(autouse=True)
+def disable_write_podcast_feed():
+    """
+    Keep the real `write_podcast_feed`, these tests only write into temporary directories.
+    """
+    yield
+
+
+def build_feed(item_count):
+    rss = etree.Element("rss", version="2.0")
+    channel = etree.SubElement(rss, "channel")
+    for i in range(item_count):
+        item = etree.SubElement(channel, "item")
+        etree.SubElement(item, "title").text = f"EA - Post number {i} & more"
+    return rss
+
+
+def test_podcast_feed_is_written_to_a_local_file(tmp_path):
+    filename = tmp_path / "feeds" / "feed.xml"
+    storage = LocalStorage(rss_filename=str(filename))
+
+    storage.write_podcast_feed(build_feed(3))
+
+    assert filename.read_bytes().startswith(b"<?xml version='1.0' encoding='UTF-8'?>")
+    titles = [title.text for title in etree.parse(str(filename)).findall("channel/item/title")]
+    assert titles == ["EA - Post number 0 & more", "EA - Post number 1 & more", "EA - Post number 2 & more"]
+
+
+def test_podcast_feed_is_streamed_in_chunks(mocker):
+    storage = LocalStorage(rss_filename="feed.xml")
+    output = ChunkRecorder()
+    mocker.patch.object(storage, "open_writer", return_value=output)
+
+    storage.write_podcast_feed(build_feed(5000))
+
+    assert len(output.chunk_sizes) > 1
+    assert max(output.chunk_sizes) < sum(output.chunk_sizes) / 10
+
+
+def test_podcast_feed_is_uploaded_through_a_blob_stream(tmp_path):
+    client = FilesystemGcsClient(str(tmp_path))
+    storage = GoogleCloudStorage("rssfile", rss_filename="feed.xml", client=client)
+
+    storage.write_podcast_feed(build_feed(3))
+
+    assert len(storage.read_podcast_feed().findall("channel/item")) == 3
+
+
+def test_local_file_is_kept_if_writing_fails(tmp_path):
+    filename = tmp_path / "feed.xml"
+    filename.write_bytes(b"<rss>previous</rss>")
+    storage = LocalStorage(rss_filename=str(filename))
+
+    with pytest.raises(ValueError):
+        with storage.open_writer(str(filename)) as f:
+            f.write(b"<rss>")
+            raise ValueError("broken feed")
+
+    assert filename.read_bytes() == b"<rss>previous</rss>"
+
+
+def test_blob_is_kept_if_writing_fails(tmp_path):
+    client = FilesystemGcsClient(str(tmp_path))
+    storage = GoogleCloudStorage("rssfile", rss_filename="feed.xml", client=client)
+    storage.write_file("feed.xml", b"<rss>previous</rss>")
+
+    with pytest.raises(ValueError):
+        with storage.open_writer("feed.xml") as f:
+            f.write(b"<rss>")
+            raise ValueError("broken feed")
+
+    assert storage.read_file("feed.xml") == b"<rss>previous</rss>"
+    assert sorted(path.name for path in (tmp_path / "rssfile").iterdir()) == ["feed.xml"]
+    with client.get_bucket("rssfile").blob("feed.xml").open("wb") as f:
+        with pytest.raises(io.UnsupportedOperation):
+            f.flush()
+
+
+def test_podcast_feed_read_from_a_blob_can_be_written_back(tmp_path):
+    client = FilesystemGcsClient(str(tmp_path))
+    client.get_bucket("rssfile").upload_file("feed.xml", "./files/podcast_provider_feed.xml")
+    storage = GoogleCloudStorage("rssfile", rss_filename="feed.xml", client=client)
+    feed = storage.read_podcast_feed()
+    item_count = len(feed.findall("channel/item"))
+
+    storage.write_podcast_feed(feed)
+
+    assert item_count > 0
+    assert len(storage.read_podcast_feed().findall("channel/item")) == item_count
+
+
+
+@pytest.fixture
+def cached_gcs(tmp_path):
+    client = FilesystemGcsClient(str(tmp_path / "gcs"))
+    bucket = client.get_bucket("rssfile")
+    bucket.upload_file("feed.xml", "./files/podcast_provider_feed.xml")
+    bucket.upload_file("removed_authors.txt", "./files/removed_authors.txt")
+    storage = GoogleCloudStorage("rssfile", rss_filename="feed.xml", removed_authors_filename="removed_authors.txt",
+                                 client=client)
+    return CachingStorage(storage, str(tmp_path / "cache")), bucket
+
+
+def test_unchanged_files_are_read_from_the_cache(cached_gcs, mocker):
+    storage, bucket = cached_gcs
+    first_feed = storage.read_podcast_feed()
+    removed_authors = storage.read_removed_authors()
+    download = mocker.spy(storage.storage, "read_file")
+
+    assert len(storage.read_podcast_feed().findall("channel/item")) == len(first_feed.findall("channel/item"))
+    assert storage.read_removed_authors() == removed_authors == storage.storage.read_removed_authors()
+    assert download.call_count == 0
+
+
+def test_changed_files_are_downloaded_again(cached_gcs):
+    storage, bucket = cached_gcs
+    storage.read_file("removed_authors.txt")
+
+    bucket.blob("removed_authors.txt").upload_from_string(b"New Author\n")
+
+    assert storage.read_file("removed_authors.txt") == b"New Author\n"
+    assert storage.read_file("missing.txt") is None
+
+
+def test_least_recently_used_files_are_evicted(tmp_path):
+    for name in "abc":
+        (tmp_path / name).write_bytes(name.encode() * 100)
+    storage = CachingStorage(LocalStorage(rss_filename=None), str(tmp_path / "cache"), max_bytes=250)
+
+    for name in "abac":
+        storage.read_file(str(tmp_path / name))
+        # Let the modification times of the cached files differ.
+        time.sleep(0.02)
+
+    cached = sorted(path.read_bytes()[:1] for path in (tmp_path / "cache").iterdir())
+    assert cached == [b"a", b"c"]
+
+
+def test_storage_is_cached_if_a_cache_directory_is_set(default_podcast_provider_feed_config, monkeypatch, tmp_path):
+    assert isinstance(create_storage(default_podcast_provider_feed_config, False), LocalStorage)
+
+    monkeypatch.setenv("STORAGE_CACHE_DIR", str(tmp_path))
+    storage = create_storage(default_podcast_provider_feed_config, False)
+
+    assert isinstance(storage, CachingStorage) and isinstance(storage.storage, LocalStorage)
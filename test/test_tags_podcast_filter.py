@@ -0,0 +1,264 @@
+import json
+import tempfile
+import threading
+import time
+
+import feedparser
+import pytest
+
+from feed_processing.post_tags_store import PostTagsStore
+from feed_processing.storage import LocalStorage
+from manual_tests.stand_ins import StandInServer
+
+pytest.importorskip("gql")
+pytest.importorskip("httpx")
+
+from feed_processing.tags_podcast_filter import fetch_tags, parse_tags, get_post_id, build_post_tags_query, \
+    build_tag_index, select_channel_entries, publish_channels, load_channels, ChannelsCheckpoint, \
+    TAG_SLUGS_TTL  # noqa: E402
+
+
+@pytest.fixture
+def server():
+    with StandInServer() as server:
+        yield server
+
+
+@pytest.fixture
+def news_feed(server):
+    url = server.add_synthetic_beyondwords_feed("output.xml", 120)
+    return feedparser.parse(url)
+
+
+def test_post_id_is_extracted_from_the_entry_link():
+    assert get_post_id("https://forum.effectivealtruism.org/posts/ZKYpu4WAiwTXDSrX8/some-title") == "ZKYpu4WAiwTXDSrX8"
+    assert get_post_id("https://forum.effectivealtruism.org/tag/ai-safety") is None
+
+
+def test_tag_slugs_are_extracted_from_the_tag_links_of_a_page():
+    page = """<html><body>
+        <a href="/tag/ai-safety">AI &amp; safety</a>
+        <a class="TagsListItem" href="https://forum.effectivealtruism.org/tag/biosecurity">Biosecurity</a>
+        <a href="/posts/abc/some-post">Not a tag</a><a name="anchor">No link</a>
+    </body></html>"""
+
+    assert parse_tags(page) == {"ai-safety", "biosecurity"}
+
+
+def test_post_tags_query_has_one_aliased_field_per_post():
+    query = build_post_tags_query(["a1", "b2"])
+
+    assert 'p0: post(input: {selector: {_id: "a1"}})' in query
+    assert 'p1: post(input: {selector: {_id: "b2"}})' in query
+
+
+def test_tags_are_fetched_with_batched_graphql_queries_instead_of_article_pages(server, news_feed):
+    list_of_tags = fetch_tags(news_feed)
+
+    assert list_of_tags[0] == {"tag-0"}
+    assert list_of_tags[8] == {"tag-1", "tag-8"}
+    # 120 posts are looked up in batches of 50.
+    assert server.request_counts["/graphql"] == 3
+    assert not any(path.startswith("/posts/") for path in server.request_counts)
+
+
+def test_article_pages_are_scraped_for_posts_unknown_to_the_graphql_api(server, news_feed):
+    news_feed.entries[0]['link'] = server.url("posts/unknown/an-unknown-post")
+    server.add_file("posts/unknown/an-unknown-post", '<a href="/tag/scraped-tag">Scraped tag</a>', "text/html")
+
+    list_of_tags = fetch_tags(news_feed)
+
+    assert list_of_tags[0] == {"scraped-tag"}
+    assert server.request_counts["/posts/unknown/an-unknown-post"] == 1
+
+
+@pytest.fixture
+def tags_store(tmp_path):
+    return PostTagsStore(LocalStorage(rss_filename=None), str(tmp_path / "post_tags.jsonl")).load()
+
+
+def test_only_new_and_recent_entries_are_fetched_once_tags_are_stored(server, news_feed, tags_store):
+    first_list_of_tags = fetch_tags(news_feed, tags_store)
+    second_list_of_tags = fetch_tags(news_feed, PostTagsStore(tags_store.storage, tags_store.filename).load())
+
+    assert second_list_of_tags == first_list_of_tags
+    assert second_list_of_tags[8] == {"tag-1", "tag-8"}
+    # The first run looks up the 120 posts in 3 batches, the second one only the refresh window.
+    assert server.request_counts["/graphql"] == 4
+
+
+def test_tags_store_drops_posts_that_left_the_feed(server, news_feed, tags_store):
+    tags_store.put("gone", {"old-tag"})
+
+    fetch_tags(news_feed, tags_store)
+
+    assert "gone" not in tags_store
+    assert len(tags_store) == 120
+    with open(tags_store.filename) as f:
+        assert len(f.readlines()) == 120
+
+
+def test_tags_store_is_saved_while_tags_are_fetched(server, news_feed, tags_store, mocker):
+    mocker.patch("feed_processing.tags_podcast_filter.TAGS_CHECKPOINT_SIZE", 50)
+    save = mocker.spy(tags_store, "save")
+
+    fetch_tags(news_feed, tags_store)
+
+    # Once per chunk of 50 entries, and once more after dropping the posts that left the feed.
+    assert save.call_count == 4
+
+
+def test_channel_entries_are_the_union_of_the_channel_tags_in_feed_order():
+    entries = [
+        {'title': 'A', 'article_tags': {'ai', 'biosecurity'}},
+        {'title': 'B', 'article_tags': {'animal-welfare'}},
+        {'title': 'C', 'article_tags': {'ai'}},
+        {'title': 'D', 'article_tags': set()},
+    ]
+    tag_index = build_tag_index(entries)
+
+    channel_entries = select_channel_entries(entries, tag_index, ['biosecurity', 'ai', 'unknown-tag'])
+
+    assert [entry['title'] for entry in channel_entries] == ['A', 'C']
+    # Entries are shared between channels rather than copied.
+    assert channel_entries[0] is entries[0]
+
+
+def test_channels_are_written_concurrently():
+    written = {}
+    lock = threading.Lock()
+    in_flight = max_in_flight = 0
+    all_workers_busy = threading.Event()
+
+    def write(filename, rss_feed):
+        nonlocal in_flight, max_in_flight
+        with lock:
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            if in_flight == 4:
+                all_workers_busy.set()
+        # The first writes wait for each other, which only returns before the timeout if they run concurrently.
+        all_workers_busy.wait(timeout=5)
+        with lock:
+            written[filename] = rss_feed
+            in_flight -= 1
+
+    rendered_channels = ((f"channel-{i}.xml", f"<rss>{i}</rss>") for i in range(16))
+    publish_channels(rendered_channels, write, max_workers=4)
+
+    assert written == {f"channel-{i}.xml": f"<rss>{i}</rss>" for i in range(16)}
+    assert max_in_flight == 4
+
+
+def test_publishing_fails_if_a_channel_cannot_be_written():
+    def write(filename, rss_feed):
+        if filename == "channel-3.xml":
+            raise IOError("Upload failed")
+
+    with pytest.raises(IOError):
+        publish_channels(((f"channel-{i}.xml", "<rss/>") for i in range(8)), write, max_workers=2)
+
+
+@pytest.fixture
+def tag_slugs_filename(tmp_path, monkeypatch):
+    # The cache defaults to the temporary directory.
+    monkeypatch.delenv("TAG_SLUGS_CACHE", raising=False)
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    return tmp_path / "tag_slugs.json"
+
+
+@pytest.fixture
+def channels_filename(tmp_path, tag_slugs_filename):
+    (tmp_path / "sources").mkdir()
+    channels_filename = tmp_path / "sources" / "channels.json"
+    channels_filename.write_text(json.dumps({
+        "AI-Safety": {"tags": ["AI safety"], "imageUrl": "https://image.url/ai.png"},
+    }))
+    return channels_filename
+
+
+def test_tag_slugs_are_fetched_once_and_then_read_from_the_cache(server, channels_filename, tag_slugs_filename):
+    server.tag_slugs = {"AI safety": "ai-safety", "Biosecurity": "biosecurity"}
+
+    first_channels = load_channels(server.url("graphql"), channels_filename)
+    second_channels = load_channels(server.url("graphql"), channels_filename)
+
+    assert first_channels["AI-Safety"]["slugs"] == ["ai-safety"]
+    assert second_channels["AI-Safety"]["slugs"] == ["ai-safety"]
+    assert server.request_counts["/graphql"] == 1
+    assert tag_slugs_filename.exists()
+    assert not (channels_filename.parent / "tag_slugs.json").exists()
+
+
+def test_tag_slugs_cache_is_refreshed_if_a_configured_tag_is_missing(server, channels_filename, tag_slugs_filename):
+    tag_slugs_filename.write_text(json.dumps({"fetched_at": time.time() - 3600, "tag_slugs": {"Biosecurity": "bio"}}))
+    server.tag_slugs = {"AI safety": "ai-safety"}
+
+    channels = load_channels(server.url("graphql"), channels_filename)
+
+    assert channels["AI-Safety"]["slugs"] == ["ai-safety"]
+    assert server.request_counts["/graphql"] == 1
+
+
+def test_expired_tag_slugs_cache_is_used_and_refreshed_in_the_background(server, channels_filename, tag_slugs_filename):
+    expired = time.time() - TAG_SLUGS_TTL - 60
+    tag_slugs_filename.write_text(json.dumps({"fetched_at": expired, "tag_slugs": {"AI safety": "old-slug"}}))
+    server.tag_slugs = {"AI safety": "new-slug"}
+
+    channels = load_channels(server.url("graphql"), channels_filename)
+
+    assert channels["AI-Safety"]["slugs"] == ["old-slug"]
+    deadline = time.time() + 5
+    while "new-slug" not in tag_slugs_filename.read_text() and time.time() < deadline:
+        time.sleep(0.01)
+    assert json.loads(tag_slugs_filename.read_text())["tag_slugs"] == {"AI safety": "new-slug"}
+
+
+def test_tag_slugs_cache_older_than_the_max_age_is_refreshed_before_use(server, channels_filename, tag_slugs_filename):
+    tag_slugs_filename.write_text(json.dumps({"fetched_at": 0, "tag_slugs": {"AI safety": "old-slug"}}))
+    server.tag_slugs = {"AI safety": "new-slug"}
+
+    channels = load_channels(server.url("graphql"), channels_filename)
+
+    assert channels["AI-Safety"]["slugs"] == ["new-slug"]
+
+
+def test_interrupted_publishing_is_resumed_from_the_checkpoint(tmp_path):
+    storage = LocalStorage(rss_filename=None)
+    filename = str(tmp_path / "checkpoint.json")
+    written = []
+
+    def write(checkpoint, fail_on=None):
+        def write_channel(filename, rss_feed):
+            if filename == fail_on:
+                raise IOError("Function timed out")
+            written.append(filename)
+            checkpoint.mark_completed(filename)
+
+        return write_channel
+
+    checkpoint = ChannelsCheckpoint(storage, filename, "fingerprint", interval=0).load()
+    channels = [f"channel-{i}.xml" for i in range(6)]
+    with pytest.raises(IOError):
+        publish_channels(((name, "<rss/>") for name in channels), write(checkpoint, fail_on="channel-3.xml"),
+                         max_workers=1)
+
+    written_before_failure = list(written)
+    resumed = ChannelsCheckpoint(storage, filename, "fingerprint").load()
+    written.clear()
+    publish_channels(((name, "<rss/>") for name in channels if name not in resumed.completed), write(resumed))
+
+    assert "channel-3.xml" in written
+    assert not set(written) & set(written_before_failure)
+    assert sorted(written + written_before_failure) == channels
+
+
+def test_checkpoint_of_a_different_feed_is_ignored(tmp_path):
+    storage = LocalStorage(rss_filename=None)
+    filename = str(tmp_path / "checkpoint.json")
+    checkpoint = ChannelsCheckpoint(storage, filename, "old-feed")
+    checkpoint.mark_completed("channel-0.xml")
+    checkpoint.save()
+
+    assert ChannelsCheckpoint(storage, filename, "old-feed").load().completed == {"channel-0.xml"}
+    assert ChannelsCheckpoint(storage, filename, "new-feed").load().completed == set()
@@ -140,8 +140,8 @@ def test_forum_items_that_are_already_present_in_beyondwords_feed_are_discarded(
     # Set the value of an item in the existing beyondwords feed, so it matches the item that should not be duplicated.
     # The update function adds a shorthand as prefix and 'by <Author>' as suffix. Do this too for the test feed.
     existing_beyondwords_input_feed.find("channel/item/title").text = f"Unknown - {duplicate_item_title} by The Author"
-    existing_beyondwords_input_feed.write("./files/test_beyondwords_input_feed.xml", xml_declaration=True,
-                                          encoding="utf-8")
+    existing_beyondwords_input_feed.getroottree().write("./files/test_beyondwords_input_feed.xml", xml_declaration=True,
+                                                        encoding="utf-8")
     # Set up the config so the update function loads the feed from the file we just created.
     default_beyondwords_input_config.rss_filename = "./files/test_beyondwords_input_feed.xml"
 
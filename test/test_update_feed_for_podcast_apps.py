@@ -7,7 +7,8 @@ from bs4 import BeautifulSoup
 from lxml.etree import CDATA, SubElement
 
 from feed_processing.feed_config import PodcastProviderFeedConfig
-from feed_processing.feed_updaters import update_podcast_provider_feed, get_feed_str
+from feed_processing.feed_updaters import update_podcast_provider_feed
+from feed_processing.utils import get_feed_str
 
 
 @pytest.fixture(autouse=True)
@@ -74,7 +75,8 @@ def test_update_feed_for_podcast_apps_does_not_include_duplicates_in_podcast_fee
     duplicate_item_title = feed_for_podcast_apps.find("channel/item/title")
     duplicate_item_title.text = "TF - This post should not be found multiple times in podcast app feed"
     # Save this feed
-    feed_for_podcast_apps.write("./files/test_feed_for_podcast_apps.xml", xml_declaration=True, encoding="utf-8")
+    feed_for_podcast_apps.getroottree().write("./files/test_feed_for_podcast_apps.xml", xml_declaration=True,
+                                              encoding="utf-8")
     # Set up the config to read from this feed.
     default_podcast_provider_feed_config.rss_filename = "./files/test_feed_for_podcast_apps.xml"
     # Change the BeyondWords output feed, so it contains the duplicate title
@@ -0,0 +1,122 @@
+"""
+Long-running worker that runs the jobs of `main.py` on their cadences in a single process, as an alternative to one
+Cloud Function invocation per job for self-hosted deployments.
+
+Imports, storage clients, the storage file cache, parsed source feeds and post karma stay warm between the runs.
+
+With `--dag`, the publishing cycle runs instead as one DagRunner job: the BeyondWords input feeds when the forum
+feeds change, the podcast feeds when the BeyondWords output feed changes, and then the integrity checks.
+
+Example:
+    python worker.py --interval ea_daily=30 --only ea_daily ea_weekly ea_all
+    python worker.py --dag 10
+"""
+import argparse
+import logging
+import os
+import signal
+import sys
+from functools import partial
+from typing import Dict, List
+
+import main
+from feed_processing.dag import DagRunner, Node, get_url_version
+from feed_processing.scheduler import Job, Scheduler
+from feed_processing.utils import set_warm_caches
+
+# Minutes between the runs of each job.
+JOB_INTERVALS = {
+    'beyondwords_ea': 30,
+    'beyondwords_lw': 30,
+    'beyondwords_af': 30,
+    'create_beyondwords_nonlinear_library_project_inputs': 60,
+    'ea_all': 60,
+    'ea_daily': 60,
+    'ea_weekly': 60,
+    'lw_all': 60,
+    'lw_daily': 60,
+    'lw_weekly': 60,
+    'af_all': 60,
+    'af_daily': 60,
+    'af_weekly': 60,
+    'do_xml_file_integrity_checks': 360,
+}
+# Seconds the parsed source feeds and the karma of posts are shared between jobs.
+WARM_CACHE_TTL = 600
+STORAGE_CACHE_DIR = '/tmp/storage-cache'
+DAG_STATE_FILENAME = '/tmp/publishing-dag/state.json'
+DAG_MAX_WORKERS = 4
+PODCAST_FEED_JOBS = [f'{forum}_{period}' for forum in ('ea', 'lw', 'af') for period in ('all', 'daily', 'weekly')]
+
+
+def create_jobs(intervals: Dict[str, float], only: List[str] = None) -> List[Job]:
+    return [
+        Job(name=name, run=getattr(main, name), interval=minutes * 60)
+        for name, minutes in intervals.items()
+        if not only or name in only
+    ]
+
+
+def create_publishing_dag() -> List[Node]:
+    """
+    Return the nodes of the publishing cycle. BeyondWords reads the input feeds and publishes the audio in its output
+    feed on its own schedule, so the podcast feeds depend on the version of the output feed rather than directly on
+    the input feed jobs.
+    """
+    from feed_processing import configs
+
+    nodes = [
+        Node(name, run=getattr(main, name), inputs=[partial(get_url_version, config().source)])
+        for name, config in [('beyondwords_ea', configs.beyondwords_ea_config),
+                             ('beyondwords_lw', configs.beyondwords_lw_config),
+                             ('beyondwords_af', configs.beyondwords_af_config)]
+    ]
+    nodes.append(Node('beyondwords_output', inputs=[partial(get_url_version, configs.beyondwords_rss_output)]))
+    nodes.extend(Node(name, run=getattr(main, name), deps=['beyondwords_output']) for name in PODCAST_FEED_JOBS)
+    nodes.append(Node('do_xml_file_integrity_checks', run=main.do_xml_file_integrity_checks, deps=PODCAST_FEED_JOBS))
+    return nodes
+
+
+def create_publishing_cycle_job(minutes: float) -> Job:
+    from feed_processing.storage import LocalStorage
+
+    runner = DagRunner(create_publishing_dag(), max_workers=DAG_MAX_WORKERS, storage=LocalStorage(None),
+                       state_filename=DAG_STATE_FILENAME)
+    return Job(name='publishing_cycle', run=runner.run, interval=minutes * 60)
+
+
+def parse_interval(value: str):
+    name, _, minutes = value.partition('=')
+    if name not in JOB_INTERVALS or not minutes:
+        raise argparse.ArgumentTypeError(f"Expected <job>=<minutes> with one of {', '.join(JOB_INTERVALS)}")
+    return name, float(minutes)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--interval', type=parse_interval, action='append', default=[],
+                        help='Override the minutes between the runs of a job, e.g. ea_daily=30')
+    parser.add_argument('--only', nargs='+', choices=list(JOB_INTERVALS), help='Only run these jobs')
+    parser.add_argument('--cache-ttl', type=float, default=WARM_CACHE_TTL,
+                        help='Seconds source feeds and karma are kept in memory, 0 to disable')
+    parser.add_argument('--dag', type=float, metavar='MINUTES',
+                        help='Run the publishing cycle as a DAG every MINUTES instead of its jobs on their own cadences')
+    args = parser.parse_args()
+
+    logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+    os.environ.setdefault('STORAGE_CACHE_DIR', STORAGE_CACHE_DIR)
+    set_warm_caches(args.cache_ttl)
+
+    intervals = {**JOB_INTERVALS, **dict(args.interval)}
+    if args.dag:
+        dag_jobs = {node.name for node in create_publishing_dag()}
+        jobs = create_jobs({name: minutes for name, minutes in intervals.items() if name not in dag_jobs}, args.only)
+        jobs.append(create_publishing_cycle_job(args.dag))
+    else:
+        jobs = create_jobs(intervals, args.only)
+    scheduler = Scheduler(jobs)
+    signal.signal(signal.SIGTERM, lambda signum, frame: scheduler.stop())
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        pass